@@ -0,0 +1,145 @@
+"""
+Compare the sync (WSGI) and async (ASGI) product listing under slow geolocation.
+
+Both paths face the same number of concurrent clients. The WSGI path gets a
+fixed pool of workers (like `gunicorn --workers N`), the ASGI path a single
+event loop. Every request comes from a new public IP, so each one pays the
+simulated remote geolocation latency.
+
+Usage:
+    python benchmarks/asgi_vs_wsgi.py --concurrency 50 --requests 200 --latency 0.2 --workers 4
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "profiles_project.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import AsyncClient, Client  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from profiles_api import geo  # noqa: E402
+from profiles_api.models import Category, Product, UserProfile  # noqa: E402
+
+
+def seed(products):
+    user = UserProfile.objects.create_user("bench@example.com", "Bench", "pass", country="GH")
+    category = Category.objects.create(name="Phones", parent=Category.objects.create(name="Electronics"))
+    Product.objects.bulk_create(
+        Product(title=f"Phone {i}", slug=f"phone-{i}", description="", price="1.00", category=category,
+                created_by=user, country_code="gh", category_slug=category.slug)
+        for i in range(products)
+    )
+
+
+def client_ips(count):
+    # ✅ Distinct public addresses, so every request misses the geolocation cache
+    return [f"8.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}" for i in range(1, count + 1)]
+
+
+def summarize(name, latencies, elapsed):
+    latencies = sorted(latencies)
+    return {
+        "path": name,
+        "requests": len(latencies),
+        "seconds": round(elapsed, 3),
+        "req_per_s": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+def run_wsgi(ips, concurrency, workers):
+    """`concurrency` client threads sharing `workers` request slots"""
+    slots = threading.BoundedSemaphore(workers)
+    local = threading.local()
+
+    def request(ip):
+        started = time.perf_counter()
+        with slots:
+            if not hasattr(local, "client"):
+                local.client = Client()
+            response = local.client.get("/api/products/", REMOTE_ADDR=ip)
+        assert response.status_code == 200, response.status_code
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(request, ips))
+    return summarize(f"wsgi ({workers} workers)", latencies, time.perf_counter() - started)
+
+
+async def run_asgi(ips, concurrency):
+    """`concurrency` coroutines on a single event loop"""
+    client = AsyncClient()
+    gate = asyncio.Semaphore(concurrency)
+
+    async def request(ip):
+        async with gate:
+            started = time.perf_counter()
+            response = await client.get("/api/async/products/", REMOTE_ADDR=ip)
+            assert response.status_code == 200, response.status_code
+            return time.perf_counter() - started
+
+    started = time.perf_counter()
+    latencies = await asyncio.gather(*(request(ip) for ip in ips))
+    return summarize("asgi (1 event loop)", latencies, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2, help="Simulated geolocation latency (s)")
+    parser.add_argument("--workers", type=int, default=4, help="WSGI worker slots")
+    parser.add_argument("--products", type=int, default=50)
+    args = parser.parse_args()
+
+    # ✅ Measure the views themselves: no response cache, throwaway file database
+    settings.CACHES = {"default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"}}
+    connection.settings_dict["TEST"]["NAME"] = os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        seed(args.products)
+
+        def slow_lookup(self, ip):
+            time.sleep(args.latency)
+            return "gh"
+
+        async def aslow_lookup(self, ip):
+            await asyncio.sleep(args.latency)
+            return "gh"
+
+        with mock.patch.object(geo.CountryResolver, "remote_lookup", slow_lookup), \
+                mock.patch.object(geo.CountryResolver, "aremote_lookup", aslow_lookup):
+            geo.set_resolver(geo.CountryResolver(remote_fallback=True))
+            wsgi = run_wsgi(client_ips(args.requests), args.concurrency, args.workers)
+
+            geo.set_resolver(geo.CountryResolver(remote_fallback=True))
+            asgi = asyncio.run(run_asgi(client_ips(args.requests), args.concurrency))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(f"concurrency={args.concurrency} requests={args.requests} latency={args.latency}s")
+    for result in (wsgi, asgi):
+        print("  ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Seeded synthetic data generator.
+
+Users spread across countries, a category tree N levels deep, products on the
+leaf categories and help articles, all written with bulk_create in batches so
+millions of rows stay within bounded memory. The same seed always produces the
+same data.
+
+Usage (seeds the configured database):
+    python benchmarks/datagen.py --users 1000 --products 1000000 --depth 3 --fanout 5
+"""
+import argparse
+import random
+import time
+
+from common import settings  # noqa: F401  (bootstraps Django)
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from profiles_api.caching import help_scope, invalidate, products_scope
+from profiles_api.category_tree import CATEGORY_TREE_SCOPE
+from profiles_api.facets import rebuild as rebuild_facets
+from profiles_api.models import Category, HelpArticle, HelpCategory, Product, UserProfile
+
+DEFAULT_COUNTRIES = ["GH", "NG", "KE", "ZA", "EG", "MA", "SN", "CI", "TZ", "UG", "RW", "ET"]
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(users=100, countries=5, depth=3, fanout=4, products=10000, help_categories=5, help_articles=100,
+             seed=0, batch_size=5000, log=print):
+    """Populate the database; returns a dict of row counts per model"""
+    rng = random.Random(seed)
+    country_codes = DEFAULT_COUNTRIES[:countries] or ["GH"]
+    started = time.perf_counter()
+
+    with transaction.atomic():
+        password = make_password(None)  # ✅ Unusable password: hashing per user would dominate the run
+        UserProfile.objects.bulk_create(
+            (UserProfile(email=f"user{i}@example.com", name=f"User {i}", country=country_codes[i % len(country_codes)],
+                         password=password) for i in range(users)),
+            batch_size=batch_size,
+        )
+        creators = [
+            (pk, str(country or "").lower())
+            for pk, country in UserProfile.objects.filter(email__endswith="@example.com").values_list("pk", "country")
+        ]
+
+        # ✅ Category tree level by level, then one pass to fill the materialized paths
+        level = [None]
+        for d in range(depth):
+            level = Category.objects.bulk_create(
+                Category(name=f"Category {d}.{p_i}.{c}", slug=f"category-{d}-{p_i}-{c}", parent=parent)
+                for p_i, parent in enumerate(level) for c in range(fanout)
+            )
+        Category.objects.rebuild_paths()
+        leaves = list(Category.objects.filter(depth=depth - 1).values_list("pk", "slug"))
+
+    log(f"{len(creators)} users, {len(leaves)} leaf categories")
+
+    for start in range(0, products, batch_size):
+        with transaction.atomic():
+            batch = []
+            for i in range(start, min(start + batch_size, products)):
+                creator_pk, country_code = creators[rng.randrange(len(creators))] if creators else (None, "")
+                category_pk, category_slug = leaves[rng.randrange(len(leaves))]
+                batch.append(Product(
+                    title=f"Product {i}",
+                    description="Lorem ipsum " * rng.randint(1, 20),
+                    slug=f"product-{i}",
+                    category_id=category_pk,
+                    price=f"{rng.uniform(1, 5000):.2f}",
+                    images=[f"https://cdn.example.com/p/{i}/{n}.jpg" for n in range(rng.randint(0, 4))],
+                    created_by_id=creator_pk,
+                    country_code=country_code,
+                    category_slug=category_slug,
+                ))
+            Product.objects.bulk_create(batch)
+        log(f"{min(start + batch_size, products)} products")
+
+    with transaction.atomic():
+        HelpCategory.objects.bulk_create(
+            HelpCategory(name=f"Help {i}", slug=f"help-{i}") for i in range(help_categories)
+        )
+        help_pks = list(HelpCategory.objects.values_list("pk", flat=True))
+        for batch in _batched(
+            (HelpArticle(category_id=help_pks[i % len(help_pks)], title=f"How to {i}", slug=f"how-to-{i}",
+                         content="## Step\n\nDo the thing.\n" * rng.randint(1, 30)) for i in range(help_articles)),
+            batch_size,
+        ):
+            HelpArticle.objects.bulk_create(batch)
+
+    rebuild_facets()  # ✅ bulk_create bypasses the signals that maintain facets and invalidate caches
+    invalidate(help_scope(), CATEGORY_TREE_SCOPE, *(products_scope(code) for code in country_codes))
+
+    counts = {model.__name__: model.objects.count() for model in (UserProfile, Category, Product, HelpArticle)}
+    log(f"Generated {counts} in {time.perf_counter() - started:.1f}s")
+    return counts
+
+
+def add_arguments(parser):
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--countries", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=3, help="Category tree levels")
+    parser.add_argument("--fanout", type=int, default=4, help="Subcategories per category")
+    parser.add_argument("--products", type=int, default=10000)
+    parser.add_argument("--help-categories", type=int, default=5)
+    parser.add_argument("--help-articles", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=5000)
+
+
+def generator_options(args):
+    return {
+        "users": args.users, "countries": args.countries, "depth": args.depth, "fanout": args.fanout,
+        "products": args.products, "help_categories": args.help_categories, "help_articles": args.help_articles,
+        "seed": args.seed, "batch_size": args.batch_size,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Seed the configured database with synthetic data")
+    add_arguments(parser)
+    generate(**generator_options(parser.parse_args()))
@@ -0,0 +1,118 @@
+"""
+Measure gunicorn startup with and without the preloaded, warmed master.
+
+For each mode a real gunicorn (using `gunicorn.conf.py`) is started against the
+configured database. Reported: seconds until every worker is forked, latency of
+the first request to each URL (cold vs warm worker), and per-worker RSS/PSS
+after the requests (Linux; PSS counts shared copy-on-write pages fractionally).
+
+Usage:
+    python benchmarks/gunicorn_startup.py --workers 4
+    DATABASE_URL=sqlite:////tmp/bench.sqlite3 python benchmarks/gunicorn_startup.py --urls /api/gh/products/
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from profiles_api.warmup import process_memory  # noqa: E402  (no Django setup needed)
+
+DEFAULT_URLS = ["/api/categories/tree/", "/api/products/?country=gh", "/api/help/", "/api/gh/products/"]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def fetch(url):
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    return status, time.perf_counter() - started
+
+
+def worker_pids(master):
+    try:
+        with open(f"/proc/{master}/task/{master}/children") as fh:
+            return [int(pid) for pid in fh.read().split()]
+    except OSError:
+        return []
+
+
+def run(preload, workers, urls, timeout=60):
+    port = free_port()
+    env = {
+        **os.environ, "GUNICORN_PRELOAD": str(preload), "WEB_CONCURRENCY": str(workers),
+        "GUNICORN_BIND": f"127.0.0.1:{port}",
+    }
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", str(BASE_DIR / "gunicorn.conf.py")],
+        cwd=BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        base = f"http://127.0.0.1:{port}"
+        while True:
+            try:
+                with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                    break
+            except OSError:
+                if server.poll() is not None or time.perf_counter() - started > timeout:
+                    raise RuntimeError("gunicorn did not start")
+                time.sleep(0.02)
+        while len(worker_pids(server.pid)) < workers and time.perf_counter() - started < timeout:
+            time.sleep(0.02)
+        ready = time.perf_counter() - started
+
+        first = {url: fetch(base + url) for url in urls}
+        again = {url: fetch(base + url) for url in urls}
+        memory = [process_memory(pid) for pid in worker_pids(server.pid)]
+        return {
+            "ready_s": ready,
+            "requests": {url: (first[url][0], first[url][1], again[url][1]) for url in urls},
+            "master": process_memory(server.pid),
+            "workers": [m for m in memory if m],
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--urls", nargs="+", default=DEFAULT_URLS)
+    args = parser.parse_args()
+
+    for preload in (False, True):
+        result = run(preload, args.workers, args.urls)
+        print(f"\npreload={preload}: {args.workers} workers forked after {result['ready_s']:.2f}s")
+        print(f"  {'url':<40} {'status':>6} {'first ms':>9} {'next ms':>8}")
+        for url, (status, first, again) in result["requests"].items():
+            print(f"  {url:<40} {status:>6} {first * 1000:>9.1f} {again * 1000:>8.1f}")
+        if result["master"]:
+            print(f"  master RSS {result['master']['rss'] / 1024:.1f} MiB")
+        if result["workers"]:
+            for key in ("rss", "pss", "shared"):
+                values = [m[key] / 1024 for m in result["workers"]]
+                print(f"  worker {key:<6} avg {sum(values) / len(values):7.1f} MiB, total {sum(values):7.1f} MiB")
+        else:
+            print("  (per-worker memory needs Linux /proc)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Rows/second of `ProductSerializer(many=True)` versus the values()-based
+`ProductRowSerializer` on generated data, checking the rendered JSON is identical.
+
+Usage:
+    python benchmarks/product_serializers.py --products 20000 --rows 5000
+"""
+import argparse
+import sys
+import time
+
+from common import bench_database
+
+from rest_framework.renderers import JSONRenderer
+
+import datagen
+from profiles_api.models import Product
+from profiles_api.serializers import ProductRowSerializer, ProductSerializer
+
+
+def instances(products):
+    return JSONRenderer().render(ProductSerializer(products, many=True).data)
+
+
+def rows(products):
+    return JSONRenderer().render(ProductRowSerializer(ProductRowSerializer.queryset(products)).data)
+
+
+def best_of(func, products, repeat):
+    """Fastest of `repeat` runs (query + serialization + rendering), and the rendered bytes"""
+    best, body = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = func(products)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    datagen.add_arguments(parser)
+    parser.add_argument("--rows", type=int, default=5000, help="Products serialized per run")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with bench_database():
+        datagen.generate(**datagen.generator_options(args), log=lambda msg: print(msg, file=sys.stderr))
+        products = Product.objects.select_related("created_by", "category").order_by("-created_at", "-id")[:args.rows]
+        count = products.count()
+
+        slow, expected = best_of(instances, products, args.repeat)
+        fast, actual = best_of(rows, products, args.repeat)
+
+    if actual != expected:
+        sys.exit("ProductRowSerializer output differs from ProductSerializer")
+    print(f"ProductSerializer     {count / slow:>10.0f} rows/s ({slow * 1000:.1f}ms for {count} rows)")
+    print(f"ProductRowSerializer  {count / fast:>10.0f} rows/s ({fast * 1000:.1f}ms for {count} rows)")
+    print(f"Speed-up              {slow / fast:>10.1f}x (output byte-identical)")
+
+
+if __name__ == "__main__":
+    main()
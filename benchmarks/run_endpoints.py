@@ -0,0 +1,183 @@
+"""
+Drive every route in `profiles_api/urls.py` in-process against generated data.
+
+For each route: p50/p95/p99 latency, SQL queries per request and peak Python
+memory (tracemalloc) of one request. Results are written as JSON tagged with the
+git revision; pass `--baseline` with an earlier results file to print deltas.
+Routes that don't answer 2xx are reported as FAILED, never timed.
+
+Usage:
+    python benchmarks/run_endpoints.py --products 50000 --iterations 50 --output bench.json
+    python benchmarks/run_endpoints.py --baseline bench.json
+"""
+import argparse
+import json
+import logging
+import re
+import sys
+import time
+import tracemalloc
+
+from common import bench_database, git_revision, percentile
+
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver
+
+import datagen
+from profiles_api import urls as api_urls
+from profiles_api.models import HelpArticle, HelpCategory, Product
+
+API_PREFIX = "/api/"
+ROUTE_PARAM = re.compile(r"<(?:\w+:)?(\w+)>")
+REGEX_PARAM = re.compile(r"\(\?P<(\w+)>[^)]*\)")
+
+
+def iter_routes(patterns, prefix=""):
+    """Yield (name, route template) for every URL pattern, following includes"""
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern).lstrip("^").rstrip("$")
+        if isinstance(pattern, URLResolver):
+            yield from iter_routes(pattern.url_patterns, route)
+        elif isinstance(pattern, URLPattern):
+            yield pattern.name or pattern.lookup_str, route
+
+
+def request_bodies(values):
+    """Method and JSON body for routes that aren't plain GETs, by URL name"""
+    product_url = f"/{values['country']}/{values['subcategory']}/{values['product_slug']}"
+    return {
+        "products-lookup": ("post", {"items": [product_url] * 20}),
+    }
+
+
+def sample_values():
+    """Concrete values for the route parameters, taken from the generated data"""
+    product = Product.objects.exclude(country_code="").order_by("pk").first()
+    return {
+        "country": product.country_code,
+        "subcategory": product.category_slug,
+        "product_slug": product.slug,
+        "help_slug": HelpArticle.objects.order_by("pk").values_list("slug", flat=True).first(),
+        "pk": HelpCategory.objects.order_by("pk").values_list("pk", flat=True).first(),
+    }
+
+
+def build_url(name, route, values):
+    """Fill a route template; returns None for routes that can't be driven (e.g. format suffixes)"""
+    def fill(match):
+        param = match.group(1)
+        if param == "slug":
+            return str(values["help_slug"] if "help" in name else values["product_slug"])
+        if param not in values:
+            raise KeyError(param)
+        return str(values[param])
+
+    try:
+        path = ROUTE_PARAM.sub(fill, REGEX_PARAM.sub(fill, route))
+    except KeyError:
+        return None
+    return API_PREFIX + path.replace("\\", "")
+
+
+def measure(client, url, iterations, method="get", body=None):
+    def send():
+        if body is None:
+            return getattr(client, method)(url)
+        return getattr(client, method)(url, body, content_type="application/json")
+
+    response = send()  # ✅ Warm-up (imports, resolver, first-hit caches)
+    if not 200 <= response.status_code < 300:
+        return {"url": url, "method": method.upper(), "status": response.status_code, "failed": True}
+
+    latencies, queries, status = [], [], None
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = send()
+            if response.streaming:
+                b"".join(response.streaming_content)
+            latencies.append(time.perf_counter() - started)
+        queries.append(len(captured))
+        status = response.status_code
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    response = send()
+    if response.streaming:
+        b"".join(response.streaming_content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "url": url,
+        "method": method.upper(),
+        "status": status,
+        "failed": not 200 <= status < 300,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "queries": max(queries),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def print_results(results, baseline=None):
+    baseline = {row["route"]: row for row in (baseline or {}).get("routes", [])}
+    for row in results["routes"]:
+        if row["failed"]:
+            print(f"{row['route']:<52} {row['status']} FAILED ({row['method']} {row['url']})")
+            continue
+        line = (f"{row['route']:<52} {row['status']} p50={row['p50_ms']:>8}ms p95={row['p95_ms']:>8}ms "
+                f"p99={row['p99_ms']:>8}ms queries={row['queries']:>3} peak={row['peak_kib']:>9}KiB")
+        before = baseline.get(row["route"])
+        if before and not before.get("failed"):
+            line += f"  Δp95={row['p95_ms'] - before['p95_ms']:+.2f}ms Δqueries={row['queries'] - before['queries']:+d}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    datagen.add_arguments(parser)
+    parser.add_argument("--iterations", type=int, default=30, help="Timed requests per route")
+    parser.add_argument("--response-cache", action="store_true", help="Keep the server-side response cache on")
+    parser.add_argument("--output", help="Write JSON results to this file")
+    parser.add_argument("--baseline", help="Earlier JSON results to compare against")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)  # ✅ Expected 404s would otherwise flood the output
+    with bench_database(response_cache=args.response_cache):
+        counts = datagen.generate(**datagen.generator_options(args), log=lambda msg: print(msg, file=sys.stderr))
+        values = sample_values()
+        client = Client()
+        bodies = request_bodies(values)
+
+        routes = []
+        for name, route in iter_routes(api_urls.urlpatterns):
+            url = build_url(name, route, values)
+            if url is None:
+                continue
+            method, body = bodies.get(name, ("get", None))
+            routes.append({"name": name, "route": API_PREFIX + route,
+                           **measure(client, url, args.iterations, method, body)})
+
+    results = {"revision": git_revision(), "data": counts, "iterations": args.iterations, "routes": routes}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+    print_results(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+    failed = [row["route"] for row in routes if row["failed"]]
+    if failed:
+        sys.exit(f"{len(failed)} routes did not answer 2xx: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
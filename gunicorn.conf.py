@@ -0,0 +1,70 @@
+"""
+gunicorn settings (picked up automatically from the working directory):
+
+    gunicorn                                            # WSGI, preloaded and warmed
+    gunicorn profiles_project.asgi:application -k uvicorn_worker.UvicornWorker
+
+The app is imported once in the master (`preload_app`), warmed by
+`profiles_api.warmup` and the GC is frozen before forking, so workers share the
+startup data copy-on-write and serve their first requests hot. Startup time
+and each worker's RSS/PSS are logged.
+"""
+import multiprocessing
+import os
+import time
+
+_started = time.perf_counter()
+
+wsgi_app = "profiles_project.wsgi:application"
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))  # ✅ Recycled workers fork from the warm master too
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+accesslog = os.getenv("GUNICORN_ACCESS_LOG")
+
+
+def on_starting(server):
+    """Metrics files left by a previous master would otherwise keep adding to the totals"""
+    if os.getenv("METRICS_DIR"):
+        from profiles_api.metrics import clear_directory
+
+        clear_directory(os.getenv("METRICS_DIR"))
+
+
+def child_exit(server, worker):
+    """Keep an exited worker's totals without its file (a new worker may reuse the PID)"""
+    if os.getenv("METRICS_DIR"):
+        from profiles_api.metrics import retire_worker
+
+        retire_worker(worker.pid, os.getenv("METRICS_DIR"))
+
+
+def when_ready(server):
+    """App loaded in the master (with preload_app): warm shared structures, then freeze them"""
+    if not server.cfg.preload_app:
+        server.log.info(f"Master ready in {time.perf_counter() - _started:.2f}s (no preload: workers start cold)")
+        return
+
+    from profiles_api.warmup import freeze, process_memory, warm
+
+    for name, (seconds, size) in warm().items():
+        server.log.info(f"Warmed {name}: {size} in {seconds * 1000:.1f}ms")
+    frozen = freeze()
+    memory = process_memory()
+    server.log.info(
+        f"Master ready in {time.perf_counter() - _started:.2f}s, {frozen} objects frozen, "
+        f"RSS {memory.get('rss', 0) / 1024:.1f} MiB"
+    )
+
+
+def post_worker_init(worker):
+    """Report what the worker costs on top of the pages it shares with the master"""
+    from profiles_api.warmup import process_memory
+
+    memory = process_memory()
+    if memory:
+        worker.log.info(
+            f"Worker {worker.pid} ready: RSS {memory['rss'] / 1024:.1f} MiB, "
+            f"PSS {memory['pss'] / 1024:.1f} MiB, shared {memory['shared'] / 1024:.1f} MiB"
+        )
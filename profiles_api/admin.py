@@ -1,16 +1,56 @@
-from django.contrib import admin
+import json
+
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count
+from django.utils.functional import cached_property
+from profiles_api.authentication import forget_users
+from profiles_api.caching import invalidate, products_scope
+from profiles_api.category_tree import CATEGORY_TREE_SCOPE
+from profiles_api.facets import rebuild as rebuild_facets
 from profiles_api.models import UserProfile, HelpCategory, HelpArticle, Category, Product
 
+
+# ✅ Changelists of big tables: never COUNT(*) more rows than needed to draw the paginator
+class ApproximateCountPaginator(Paginator):
+    """
+    Counts exactly up to `limit` rows; beyond that, the planner's row estimate
+    on PostgreSQL, otherwise `limit` (the last pages are reached by filtering).
+    """
+
+    limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        exact = queryset.values("pk")[: self.limit + 1].count()  # ✅ COUNT over a LIMITed subquery
+        if exact <= self.limit:
+            return exact
+        if connections[queryset.db].vendor == "postgresql":
+            plan = json.loads(queryset.explain(format="json"))
+            return max(int(plan[0]["Plan"]["Plan Rows"]), self.limit)
+        return self.limit
+
+
+class ScalableAdminMixin:
+    """Approximate paginator counts, no separate unfiltered COUNT(*)"""
+
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+
 # ✅ Custom User Admin Configuration
-class CustomUserAdmin(UserAdmin):
+class CustomUserAdmin(ScalableAdminMixin, UserAdmin):
     """Customize Django Admin for UserProfile"""
 
     model = UserProfile
     list_display = ("email", "name", "country", "is_staff", "is_active")  # ✅ Display country
     ordering = ("email",)
-    search_fields = ("email", "name", "country")  # ✅ Allow search by country
+    search_fields = ("email", "name", "country")  # ✅ Allow search by country; also backs the created_by autocomplete
     list_filter = ("is_staff", "is_active", "country")  # ✅ Filter by country
+    actions = ["activate_users", "deactivate_users"]
 
     # ✅ Override UserAdmin fields
     fieldsets = (
@@ -30,18 +70,76 @@ class CustomUserAdmin(UserAdmin):
 
     filter_horizontal = ()  # ✅ Remove groups/permissions if not needed
 
+    @admin.action(description="Activate selected users", permissions=["change"])
+    def activate_users(self, request, queryset):
+        updated = queryset.update(is_active=True)  # ✅ One UPDATE, no per-user save()
+        self.message_user(request, f"{updated} users activated.", messages.SUCCESS)
+
+    @admin.action(description="Deactivate selected users", permissions=["change"])
+    def deactivate_users(self, request, queryset):
+        user_ids = list(queryset.exclude(pk=request.user.pk).values_list("pk", flat=True))  # ✅ Never lock yourself out
+        updated = UserProfile.objects.filter(pk__in=user_ids).update(is_active=False)  # ✅ One UPDATE, no signals
+        forget_users(user_ids)  # ✅ ... so drop their cached tokens here
+        self.message_user(request, f"{updated} users deactivated.", messages.SUCCESS)
+
 
 # ✅ Custom Admin for Category with Parent-Child Structure
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(ScalableAdminMixin, admin.ModelAdmin):
     """Admin customization for category hierarchy"""
-    
-    list_display = ("name", "parent")  # ✅ Show parent category
-    search_fields = ("name",)
-    list_filter = ("parent",)  # ✅ Filter by parent category
-    
+
+    list_display = ("hierarchy", "slug", "depth", "product_count")
+    search_fields = ("name", "slug")  # ✅ Also backs the category autocomplete on products
+    list_filter = ("depth",)  # ✅ Filtering by parent would list every category as a choice
+    autocomplete_fields = ("parent",)
+    ordering = ("path",)  # ✅ Subtrees stay together, on the path index
+
     def get_queryset(self, request):
-        """Ensure categories are displayed in a structured order"""
-        return super().get_queryset(request).order_by("parent__name", "name")
+        """Parents joined in, so `str(category)` (changelist, autocomplete) never queries"""
+        return super().get_queryset(request).select_related("parent")
+
+    def get_changelist_instance(self, request):
+        changelist = super().get_changelist_instance(request)
+        # ✅ One query for the ancestors of the whole page and one for its product counts
+        Category.objects.attach_ancestors(changelist.result_list)
+        counts = dict(
+            Product.objects.filter(category__in=changelist.result_list)
+            .values("category").annotate(n=Count("pk")).values_list("category", "n")
+        )
+        for category in changelist.result_list:
+            category.admin_product_count = counts.get(category.pk, 0)
+        return changelist
+
+    @admin.display(description="Category", ordering="path")
+    def hierarchy(self, obj):
+        return " > ".join(category.name for category in [*obj.get_ancestors(), obj])
+
+    @admin.display(description="Products")
+    def product_count(self, obj):
+        return getattr(obj, "admin_product_count", None)
+
+
+class ProductAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    """Products with creator/category joined in and autocomplete instead of full dropdowns"""
+
+    list_display = ("title", "category", "created_by", "country_code", "price", "created_at")
+    list_select_related = ("category__parent", "created_by")  # ✅ `Category.__str__` reads the parent
+    list_filter = ("country_code",)
+    search_fields = ("title", "slug")
+    autocomplete_fields = ("category", "created_by")
+    readonly_fields = ("country_code", "category_slug", "created_at", "updated_at")
+    ordering = ("-created_at", "-id")
+    actions = ["refresh_lookup_keys"]
+
+    @admin.action(description="Recompute SEO keys and facets of selected products", permissions=["change"])
+    def refresh_lookup_keys(self, request, queryset):
+        # ✅ Countries the stale rows leave or join; the others' facets and cached pages are unaffected
+        countries = set()
+        for old, new in queryset.stale_lookup_keys().values_list("country_code", "new_country_code").distinct():
+            countries |= {old, new}
+        updated = queryset.refresh_lookup_keys()  # ✅ One UPDATE; it skips the signals, so redo their work once
+        rebuild_facets(countries=countries - {""})
+        invalidate(CATEGORY_TREE_SCOPE, *(products_scope(country) for country in countries))
+        self.message_user(request, f"{updated} products refreshed.", messages.SUCCESS)
 
 
 # ✅ Register Models in Django Admin
@@ -49,4 +147,4 @@ admin.site.register(UserProfile, CustomUserAdmin)
 admin.site.register(HelpCategory)
 admin.site.register(HelpArticle)
 admin.site.register(Category, CategoryAdmin)  # ✅ Use CategoryAdmin for hierarchy
-admin.site.register(Product)
\ No newline at end of file
+admin.site.register(Product, ProductAdmin)
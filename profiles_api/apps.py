@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class ProfilesApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'profiles_api'
+
+    def ready(self):
+        from . import authentication, metrics, signals  # noqa: F401  ✅ Register signal handlers and the SQL timing hook
@@ -0,0 +1,139 @@
+"""
+Async (ASGI) versions of the product and help read endpoints.
+
+DRF views are sync-only, so these are plain Django async views that use the
+async ORM and render with DRF's JSONRenderer, producing the same payloads as
+their counterparts in `views.py`. Under ASGI one worker serves many slow
+clients or slow geolocation lookups concurrently without a thread per request.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .caching import cache_response, help_scope, products_scope
+from .db_router import read_from_replica
+from .facets import country_facets, facets_requested
+from .filters import ProductFilterSerializer
+from .geo import client_ip, get_resolver
+from .images import image_context
+from .metrics import timed
+from .models import Category, HelpArticle, Product
+from .pagination import ProductCursorPagination
+from .serializers import HelpArticleSerializer, HelpArticleSummarySerializer, ProductRowSerializer, ProductSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def _json(data, status=200):
+    response = HttpResponse(JSONRenderer().render(data), content_type="application/json", status=status)
+    response.data = data  # ✅ Like DRF's Response, so the response cache can read `updated_at`
+    return response
+
+
+# ✅ Non-blocking counterpart of views.get_user_country
+async def aget_user_country(request):
+    """Detect user country from `?country=`, then the (cached, offline) IP lookup, else 'gh'"""
+    country = request.GET.get("country", "").strip().lower()
+    if country:
+        return country
+
+    ip = client_ip(request)
+    if ip and ip != "127.0.0.1":  # ✅ Ignore localhost in development
+        with timed("geolocation"):
+            country_code = await get_resolver().aresolve(ip)
+        if country_code:
+            return country_code
+
+    return "gh"
+
+
+async def _country_scope(request, country=None, **kwargs):
+    return products_scope(country or await aget_user_country(request))
+
+
+# ✅ Async API: List products filtered by URL or detected country
+@read_from_replica
+@cache_response(_country_scope)
+async def async_products(request, country=None):
+    """
+    Async counterpart of `api_products` (same cursor pages, filters and sort orders).
+    Supports:
+    - `/api/async/gh/products/`
+    - `/api/async/products/` (country from `?country=` or IP lookup)
+    """
+    if not country:
+        country = await aget_user_country(request)
+
+    filters = ProductFilterSerializer(data=request.GET)
+    if not await sync_to_async(filters.is_valid)():  # ✅ `?category=` is checked against the database
+        return _json(filters.errors, status=400)
+    products = ProductRowSerializer.queryset(filters.filter(Product.objects.filter(country_code=country.lower())))
+
+    # ✅ DRF pagination is sync; it runs on the same thread-sensitive executor the async ORM uses
+    paginator = ProductCursorPagination()
+    page = await sync_to_async(paginator.paginate_queryset)(products, Request(request))
+
+    if not page and not filters.narrowed and not request.GET.get(paginator.cursor_query_param):
+        logger.info(f"No products found for country: {country}")
+        return _json({"message": "No products found for this country."}, status=404)
+
+    context = image_context(request, listing=True)
+    data = await sync_to_async(lambda: ProductRowSerializer(page, context=context).data)()  # ✅ One ancestor-name query
+    data = paginator.get_paginated_response(data).data
+    if facets_requested(request.GET):
+        data["facets"] = await sync_to_async(country_facets)(country)
+    return _json(data)
+
+
+# ✅ Async API: Fetch product by SEO-friendly URL format
+@read_from_replica
+@cache_response(_country_scope)
+async def async_product_detail(request, country=None, subcategory=None, slug=None):
+    """Async counterpart of `api_product_detail` (`/api/async/gh/mobile-phones/samsung-galaxy-s20/`)"""
+    if not country:
+        country = await aget_user_country(request)
+
+    product = await (
+        Product.objects.select_related("created_by", "category")
+        .filter(country_code=country.lower(), category_slug=subcategory, slug=slug)
+        .afirst()
+    )
+    if product is None:
+        logger.warning(f"Product not found for slug: {slug} in {country}/{subcategory}")
+        return _json({"error": "Product not found."}, status=404)
+
+    await Category.objects.aattach_ancestors([product.category])
+    return _json(ProductSerializer(product, context=image_context(request)).data)
+
+
+# ✅ Async API: Fetch all help articles
+@read_from_replica
+@cache_response(lambda request, **kwargs: help_scope())
+async def async_help_root(request):
+    """Async counterpart of `api_help_root` (supports `?search=keyword` and `?summary=true`)"""
+    search_query = request.GET.get("search", "").strip().lower()
+    articles = HelpArticle.objects.all()
+    serializer_class = HelpArticleSerializer
+
+    if search_query:
+        articles = articles.filter(title__icontains=search_query)
+    if HelpArticleSummarySerializer.requested(request.GET):
+        articles = articles.defer(*HelpArticleSummarySerializer.Meta.exclude)
+        serializer_class = HelpArticleSummarySerializer
+
+    return _json(serializer_class([article async for article in articles], many=True).data)
+
+
+# ✅ Async API: Fetch a specific help article by slug
+@read_from_replica
+@cache_response(lambda request, slug, **kwargs: help_scope(slug))
+async def async_help_detail(request, slug):
+    """Async counterpart of `api_help_detail`"""
+    article = await HelpArticle.objects.filter(slug=slug).afirst()
+    if article is None:
+        logger.warning(f"Help article not found: {slug}")
+        return _json({"error": "Article not found"}, status=404)
+    return _json(HelpArticleSerializer(article).data)
@@ -0,0 +1,102 @@
+"""
+DRF token authentication without a database query per request.
+
+`CachedTokenAuthentication` keeps a bounded, per-process TTL cache of
+token key → snapshot of the token and its (active) user. Within a process,
+deleting a token or saving/deleting a `UserProfile` drops the affected
+entries at once (signal handlers below; bulk updates call `forget_users`). Other workers keep serving their
+snapshot until it expires, so a revocation takes effect everywhere within
+`AUTH_TOKEN_CACHE_TTL` seconds.
+
+Hits and misses are counted in `auth_token_cache_total` on `/metrics/`;
+`stats()` gives this process's hit rate.
+"""
+import threading
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .geo import TTLCache
+from .metrics import registry
+from .models import UserProfile
+
+# ✅ Everything but the password hash: enough for request.user and permission checks
+USER_FIELDS = tuple(
+    field.attname for field in UserProfile._meta.concrete_fields if field.name != "password"
+)
+
+# ✅ Saving only other fields leaves cached snapshots valid
+SNAPSHOT_FIELDS = set(USER_FIELDS) - {"last_login"}
+
+token_cache = TTLCache(
+    getattr(settings, "AUTH_TOKEN_CACHE_SIZE", 10000),
+    getattr(settings, "AUTH_TOKEN_CACHE_TTL", 60),
+)
+
+_counts = {"hit": 0, "miss": 0}
+_counts_lock = threading.Lock()
+
+
+def _count(result):
+    with _counts_lock:
+        _counts[result] += 1
+    registry.count("auth_token_cache_total", result=result)
+
+
+def stats():
+    """This process's `{hits, misses, hit_rate, size}`"""
+    with _counts_lock:
+        hits, misses = _counts["hit"], _counts["miss"]
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": hits / total if total else None, "size": len(token_cache)}
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """`Authorization: Token <key>`, resolved from the in-process cache when possible"""
+
+    def authenticate_credentials(self, key):
+        snapshot = token_cache.get(key)
+        if snapshot is not None:
+            _count("hit")
+            return self._restore(key, snapshot)
+
+        _count("miss")
+        user, token = super().authenticate_credentials(key)  # ✅ Raises for unknown keys and inactive users
+        token_cache.set(key, (token.created, tuple(getattr(user, name) for name in USER_FIELDS)))
+        return user, token
+
+    @staticmethod
+    def _restore(key, snapshot):
+        # ✅ Fresh instances per request: nothing mutable is shared between threads
+        created, values = snapshot
+        user = UserProfile.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, values)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed("User inactive or deleted.")
+        token = Token(key=key, user=user, created=created)
+        token._state.adding = False
+        return user, token
+
+
+@receiver(post_delete, sender=Token)
+def forget_token(sender, instance, **kwargs):
+    token_cache.pop(instance.key)
+
+
+def forget_users(user_ids):
+    """Drop the cached tokens of `user_ids` in this process (for bulk updates that send no signals)"""
+    for key in Token.objects.filter(user_id__in=user_ids).values_list("key", flat=True):
+        token_cache.pop(key)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def forget_user_tokens(sender, instance, update_fields=None, **kwargs):
+    """Any change to the user (deactivation, permissions) re-reads them on the next request"""
+    if update_fields is not None and not SNAPSHOT_FIELDS & set(update_fields):
+        return  # ✅ e.g. `last_login` on every login: no Token query
+    forget_users([instance.pk])
@@ -0,0 +1,178 @@
+"""
+Server-side response cache with conditional GET support.
+
+Rendered bodies are cached per URL under a *scope* (e.g. `products:gh`,
+`help:shipping`). Each scope has a generation counter; signal handlers in
+`profiles_api.signals` bump it when the underlying rows change, which makes
+every cached body of that scope unreachable at once. Hits are served with
+ETag/Last-Modified and answer conditional requests with 304, without touching
+the ORM.
+"""
+import hashlib
+import math
+import time
+from functools import wraps
+from inspect import isawaitable
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+
+from . import db_router
+
+
+def _generation_key(scope):
+    return f"response-gen:{scope}"
+
+
+def _new_generation():
+    # ✅ Time-based seed, so an evicted counter never resurrects stale entries
+    return int(time.time() * 1000)
+
+
+def get_generation(scope):
+    return cache.get_or_set(_generation_key(scope), _new_generation, timeout=None)
+
+
+def _invalidated_key(scope):
+    return f"response-invalidated:{scope}"
+
+
+def invalidate(*scopes):
+    """Bump the generation of each scope, dropping all its cached responses"""
+    scopes = set(scopes)
+    for scope in scopes:
+        try:
+            cache.incr(_generation_key(scope))
+        except ValueError:
+            cache.set(_generation_key(scope), _new_generation(), timeout=None)
+    lag = db_router.replica_lag()
+    if lag:
+        # ✅ Replicas may not have the change yet: see `_cacheable`
+        cache.set_many({_invalidated_key(scope): 1 for scope in scopes}, timeout=math.ceil(lag))
+
+
+def _cacheable(scope):
+    """Whether a freshly rendered body of `scope` may be stored (not replica rows that may predate an invalidation)"""
+    return not db_router.reading_from_replica() or cache.get(_invalidated_key(scope)) is None
+
+
+async def _acacheable(scope):
+    return not db_router.reading_from_replica() or await cache.aget(_invalidated_key(scope)) is None
+
+
+def _last_modified(data):
+    """
+    `updated_at` of a serialized single object. Lists and cursor pages get none:
+    deleting an item or moving it out of the list doesn't raise the newest
+    `updated_at`, so If-Modified-Since would answer 304 for a stale list (ETag still works).
+    """
+    if not isinstance(data, dict) or "results" in data or not data.get("updated_at"):
+        return None
+    return int(parse_datetime(data["updated_at"]).timestamp())
+
+
+def _conditional(request, entry, response=None):
+    if response is None:
+        response = HttpResponse(entry["content"], content_type=entry["content_type"])
+        for header, value in entry["headers"].items():
+            response[header] = value
+    response["ETag"] = entry["etag"]
+    if entry["last_modified"]:
+        response["Last-Modified"] = http_date(entry["last_modified"])
+    return get_conditional_response(
+        request, etag=entry["etag"], last_modified=entry["last_modified"], response=response
+    )
+
+
+def _cache_key(request, scope, generation):
+    variant = f"{request.get_full_path()}|{request.META.get('HTTP_ACCEPT', '')}"
+    return f"response:{scope}:{generation}:{hashlib.md5(variant.encode()).hexdigest()}"
+
+
+def _cache_entry(response):
+    """Cacheable snapshot of a rendered 200 response (None if it must not be cached)"""
+    if response.status_code != 200 or response.streaming:
+        return None
+    if hasattr(response, "render"):
+        response.render()
+    return {
+        "content": response.content,
+        "content_type": response["Content-Type"],
+        "etag": f'"{hashlib.md5(response.content).hexdigest()}"',
+        "last_modified": _last_modified(getattr(response, "data", None)),
+        "headers": {header: response[header] for header in ("Allow", "Vary") if header in response},
+    }
+
+
+def cache_response(scope_func):
+    """
+    Cache successful GET responses of a view under `scope_func(request, **kwargs)`.
+    The key also covers the full path (query string included) and Accept header.
+    Works for sync and async views (an async view may use an async `scope_func`).
+    """
+
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @wraps(view)
+            async def async_wrapped(request, *args, **kwargs):
+                if request.method not in ("GET", "HEAD"):
+                    return await view(request, *args, **kwargs)
+
+                scope = scope_func(request, **kwargs)
+                if isawaitable(scope):
+                    scope = await scope
+                generation = await cache.aget_or_set(_generation_key(scope), _new_generation, timeout=None)
+                key = _cache_key(request, scope, generation)
+
+                entry = await cache.aget(key)
+                if entry is not None:
+                    return _conditional(request, entry)
+
+                response = await view(request, *args, **kwargs)
+                entry = _cache_entry(response)
+                if entry is None:
+                    return response
+                if not await _acacheable(scope):
+                    return _conditional(request, entry, response)
+                await cache.aset(key, entry, getattr(settings, "RESPONSE_CACHE_TIMEOUT", 3600))
+                return _conditional(request, entry, response)
+
+            return async_wrapped
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            scope = scope_func(request, **kwargs)
+            key = _cache_key(request, scope, get_generation(scope))
+
+            entry = cache.get(key)
+            if entry is not None:
+                return _conditional(request, entry)
+
+            response = view(request, *args, **kwargs)
+            entry = _cache_entry(response)
+            if entry is None:
+                return response
+            if not _cacheable(scope):
+                return _conditional(request, entry, response)
+            cache.set(key, entry, getattr(settings, "RESPONSE_CACHE_TIMEOUT", 3600))
+            return _conditional(request, entry, response)
+
+        return wrapped
+
+    return decorator
+
+
+def products_scope(country):
+    return f"products:{(country or '').lower()}"
+
+
+def help_scope(slug=None):
+    return f"help:{slug}" if slug else "help"
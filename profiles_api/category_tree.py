@@ -0,0 +1,79 @@
+"""
+Whole category tree, with product counts, from an in-process snapshot.
+
+The snapshot (nested nodes plus the pre-rendered JSON body) is built with one
+query and tagged with the version of the `category-tree` scope, a counter in
+the shared cache that `profiles_api.signals` bumps whenever a Category
+changes or a product is added, removed or moved to another category. Each
+request only compares that version; the tree is rebuilt when it moved.
+
+The rebuild reads the primary even under `read_from_replica`: a snapshot is
+kept until the next bump, so one built from a lagging replica would serve the
+old tree for as long as the categories stay unchanged.
+"""
+import json
+import threading
+
+from django.db.models import Count
+from rest_framework.utils.encoders import JSONEncoder
+
+from .caching import get_generation
+from .models import Category
+
+CATEGORY_TREE_SCOPE = "category-tree"
+
+
+class CategoryTreeSnapshot:
+    """Immutable rendered tree for one version"""
+
+    __slots__ = ("version", "nodes", "content", "etag")
+
+    def __init__(self, version, nodes):
+        self.version = version
+        self.nodes = nodes
+        self.content = json.dumps(nodes, cls=JSONEncoder, separators=(",", ":")).encode()
+        self.etag = f'"category-tree-{version}"'
+
+
+def build_tree():
+    """
+    Nested `{id, name, slug, product_count, total_product_count, children}` nodes, roots first.
+    `product_count` counts a category's own products, `total_product_count` its whole subtree.
+    """
+    rows = list(
+        Category.objects.using("default").annotate(product_count=Count("products"))
+        .order_by("depth", "name")
+        .values("id", "name", "slug", "parent_id", "product_count")
+    )
+    nodes = {row["id"]: {
+        "id": row["id"], "name": row["name"], "slug": row["slug"],
+        "product_count": row["product_count"], "total_product_count": row["product_count"], "children": [],
+    } for row in rows}
+
+    roots = []
+    for row in rows:  # ✅ Children end up sorted by name
+        parent = nodes.get(row["parent_id"])
+        (parent["children"] if parent else roots).append(nodes[row["id"]])
+
+    for row in reversed(rows):  # ✅ Deepest first: roll subtree totals up to the roots
+        parent = nodes.get(row["parent_id"])
+        if parent:
+            parent["total_product_count"] += nodes[row["id"]]["total_product_count"]
+    return roots
+
+
+_snapshot = None
+_lock = threading.Lock()
+
+
+def get_snapshot():
+    """Current snapshot, rebuilt (once per process and version) when the version stamp moved"""
+    global _snapshot
+    version = get_generation(CATEGORY_TREE_SCOPE)  # ✅ Read before building: a bump mid-build triggers another rebuild
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    with _lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = CategoryTreeSnapshot(version, build_tree())
+        return _snapshot
@@ -0,0 +1,119 @@
+"""
+Change feed for incremental sync of products and help articles.
+
+`read_changes(cursor)` returns what was created, updated or deleted after the
+cursor, oldest first, as three keyset-paginated streams:
+
+- `products`, ordered by (`updated_at`, `id`) on `product_updated_idx`
+- `help_articles`, ordered by (`updated_at`, `id`) on `help_article_updated_idx`
+- `deleted`, `Tombstone` rows (written by `profiles_api.signals`) by (`deleted_at`, `id`)
+
+The opaque cursor holds the last (timestamp, id) seen in each stream, so a
+sync costs a few index range scans proportional to the amount of change.
+Rows younger than `CHANGES_SETTLE_SECONDS` are held back: a transaction that
+commits late with an earlier `updated_at` (or a lagging replica) is still
+seen on a later call instead of being skipped. Cursors older than the
+tombstone retention get `CursorExpired` (the consumer must resync).
+"""
+import base64
+import binascii
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import HelpArticle, Product, Tombstone
+from .serializers import HelpArticleSerializer, ProductRowSerializer
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class CursorExpired(Exception):
+    pass
+
+
+def encode_cursor(positions):
+    data = {stream: [stamp.isoformat(), pk] for stream, (stamp, pk) in positions.items()}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """`{stream: (datetime, id)}` from a cursor token (empty for no cursor)"""
+    if not token:
+        return {}
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        if not isinstance(data, dict):
+            raise TypeError(data)
+        positions = {stream: (parse_datetime(stamp), int(pk)) for stream, (stamp, pk) in data.items()}
+    except (ValueError, TypeError, AttributeError, binascii.Error):
+        raise InvalidCursor("Malformed cursor.")
+    if not positions.keys() <= STREAMS.keys():
+        raise InvalidCursor("Malformed cursor.")
+    # ✅ Naive stamps can't be compared with the aware timestamp columns
+    if any(stamp is None or timezone.is_naive(stamp) for stamp, _ in positions.values()):
+        raise InvalidCursor("Malformed cursor.")
+    return positions
+
+
+def _tombstones():
+    return Tombstone.objects.values("id", "kind", "object_id", "key", "deleted_at")
+
+
+STREAMS = {
+    # ✅ stream: (rows, timestamp field); rows are dicts with "id" or model instances
+    "products": (lambda: ProductRowSerializer.queryset(Product.objects.all()), "updated_at"),
+    "help_articles": (lambda: HelpArticle.objects.all(), "updated_at"),
+    "deleted": (_tombstones, "deleted_at"),
+}
+
+
+def _page(stream, position, horizon, limit):
+    """Up to `limit` rows after `position` (and before `horizon`), their last position and whether more exist"""
+    rows, field = STREAMS[stream]
+    rows = rows().filter(**{f"{field}__lt": horizon})
+    if position is not None:
+        stamp, pk = position
+        # ✅ (field, id) > (stamp, pk) as an index range plus a filter on its first key
+        rows = rows.filter(**{f"{field}__gte": stamp}).exclude(**{field: stamp, "pk__lte": pk})
+    rows = list(rows.order_by(field, "pk")[: limit + 1])
+    page, more = rows[:limit], len(rows) > limit
+    if more:
+        last = page[-1]
+        position = (last[field], last["id"]) if isinstance(last, dict) else (getattr(last, field), last.pk)
+    else:
+        position = (horizon, 0)  # ✅ Caught up: quiet streams move forward too, so cursors don't age out
+    return page, position, more
+
+
+def read_changes(cursor=None, limit=500, context=None):
+    """
+    One page of each stream after `cursor`: `{products, help_articles, deleted,
+    next_cursor, has_more}`. Pass `next_cursor` back until `has_more` is false.
+    """
+    positions = decode_cursor(cursor)
+    now = timezone.now()
+    retention = timedelta(days=getattr(settings, "CHANGES_TOMBSTONE_RETENTION_DAYS", 30))
+    if "deleted" in positions and positions["deleted"][0] < now - retention:
+        raise CursorExpired("Cursor is older than the tombstone retention; resync from scratch.")
+    horizon = now - timedelta(seconds=getattr(settings, "CHANGES_SETTLE_SECONDS", 5))
+
+    result, has_more = {}, False
+    for stream in STREAMS:
+        result[stream], positions[stream], more = _page(stream, positions.get(stream), horizon, limit)
+        has_more |= more
+
+    return {
+        "products": ProductRowSerializer(result["products"], context=context).data,
+        "help_articles": HelpArticleSerializer(result["help_articles"], many=True).data,
+        "deleted": [
+            {"type": row["kind"], "id": row["object_id"], "key": row["key"], "deleted_at": row["deleted_at"]}
+            for row in result["deleted"]
+        ],
+        "next_cursor": encode_cursor(positions),
+        "has_more": has_more,
+    }
@@ -0,0 +1,159 @@
+"""
+Read-replica routing.
+
+Writes always go to `default` (the primary). Reads go to one of
+`DATABASE_REPLICAS` only inside views decorated with `@read_from_replica`
+(the public product/help read endpoints); the admin, the viewsets and
+management commands keep reading from the primary.
+
+Two rules keep replica lag from leaking into a client's responses:
+- within a request, every read after a write sticks to the primary
+- `ReplicaStickinessMiddleware` gives a client that wrote a cookie; for
+  `DATABASE_REPLICA_LAG` seconds its replica-routed reads use the primary
+  too. Other clients keep reading from the replicas.
+
+The response cache does not store bodies read from a replica during the
+lag window after their scope was invalidated (see `caching.cache_response`),
+so another client's lagging read cannot re-cache rows from before the write.
+"""
+import contextvars
+import math
+import random
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = "use_primary_db"
+
+_state = contextvars.ContextVar("db_routing", default=None)
+_client = contextvars.ContextVar("db_routing_client", default=None)
+
+
+class _RoutingState:
+    __slots__ = ("replica", "stuck")
+
+    def __init__(self):
+        self.replica = None  # ✅ Chosen once per request, so one request sees one replica
+        self.stuck = False
+
+
+class _ClientState:
+    __slots__ = ("pinned", "wrote")
+
+    def __init__(self, pinned=False):
+        self.pinned = pinned  # ✅ This client wrote within the lag window (cookie)
+        self.wrote = False
+
+
+def replica_lag():
+    """Seconds a client's reads stay on the primary after it wrote (0: replicas off or no lag)"""
+    if not getattr(settings, "DATABASE_REPLICAS", []):
+        return 0
+    return getattr(settings, "DATABASE_REPLICA_LAG", 0)
+
+
+def _enter():
+    state = _RoutingState()
+    replicas = getattr(settings, "DATABASE_REPLICAS", [])
+    client = _client.get()
+    if not replicas or (client is not None and client.pinned):
+        state.stuck = True
+    else:
+        state.replica = random.choice(replicas)
+    return _state.set(state)
+
+
+def reading_from_replica():
+    """Whether reads at this point of the request go to a replica"""
+    state = _state.get()
+    return state is not None and not state.stuck
+
+
+def read_from_replica(view):
+    """Let a read-only view's queries go to a replica (sync or async view)"""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            token = _enter()
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                _state.reset(token)
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = _enter()
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _state.reset(token)
+    return wrapper
+
+
+class ReplicaStickinessMiddleware:
+    """Keep a client that just wrote on the primary for `DATABASE_REPLICA_LAG` seconds (sync and async)"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        client = _ClientState(pinned=STICKY_COOKIE in request.COOKIES)
+        token = _client.set(client)
+        try:
+            response = self.get_response(request)
+        finally:
+            _client.reset(token)
+        return self._stick(client, response)
+
+    async def __acall__(self, request):
+        client = _ClientState(pinned=STICKY_COOKIE in request.COOKIES)
+        token = _client.set(client)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _client.reset(token)
+        return self._stick(client, response)
+
+    @staticmethod
+    def _stick(client, response):
+        lag = replica_lag()
+        if client.wrote and lag:
+            # ✅ The browser drops it when the lag is over: no server-side state, no cache round trip per write
+            response.set_cookie(STICKY_COOKIE, "1", max_age=math.ceil(lag), httponly=True, samesite="Lax")
+        return response
+
+
+class ReplicaRouter:
+    """`DATABASE_ROUTERS` entry: replica reads for `@read_from_replica` views, everything else on the primary"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.stuck:
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.stuck = True  # ✅ Read-your-writes for the rest of the request
+        client = _client.get()
+        if client is not None:
+            client.wrote = True  # ✅ ... and for this client's next requests (cookie)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # ✅ Replicas hold the same data as the primary
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return None  # ✅ No opinion: `migrate --database replica1` sets up a local SQLite replica
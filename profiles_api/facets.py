@@ -0,0 +1,128 @@
+"""
+Incrementally maintained facet counts per (country, category).
+
+`CategoryFacet` rows hold, per country, the number of products directly in
+each category and in its whole subtree. Signal handlers in
+`profiles_api.signals` turn product creates/deletes/moves and creator
+country changes (and category moves) into deltas; `apply_deltas` adds them to the category and
+every ancestor with a few UPDATEs, never a GROUP BY over products.
+`rebuild` (and `manage.py rebuild_facets`) recomputes everything.
+"""
+from collections import Counter, defaultdict
+
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Count, F
+
+from .models import Category, CategoryFacet, Product
+
+
+def apply_deltas(deltas, subtree_only=False):
+    """
+    Add `{(country_code, category_id): delta}` to the direct counts of each
+    category and to the subtree counts of it and all its ancestors
+    (`subtree_only`: leave the direct counts alone, e.g. for a moved subtree).
+    """
+    deltas = {key: delta for key, delta in deltas.items() if key[0] and delta}
+    if not deltas:
+        return
+
+    paths = dict(Category.objects.filter(pk__in={pk for _, pk in deltas}).values_list("pk", "path"))
+    direct, subtree = Counter(), Counter()
+    for (country, category_id), delta in deltas.items():
+        if category_id not in paths:
+            continue  # ✅ Category deleted; its facet rows went with it
+        if not subtree_only:
+            direct[country, category_id] += delta
+        for pk in paths[category_id].split(Category.PATH_SEPARATOR)[:-1] or [category_id]:
+            subtree[country, int(pk)] += delta
+
+    with transaction.atomic():
+        CategoryFacet.objects.bulk_create(
+            [CategoryFacet(country_code=country, category_id=pk) for country, pk in subtree],
+            ignore_conflicts=True,  # ✅ Rows that already exist keep their counts
+        )
+        # ✅ One UPDATE per (country, delta) group: usually just +1 or -1 for the whole chain
+        for field, counter in (("product_count", direct), ("subtree_count", subtree)):
+            groups = defaultdict(list)
+            for (country, pk), delta in counter.items():
+                if delta:
+                    groups[country, delta].append(pk)
+            for (country, delta), pks in groups.items():
+                CategoryFacet.objects.filter(country_code=country, category_id__in=pks).update(
+                    **{field: F(field) + delta}
+                )
+
+
+def creator_deltas(user, old_country, new_country):
+    """Deltas moving all of `user`'s products from one country to another"""
+    deltas = Counter()
+    if old_country == new_country:
+        return deltas
+    for row in Product.objects.filter(created_by=user).values("category_id").annotate(n=Count("pk")):
+        deltas[old_country, row["category_id"]] -= row["n"]
+        deltas[new_country, row["category_id"]] += row["n"]
+    return deltas
+
+
+def move_deltas(category, old_parent_id):
+    """
+    `apply_deltas(..., subtree_only=True)` input moving `category`'s subtree
+    totals from its old parent's chain to its new one (one indexed query).
+    The subtree's own rows don't change: the same products stay below it.
+    """
+    deltas = Counter()
+    totals = CategoryFacet.objects.filter(category=category, subtree_count__gt=0).values_list("country_code", "subtree_count")
+    for country, n in totals:
+        deltas[country, old_parent_id] -= n
+        deltas[country, category.parent_id] += n
+    return deltas
+
+
+def rebuild(using=DEFAULT_DB_ALIAS, countries=None):
+    """
+    Recompute every facet from the products (one GROUP BY plus a roll-up over `parent`),
+    or only those of `countries`.
+    """
+    parents = dict(Category.objects.using(using).values_list("pk", "parent_id"))
+    products = Product.objects.using(using).exclude(country_code="")
+    facets = CategoryFacet.objects.using(using).all()
+    if countries is not None:
+        products = products.filter(country_code__in=countries)
+        facets = facets.filter(country_code__in=countries)
+    direct = Counter()
+    for row in products.values("country_code", "category_id").annotate(n=Count("pk")):
+        direct[row["country_code"], row["category_id"]] += row["n"]
+
+    subtree = Counter()
+    for (country, pk), n in direct.items():
+        seen = set()
+        while pk is not None and pk not in seen:  # ✅ Walks `parent`, so it is right even before paths are rewritten
+            seen.add(pk)
+            subtree[country, pk] += n
+            pk = parents.get(pk)
+
+    with transaction.atomic(using=using):
+        facets.delete()
+        CategoryFacet.objects.using(using).bulk_create(
+            [CategoryFacet(country_code=country, category_id=pk, product_count=direct[country, pk], subtree_count=n)
+             for (country, pk), n in subtree.items()],
+            batch_size=1000,
+        )
+    return len(subtree)
+
+
+def country_facets(country):
+    """Non-empty categories for a country, shallowest first, with direct and subtree counts"""
+    return list(
+        CategoryFacet.objects.filter(country_code=country.lower(), subtree_count__gt=0)
+        .order_by("category__depth", "category__name")
+        .values(
+            "category_id", "product_count", "subtree_count",
+            slug=F("category__slug"), name=F("category__name"), parent_id=F("category__parent_id"),
+        )
+    )
+
+
+def facets_requested(query_params):
+    """`?facets=true` on a product listing adds the country's category facets to the response"""
+    return query_params.get("facets", "").strip().lower() in ("1", "true", "yes")
@@ -0,0 +1,75 @@
+"""
+Server-side filters and sort orders for product listings.
+
+    ?min_price=10&max_price=99.99        price range (inclusive)
+    ?category=phones                     the category and all its subcategories
+    ?created_after=2024-01-01&created_before=2024-02-01T12:00:00Z
+    ?sort=newest|oldest|price|-price     default newest
+
+Every combination is served by a `Product` index that starts with
+`country_code` (see `Product.Meta.indexes`); a category subtree is a prefix
+match on the indexed `Category.path` (a pattern-ops index on PostgreSQL).
+"""
+from decimal import Decimal
+
+from rest_framework import serializers
+
+from .models import Category
+
+SORTS = {
+    "newest": ("-created_at", "-id"),  # ✅ product_country_recent_idx
+    "oldest": ("created_at", "id"),
+    "price": ("price", "id"),  # ✅ product_country_price_idx
+    "-price": ("-price", "-id"),
+}
+DEFAULT_SORT = "newest"
+
+
+class ProductFilterSerializer(serializers.Serializer):
+    """Validates listing query parameters (unknown parameters are ignored) and applies them"""
+
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal(0), required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal(0), required=False)
+    category = serializers.SlugField(required=False)
+    created_after = serializers.DateTimeField(required=False)
+    created_before = serializers.DateTimeField(required=False)
+    sort = serializers.ChoiceField(choices=list(SORTS), default=DEFAULT_SORT)
+
+    def validate_category(self, slug):
+        path = Category.objects.filter(slug=slug).values_list("path", flat=True).first()
+        if path is None:
+            raise serializers.ValidationError("Unknown category.")
+        return path
+
+    def validate(self, attrs):
+        if "min_price" in attrs and "max_price" in attrs and attrs["min_price"] > attrs["max_price"]:
+            raise serializers.ValidationError({"max_price": "Must not be lower than min_price."})
+        if "created_after" in attrs and "created_before" in attrs and attrs["created_after"] > attrs["created_before"]:
+            raise serializers.ValidationError({"created_before": "Must not be earlier than created_after."})
+        return attrs
+
+    @property
+    def narrowed(self):
+        """Whether any filter (not just a sort order) was given"""
+        return any(name in self.validated_data for name in self.fields if name != "sort")
+
+    @property
+    def ordering(self):
+        return SORTS[self.validated_data["sort"]]
+
+    def filter(self, products):
+        """`products` narrowed by the validated parameters (ordering is left to the caller/paginator)"""
+        data = self.validated_data
+        lookups = {
+            "price__gte": data.get("min_price"),
+            "price__lte": data.get("max_price"),
+            "created_at__gte": data.get("created_after"),
+            "created_at__lt": data.get("created_before"),
+        }
+        products = products.filter(**{lookup: value for lookup, value in lookups.items() if value is not None})
+
+        path = data.get("category")
+        if path:
+            # ✅ Same lookup as `Product.objects.in_category`: a prefix match on the indexed path
+            products = products.filter(category__path__startswith=path)
+        return products
@@ -0,0 +1,284 @@
+"""
+Offline IP → country resolution.
+
+The hot path never touches the network:
+- a local IP-range table (CSV: `start_ip,end_ip,country_code`) is loaded once
+  into compact sorted arrays and searched with `bisect`
+- a bounded per-IP LRU/TTL cache sits in front of it
+- the ipapi.co lookup is only used as an optional, time-boxed fallback
+  (`GEOIP_REMOTE_FALLBACK = True`)
+"""
+import bisect
+import csv
+import ipaddress
+import logging
+import threading
+import time
+from array import array
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+UNKNOWN_COUNTRY = "-"  # ✅ ip2location's placeholder for unassigned ranges
+
+
+def _to_address(value):
+    """Accept `1.2.3.4`, `::1` or an already-numeric address (`16909060`)"""
+    value = str(value).strip()
+    return ipaddress.ip_address(int(value) if value.isdigit() else value)
+
+
+def _country(code):
+    """Lowercase country code, or None for a missing code or the `"-"` placeholder"""
+    code = (code or "").strip().lower()
+    return None if code in ("", UNKNOWN_COUNTRY) else code
+
+
+class IPRangeTable:
+    """Sorted, non-overlapping IP ranges mapped to country codes"""
+
+    skipped_rows = 0
+
+    def __init__(self, ranges=()):
+        # ✅ One table per address family: IPv4 fits in 32-bit arrays, IPv6 needs Python ints
+        self._starts = {4: array("I"), 6: []}
+        self._ends = {4: array("I"), 6: []}
+        self._codes = {4: array("H"), 6: array("H")}
+        self._code_names = []
+        code_index = {}
+
+        for version, start, end, code in sorted(self._normalize(ranges)):
+            if code not in code_index:
+                code_index[code] = len(self._code_names)
+                self._code_names.append(code)
+            self._starts[version].append(start)
+            self._ends[version].append(end)
+            self._codes[version].append(code_index[code])
+
+    @staticmethod
+    def _normalize(ranges):
+        for start, end, code in ranges:
+            code = _country(code)
+            if code is None:
+                continue
+            start, end = _to_address(start), _to_address(end)
+            if start.version != end.version:
+                raise ValueError(f"Mixed address families: {start} - {end}")
+            yield start.version, int(start), int(end), code  # ✅ `::1` stays IPv6 even though it is small
+
+    @classmethod
+    def from_csv(cls, path):
+        """
+        Load a `start_ip,end_ip,country_code` CSV (db-ip / ip2location lite layout).
+        Header and malformed rows are skipped and counted in `skipped_rows`.
+        """
+        skipped = 0
+
+        def rows(reader):
+            nonlocal skipped
+            for row in reader:
+                if not row or row[0].startswith("#"):
+                    continue
+                try:
+                    start, end, code = _to_address(row[0]), _to_address(row[1]), row[2]
+                    if start.version != end.version:
+                        raise ValueError(row)
+                except (IndexError, ValueError):
+                    skipped += 1
+                    continue
+                yield start, end, code
+
+        with open(path, newline="", encoding="utf-8") as fh:
+            table = cls(rows(csv.reader(fh)))
+        if skipped:
+            logger.warning(f"GeoIP ranges file {path}: skipped {skipped} unparsable rows")
+        table.skipped_rows = skipped
+        return table
+
+    def __len__(self):
+        return len(self._starts[4]) + len(self._starts[6])
+
+    def lookup(self, ip):
+        """Return the lowercase country code for `ip`, or None if it is not covered"""
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+
+        value = int(addr)
+        starts = self._starts[addr.version]
+        i = bisect.bisect_right(starts, value) - 1
+        if i >= 0 and value <= self._ends[addr.version][i]:
+            return self._code_names[self._codes[addr.version][i]]
+        return None
+
+
+class TTLCache:
+    """Thread-safe bounded LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, _MISSING)
+        return default if entry is _MISSING else entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CountryResolver:
+    """Resolve client IPs to lowercase country codes without network I/O in the hot path"""
+
+    def __init__(self, table=None, cache_size=10000, cache_ttl=3600, remote_fallback=False, remote_timeout=0.5):
+        self.table = table if table is not None else IPRangeTable()
+        self.cache = TTLCache(cache_size, cache_ttl)
+        self.remote_fallback = remote_fallback
+        self.remote_timeout = remote_timeout
+
+    @classmethod
+    def from_settings(cls):
+        """Build a resolver from the `GEOIP_*` settings"""
+        path = getattr(settings, "GEOIP_RANGES_FILE", None)
+        table = None
+        if path:
+            try:
+                table = IPRangeTable.from_csv(path)
+            except OSError:
+                logger.warning(f"GeoIP ranges file not found: {path}")
+            except ValueError as e:  # ✅ e.g. not UTF-8: resolve without the table rather than fail every request
+                logger.error(f"GeoIP ranges file {path} could not be read: {e}")
+
+        return cls(
+            table=table,
+            cache_size=getattr(settings, "GEOIP_CACHE_SIZE", 10000),
+            cache_ttl=getattr(settings, "GEOIP_CACHE_TTL", 3600),
+            remote_fallback=getattr(settings, "GEOIP_REMOTE_FALLBACK", False),
+            remote_timeout=getattr(settings, "GEOIP_REMOTE_TIMEOUT", 0.5),
+        )
+
+    def resolve(self, ip):
+        """Return the country code for `ip` or None (misses are cached too)"""
+        if not ip:
+            return None
+
+        country = self.cache.get(ip, _MISSING)
+        if country is not _MISSING:
+            return country
+
+        country = self.table.lookup(ip)
+        if country is None and self.remote_fallback and self._is_public(ip):
+            country = self.remote_lookup(ip)
+
+        self.cache.set(ip, country)
+        return country
+
+    async def aresolve(self, ip):
+        """Async `resolve`: the remote fallback (if enabled) doesn't block the event loop"""
+        if not ip:
+            return None
+
+        country = self.cache.get(ip, _MISSING)
+        if country is not _MISSING:
+            return country
+
+        country = self.table.lookup(ip)
+        if country is None and self.remote_fallback and self._is_public(ip):
+            country = await self.aremote_lookup(ip)
+
+        self.cache.set(ip, country)
+        return country
+
+    @staticmethod
+    def _is_public(ip):
+        try:
+            return ipaddress.ip_address(ip).is_global
+        except ValueError:
+            return False
+
+    def remote_lookup(self, ip):
+        """Time-boxed ipapi.co lookup, only used when the local table has no match"""
+        import requests  # ✅ Only needed when the remote fallback is enabled
+
+        try:
+            response = requests.get(f"https://ipapi.co/{ip}/json/", timeout=self.remote_timeout)
+            if response.status_code == 200:
+                return _country(response.json().get("country_code"))
+        except Exception as e:
+            logger.error(f"Error detecting country: {e}")
+        return None
+
+    async def aremote_lookup(self, ip):
+        """Non-blocking variant of `remote_lookup` (aiohttp)"""
+        import aiohttp  # ✅ Only needed when the remote fallback is enabled
+
+        try:
+            timeout = aiohttp.ClientTimeout(total=self.remote_timeout)
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.get(f"https://ipapi.co/{ip}/json/") as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        return _country(data.get("country_code"))
+        except Exception as e:
+            logger.error(f"Error detecting country: {e}")
+        return None
+
+
+_resolver = None
+_resolver_lock = threading.Lock()
+
+
+def get_resolver():
+    """Return the process-wide resolver (class configurable via `GEOIP_RESOLVER`)"""
+    global _resolver
+    if _resolver is None:
+        with _resolver_lock:
+            if _resolver is None:
+                resolver_class = import_string(getattr(settings, "GEOIP_RESOLVER", "profiles_api.geo.CountryResolver"))
+                _resolver = resolver_class.from_settings()
+    return _resolver
+
+
+def set_resolver(resolver):
+    """Replace the process-wide resolver (pass None to rebuild it from settings)"""
+    global _resolver
+    _resolver = resolver
+
+
+def client_ip(request):
+    """Return the client IP, honouring `X-Forwarded-For` when behind a proxy"""
+    ip = request.META.get("HTTP_X_FORWARDED_FOR")
+    if ip:
+        return ip.split(",")[0].strip()
+    return request.META.get("REMOTE_ADDR")
@@ -0,0 +1,196 @@
+"""
+Resized derivatives for product images.
+
+Sources are the entries of `Product.images` that live in local storage
+(`MEDIA_ROOT`, referenced as `products/a.jpg` or `<MEDIA_URL>products/a.jpg`).
+Each source is hashed; derivatives for every `PRODUCT_IMAGE_SIZES` box are
+written once per content hash as WebP and JPEG under
+`MEDIA_ROOT/products/derived/<hash>/`, in a process pool. Results are stored
+in `Product.image_variants`, keyed by the original `images` entry:
+
+    {"products/a.jpg": {"hash": "...", "width": 3000, "height": 2000,
+                        "sizes": {"card": {"width": 480, "height": 320,
+                                           "jpeg": "products/derived/.../card.jpg",
+                                           "webp": "products/derived/.../card.webp"}, ...}}}
+
+Unchanged sources (same hash) are skipped. Run `manage.py process_product_images`.
+"""
+import hashlib
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice, repeat
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+DERIVED_DIR = "products/derived"
+EXTENSIONS = {"jpeg": "jpg", "webp": "webp"}
+
+
+def local_source(image):
+    """Path of a `Product.images` entry inside MEDIA_ROOT, or None for remote/unsafe entries"""
+    if not isinstance(image, str) or "://" in image or image.startswith("//"):
+        return None
+    media_url = settings.MEDIA_URL
+    relative = image[len(media_url):] if image.startswith(media_url) else image.lstrip("/")
+    root = Path(settings.MEDIA_ROOT).resolve()
+    path = (root / relative).resolve()
+    return path if path.is_relative_to(root) and path.is_file() else None
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def derivative_path(digest, size_name, fmt):
+    """Content-addressed location (relative to MEDIA_ROOT), shared by every product using the same file"""
+    return f"{DERIVED_DIR}/{digest[:2]}/{digest}/{size_name}.{EXTENSIONS[fmt]}"
+
+
+def _save(image, path, fmt, quality):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}")
+    if fmt == "jpeg":
+        if image.mode != "RGB":
+            background = Image.new("RGB", image.size, "white")  # ✅ Flatten transparency for JPEG
+            background.paste(image, mask=image.getchannel("A") if "A" in image.getbands() else None)
+            image = background
+        image.save(tmp, "JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(tmp, "WEBP", quality=quality, method=4)
+    os.replace(tmp, path)  # ✅ Readers never see a half-written file
+
+
+def process_image(source, digest, media_root, sizes, formats, quality, force=False):
+    """
+    Write every derivative of one source (runs in a worker process; no Django access).
+    Returns the variant record for `Product.image_variants`.
+    """
+    media_root = Path(media_root)
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)  # ✅ Phone photos: bake the EXIF rotation into the pixels
+        width, height = image.size
+        record = {"hash": digest, "width": width, "height": height, "sizes": {}}
+
+        # ✅ Largest box first, each smaller size resized from the previous one
+        for size_name, box in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+            paths = {fmt: derivative_path(digest, size_name, fmt) for fmt in formats}
+            if force or not all((media_root / path).is_file() for path in paths.values()):
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA" if "transparency" in image.info or "A" in image.getbands() else "RGB")
+                image.thumbnail((box, box), Image.LANCZOS)  # ✅ In place on exif_transpose's copy
+                for fmt, path in paths.items():
+                    _save(image, media_root / path, fmt, quality)
+                size = image.size
+            else:
+                with Image.open(media_root / paths[formats[0]]) as existing:  # ✅ Header only, no decode
+                    size = existing.size
+            record["sizes"][size_name] = {"width": size[0], "height": size[1], **paths}
+    return record
+
+
+def _process(job):
+    """`process_image` for the pool; None for a corrupt or unreadable source so one file can't abort the batch"""
+    try:
+        return process_image(*job)
+    except (OSError, UnidentifiedImageError) as e:
+        logger.warning(f"Product image {job[0]} could not be processed: {e}")
+        return None
+
+
+def ingest(products, workers=None, force=False, batch_size=200, log=None):
+    """
+    Build derivatives for `products` (a queryset) and store `image_variants`.
+    Returns (products updated, images processed, images skipped as unchanged).
+    """
+    sizes = dict(settings.PRODUCT_IMAGE_SIZES)
+    formats = tuple(settings.PRODUCT_IMAGE_FORMATS)
+    options = (str(settings.MEDIA_ROOT), sizes, formats, settings.PRODUCT_IMAGE_QUALITY, force)
+    updated = processed = skipped = 0
+
+    rows = products.only("pk", "images", "image_variants").order_by("pk").iterator(chunk_size=batch_size)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+
+            # ✅ Hash every local source; only new or changed content goes to the pool (once per hash)
+            plans, jobs = [], {}
+            for product in batch:
+                plan = {}
+                for image in product.images or []:
+                    path = local_source(image)
+                    if path is None:
+                        continue
+                    digest = file_hash(path)
+                    current = (product.image_variants or {}).get(image)
+                    unchanged = current and current.get("hash") == digest and current["sizes"].keys() == sizes.keys()
+                    if unchanged and not force:
+                        plan[image] = current
+                        skipped += 1
+                    else:
+                        plan[image] = digest
+                        jobs.setdefault(digest, str(path))
+                plans.append(plan)
+
+            results = dict(zip(jobs, pool.map(_process, zip(jobs.values(), jobs, *map(repeat, options)))))
+            processed += sum(record is not None for record in results.values())
+
+            changed, now = [], timezone.now()
+            for product, plan in zip(batch, plans):
+                variants = {}
+                for image, value in plan.items():
+                    record = results[value] if isinstance(value, str) else value
+                    if record is None:  # ✅ Failed: keep what was there, the stale hash retries it next run
+                        record = (product.image_variants or {}).get(image)
+                    if record is not None:
+                        variants[image] = record
+                if variants != (product.image_variants or {}):
+                    product.image_variants = variants
+                    product.updated_at = now  # ✅ bulk_update skips auto_now; the change feed and sitemap need it
+                    changed.append(product)
+            products.model.objects.bulk_update(changed, ["image_variants", "updated_at"])
+            updated += len(changed)
+            if log:
+                log(f"{updated} products updated, {processed} images processed, {skipped} unchanged")
+    return updated, processed, skipped
+
+
+def image_set(images, variants, size_name):
+    """
+    Per-image URLs for one derivative size, falling back to the original when
+    an image has no derivatives (remote URL, not processed yet).
+    """
+    media_url = settings.MEDIA_URL
+    variants = variants or {}
+    result = []
+    for image in images or []:
+        size = (variants.get(image) or {}).get("sizes", {}).get(size_name)
+        if size is None:
+            result.append({"src": image, "webp": None, "width": None, "height": None})
+        else:
+            result.append({
+                "src": media_url + size["jpeg"] if "jpeg" in size else image,
+                "webp": media_url + size["webp"] if "webp" in size else None,
+                "width": size["width"],
+                "height": size["height"],
+            })
+    return result
+
+
+def image_context(request, listing=False):
+    """Serializer context picking the derivative size: `?image_size=` if valid, else the listing/detail default"""
+    size = request.GET.get("image_size", "").strip().lower()
+    if size not in settings.PRODUCT_IMAGE_SIZES:
+        size = settings.PRODUCT_IMAGE_LIST_SIZE if listing else settings.PRODUCT_IMAGE_DETAIL_SIZE
+    return {"image_size": size}
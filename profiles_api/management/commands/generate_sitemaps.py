@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from profiles_api.sitemaps import SHARD_SIZE, generate
+
+
+class Command(BaseCommand):
+    help = f"""
+    Write the gzip-compressed product sitemap shards (products by id, at most
+    {SHARD_SIZE} URLs each) and the sitemap index into SITEMAP_DIR. Only shards
+    whose products were added, removed or updated since the last run are
+    rewritten; run it from cron.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", help="Directory to write to (default: SITEMAP_DIR)")
+        parser.add_argument("--force", action="store_true", help="Rewrite every shard")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        log = self.stdout.write if options["verbosity"] > 1 else None
+        written, unchanged, removed = generate(options["output"], force=options["force"], log=log)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {written} shards ({unchanged} unchanged, {removed} removed) "
+            f"in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,220 @@
+import gzip
+import json
+import tempfile
+import time
+from contextlib import ExitStack, contextmanager
+from itertools import islice
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.python import Deserializer
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from profiles_api.facets import rebuild as rebuild_facets
+from profiles_api.models import Category, HelpArticle, Product
+
+READ_SIZE = 1 << 16
+
+
+def iter_dump(fh):
+    """Yield records from a `dumpdata` JSON array (or JSON-lines) file without loading it whole"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = fh.read(READ_SIZE)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    while True:
+        # ✅ Skip whitespace, the opening bracket and separators between records
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,[":
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                return
+            fill()
+            continue
+        if buffer[pos] == "]":
+            return
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError(f"Truncated or invalid dump near: {buffer[pos:pos + 80]!r}")
+            fill()
+            continue
+        yield record
+        pos = end
+
+
+def dependency_order(models):
+    """Sort models so every model comes after the models its foreign keys point to"""
+    ordered, visiting = [], set()
+
+    def visit(model):
+        if model in ordered or model in visiting:
+            return
+        visiting.add(model)
+        for field in model._meta.concrete_fields:
+            related = field.related_model
+            if field.is_relation and related in models and related is not model:
+                visit(related)
+        visiting.discard(model)
+        ordered.append(model)
+
+    for model in sorted(models, key=lambda m: m._meta.label):
+        visit(model)
+    return ordered
+
+
+@contextmanager
+def preserve_timestamps(model):
+    """Keep dumped `auto_now`/`auto_now_add` values instead of stamping the load time"""
+    fields = [f for f in model._meta.concrete_fields if getattr(f, "auto_now", False) or getattr(f, "auto_now_add", False)]
+    saved = [(f, f.auto_now, f.auto_now_add) for f in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = """
+    Restore a `dumpdata`-style dump (JSON array or JSON lines, optionally .gz)
+    with bounded memory: records are spooled per model, then inserted in foreign
+    key dependency order with bulk upserts, constraint checks deferred to the end
+    and sequences reset. Denormalized category paths and product lookup keys are
+    recomputed afterwards.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Dump file (.json, .jsonl, optionally .gz)")
+        parser.add_argument("--batch-size", type=int, default=2000, help="Objects per bulk insert")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+        parser.add_argument(
+            "-e", "--exclude", action="append", default=[],
+            help="App label or app_label.ModelName to skip (can be repeated)",
+        )
+
+    def handle(self, *args, **options):
+        self.using = options["database"]
+        self.batch_size = options["batch_size"]
+        self.exclude = {label.lower() for label in options["exclude"]}
+        started = time.perf_counter()
+
+        with ExitStack() as stack:
+            spools = self._spool(stack, options["path"])
+            models = dependency_order(set(spools))
+            counts = {}
+
+            connection = connections[self.using]
+            with transaction.atomic(using=self.using):
+                with connection.constraint_checks_disabled():
+                    for model in models:
+                        counts[model] = self._load(model, spools[model])
+                connection.check_constraints(table_names=[model._meta.db_table for model in models])
+                self._reset_sequences(connection, models)
+                self._refresh_denormalized(models)
+
+        cache.clear()  # ✅ Every cached response may be stale after a restore
+
+        total = sum(counts.values())
+        elapsed = time.perf_counter() - started
+        for model in models:
+            self.stdout.write(f"  {model._meta.label}: {counts[model]}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {total} objects in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} objects/s)"
+        ))
+
+    def _excluded(self, model):
+        return model._meta.app_label in self.exclude or model._meta.label_lower in self.exclude
+
+    def _spool(self, stack, path):
+        """Single pass over the dump, writing each model's records to its own temporary file"""
+        opener = gzip.open if path.endswith(".gz") else open
+        try:
+            fh = stack.enter_context(opener(path, "rt", encoding="utf-8"))
+        except OSError as e:
+            raise CommandError(f"Cannot open {path}: {e}")
+
+        spools = {}
+        for record in iter_dump(fh):
+            try:
+                model = apps.get_model(record["model"])
+            except (KeyError, LookupError, ValueError) as e:
+                raise CommandError(f"Unknown model in record {record.get('pk')!r}: {e}")
+            if self._excluded(model):
+                continue
+            if model not in spools:
+                spools[model] = stack.enter_context(tempfile.TemporaryFile("w+", encoding="utf-8"))
+            spools[model].write(json.dumps(record) + "\n")
+        return spools
+
+    def _load(self, model, spool):
+        spool.seek(0)
+        records = (json.loads(line) for line in spool)
+        fields = [f.name for f in model._meta.concrete_fields if not f.primary_key]
+        loaded = 0
+
+        with preserve_timestamps(model):
+            while True:
+                batch = list(islice(records, self.batch_size))
+                if not batch:
+                    return loaded
+                try:
+                    objects = list(Deserializer(batch, using=self.using, ignorenonexistent=True))
+                except DeserializationError as e:
+                    raise CommandError(f"Invalid {model._meta.label} record: {e}")
+
+                instances = [obj.object for obj in objects]
+                if fields:
+                    model._base_manager.using(self.using).bulk_create(
+                        instances, update_conflicts=True, unique_fields=[model._meta.pk.name], update_fields=fields
+                    )
+                else:
+                    model._base_manager.using(self.using).bulk_create(instances, ignore_conflicts=True)
+                self._load_m2m(model, objects)
+                loaded += len(instances)
+
+    def _load_m2m(self, model, objects):
+        """Replace many-to-many rows (e.g. user groups/permissions) for the batch in bulk"""
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            if not through._meta.auto_created:
+                continue
+            source = field.m2m_field_name() + "_id"
+            target = field.m2m_reverse_field_name() + "_id"
+            rows, owners = [], []
+            for obj in objects:
+                if field.name in obj.m2m_data:
+                    owners.append(obj.object.pk)
+                    rows += [through(**{source: obj.object.pk, target: pk}) for pk in obj.m2m_data[field.name]]
+            if owners:
+                through._base_manager.using(self.using).filter(**{f"{source}__in": owners}).delete()
+                through._base_manager.using(self.using).bulk_create(rows, batch_size=self.batch_size)
+
+    def _reset_sequences(self, connection, models):
+        statements = connection.ops.sequence_reset_sql(no_style(), models)
+        if statements:
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+    def _refresh_denormalized(self, models):
+        """Dumps from before the materialized path / lookup key columns don't carry them"""
+        if Category in models:
+            Category.objects.db_manager(self.using).rebuild_paths()
+        if {Category, Product, apps.get_model("profiles_api", "UserProfile")} & set(models):
+            Product.objects.using(self.using).refresh_lookup_keys()
+            rebuild_facets(using=self.using)
+        if HelpArticle in models:
+            HelpArticle.objects.using(self.using).render_html()
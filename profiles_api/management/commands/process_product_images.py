@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from profiles_api.caching import invalidate, products_scope
+from profiles_api.images import ingest
+from profiles_api.models import Product
+
+
+class Command(BaseCommand):
+    help = """
+    Build resized WebP/JPEG derivatives for product images stored under
+    MEDIA_ROOT (PRODUCT_IMAGE_SIZES) in a process pool and record them in
+    Product.image_variants. Sources whose content hash is unchanged are skipped.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+        parser.add_argument("--batch-size", type=int, default=200, help="Products per batch")
+        parser.add_argument("--country", help="Only products of this country code")
+        parser.add_argument("--force", action="store_true", help="Rebuild derivatives even if unchanged")
+
+    def handle(self, *args, **options):
+        products = Product.objects.all()
+        if options["country"]:
+            products = products.filter(country_code=options["country"].lower())
+
+        started = time.perf_counter()
+        log = self.stdout.write if options["verbosity"] > 1 else None
+        updated, processed, skipped = ingest(
+            products, workers=options["workers"], force=options["force"], batch_size=options["batch_size"], log=log,
+        )
+        if updated:
+            # ✅ bulk_update bypasses the cache invalidation signals
+            countries = products.values_list("country_code", flat=True).distinct()
+            invalidate(*(products_scope(country) for country in countries))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {processed} images ({skipped} unchanged), updated {updated} products "
+            f"in {time.perf_counter() - started:.2f}s"
+        ))
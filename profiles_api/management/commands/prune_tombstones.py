@@ -0,0 +1,23 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from profiles_api.models import Tombstone
+
+
+class Command(BaseCommand):
+    help = """
+    Delete change-feed tombstones older than CHANGES_TOMBSTONE_RETENTION_DAYS.
+    Consumers whose cursor is older than that get 410 from /api/changes/ and
+    must resync.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=settings.CHANGES_TOMBSTONE_RETENTION_DAYS)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options["days"])
+        deleted, _ = Tombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} tombstones older than {options['days']} days"))
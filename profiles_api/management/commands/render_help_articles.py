@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from profiles_api.caching import help_scope, invalidate
+from profiles_api.models import HelpArticle
+from profiles_api.rendering import RENDERER_VERSION
+
+
+class Command(BaseCommand):
+    help = """
+    Re-render the stored HTML of help articles. Only stale articles are
+    rendered (content changed outside save(), or RENDERER_VERSION bumped);
+    pass --all to re-render everything, e.g. after a Markdown/nh3 upgrade
+    that changes output without a version bump.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Re-render every article")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        slugs = HelpArticle.objects.render_html(force=options["all"], batch_size=options["batch_size"])
+        if slugs:
+            # ✅ bulk_update bypasses the cache invalidation signals
+            invalidate(help_scope(), *(help_scope(slug) for slug in slugs))
+        self.stdout.write(self.style.SUCCESS(f"Rendered {len(slugs)} help articles (renderer v{RENDERER_VERSION})"))
@@ -0,0 +1,346 @@
+"""
+Per-endpoint request metrics in the Prometheus text format.
+
+`MetricsMiddleware` labels every request with its resolved URL name and
+records latency (histogram), SQL query count/time, serializer time and time
+spent in `get_user_country`. Stage timings are collected through a context
+variable, so they also follow async views into `sync_to_async` threads.
+
+Numbers are aggregated in-process under a lock. With several gunicorn
+workers, set `METRICS_DIR` to a directory shared by the workers: each one
+writes its totals there (at most every `METRICS_FLUSH_INTERVAL` seconds) and
+the scrape endpoint sums all the files, so any worker can answer a scrape.
+When a worker exits, gunicorn's master folds its file into `retired.json`
+(`retire_worker`), so totals never drop and a reused PID starts clean.
+"""
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+RETIRED_NAME = "retired.json"
+
+HELP = {
+    "http_requests_total": ("counter", "Requests by URL name, method and status"),
+    "http_request_duration_seconds": ("histogram", "Time until the response is returned"),
+    "db_queries_total": ("counter", "SQL queries executed"),
+    "db_query_duration_seconds_total": ("counter", "Time spent executing SQL"),
+    "serializer_duration_seconds_total": ("counter", "Time spent in DRF serializers"),
+    "geolocation_duration_seconds_total": ("counter", "Time spent resolving the client country"),
+    "auth_token_cache_total": ("counter", "Token authentication cache lookups by result (hit/miss)"),
+}
+STAGES = {"serializer": "serializer_duration_seconds_total", "geolocation": "geolocation_duration_seconds_total"}
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+class RequestStats:
+    """Timings collected while one request is being handled"""
+
+    __slots__ = ("queries", "query_time", "stages", "active")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.stages = dict.fromkeys(STAGES, 0.0)
+        self.active = set()  # ✅ Stages currently being timed (nested serializers count once)
+
+
+@contextmanager
+def timed(stage):
+    """Add the block's wall time to `stage` of the current request (no-op outside a request)"""
+    stats = _current.get()
+    if stats is None or stage in stats.active:
+        yield
+        return
+    stats.active.add(stage)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.stages[stage] += time.perf_counter() - started
+        stats.active.discard(stage)
+
+
+def _record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.query_time += time.perf_counter() - started
+
+
+def install_query_hook(sender=None, connection=None, **kwargs):
+    """Permanently wrap a connection's queries; `connection_created` fires again on reconnect"""
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+connection_created.connect(install_query_hook, dispatch_uid="profiles_api.metrics")
+
+
+def _labels(**labels):
+    return tuple(sorted(labels.items()))
+
+
+class Registry:
+    """Thread-safe counters and histograms keyed by (metric name, labels)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.counters = {}  # (name, labels) → value
+            self.histograms = {}  # (name, labels) → [per-bucket counts..., +Inf count, sum]
+            self.pid = os.getpid()
+            self.last_flush = 0.0
+
+    def _check_fork(self):
+        # ✅ A forked worker must not report (or overwrite) its parent's numbers
+        if self.pid != os.getpid():
+            self.reset()
+
+    def inc(self, name, labels, value=1):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [0] * (len(self.buckets) + 2)
+        histogram[bisect.bisect_left(self.buckets, value)] += 1
+        histogram[-1] += value
+
+    def record(self, view, method, status, duration, stats):
+        self._check_fork()
+        labels = _labels(view=view)
+        with self.lock:
+            self.inc("http_requests_total", _labels(view=view, method=method, status=str(status)))
+            self.observe("http_request_duration_seconds", _labels(view=view, method=method), duration)
+            self.inc("db_queries_total", labels, stats.queries)
+            self.inc("db_query_duration_seconds_total", labels, stats.query_time)
+            for stage, name in STAGES.items():
+                self.inc(name, labels, stats.stages[stage])
+        self.maybe_flush()
+
+    def count(self, name, value=1, **labels):
+        """Bump a counter outside the request bookkeeping (e.g. cache hits)"""
+        self._check_fork()
+        with self.lock:
+            self.inc(name, _labels(**labels), value)
+
+    def snapshot(self):
+        """JSON-serializable copy of every value"""
+        with self.lock:
+            return {
+                "buckets": list(self.buckets),
+                "counters": [[name, labels, value] for (name, labels), value in self.counters.items()],
+                "histograms": [[name, labels, list(values)] for (name, labels), values in self.histograms.items()],
+            }
+
+    # ✅ Multi-worker support: one file per worker process in METRICS_DIR
+
+    def _path(self, directory):
+        return Path(directory) / f"worker-{self.pid}.json"
+
+    def flush(self, directory=None):
+        directory = directory or getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return
+        self._check_fork()
+        path = self._path(directory)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp, path)  # ✅ Atomic: a scrape never reads a half-written file
+        self.last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if getattr(settings, "METRICS_DIR", None):
+            if time.monotonic() - self.last_flush >= getattr(settings, "METRICS_FLUSH_INTERVAL", 5):
+                self.flush()
+
+    def collect(self, directory=None):
+        """Snapshots of every worker (or just this process without METRICS_DIR)"""
+        directory = directory or getattr(settings, "METRICS_DIR", None)
+        if not directory:
+            return [self.snapshot()]
+        self.flush(directory)
+        snapshots = []
+        for path in [*Path(directory).glob("worker-*.json"), Path(directory) / RETIRED_NAME]:
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue  # ✅ Vanished or unreadable file; the next scrape catches up
+        return snapshots
+
+
+def _load(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def retire_worker(pid, directory):
+    """
+    Fold an exited worker's file into `retired.json` and remove it (gunicorn
+    `child_exit`, run by the master only, so nothing else writes that file).
+    """
+    path = Path(directory) / f"worker-{pid}.json"
+    snapshot = _load(path)
+    if snapshot is None:
+        return
+    retired = _load(Path(directory) / RETIRED_NAME)
+    buckets, counters, histograms = merge([retired, snapshot] if retired else [snapshot])
+    combined = {
+        "buckets": buckets,
+        "counters": [[name, labels, value] for (name, labels), value in counters.items()],
+        "histograms": [[name, labels, values] for (name, labels), values in histograms.items()],
+    }
+    tmp = path.with_name(f"{RETIRED_NAME}.tmp")
+    tmp.write_text(json.dumps(combined))
+    os.replace(tmp, Path(directory) / RETIRED_NAME)
+    path.unlink(missing_ok=True)
+
+
+def clear_directory(directory):
+    """Drop every worker and retired file (gunicorn `on_starting`: a new master starts from zero)"""
+    for path in Path(directory).glob("*.json"):
+        path.unlink(missing_ok=True)
+
+
+def merge(snapshots):
+    """Sum snapshots from several workers"""
+    counters, histograms, buckets = {}, {}, list(DEFAULT_BUCKETS)
+    for snapshot in snapshots:
+        buckets = snapshot["buckets"]
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, values in snapshot["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            if key in histograms:
+                histograms[key] = [a + b for a, b in zip(histograms[key], values)]
+            else:
+                histograms[key] = list(values)
+    return buckets, counters, histograms
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(snapshots):
+    """Prometheus text exposition format (version 0.0.4)"""
+    buckets, counters, histograms = merge(snapshots)
+    lines = []
+    for name, (kind, help_text) in HELP.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            for (metric, labels), values in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ["+Inf"], values[:-1]):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(values[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        else:
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry(getattr(settings, "METRICS_BUCKETS", DEFAULT_BUCKETS))
+
+
+def _view_name(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"  # ✅ 404s on unknown paths share one label instead of one per URL
+    return match.view_name or match._func_path
+
+
+class MetricsMiddleware:
+    """Record per-URL-name latency and stage timings; works for sync and async views"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats, started = RequestStats(), time.perf_counter()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, started = RequestStats(), time.perf_counter()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self._record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    @staticmethod
+    def _record(request, response, duration, stats):
+        registry.record(_view_name(request), request.method, response.status_code, duration, stats)
+
+
+def metrics_view(request):
+    """Scrape endpoint: totals of every worker sharing METRICS_DIR"""
+    return HttpResponse(render(registry.collect()), content_type=CONTENT_TYPE)
+
+
+class TimedSerializerMixin:
+    """Count `to_representation` time of a serializer towards the request's serializer stage"""
+
+    def to_representation(self, instance):
+        with timed("serializer"):
+            return super().to_representation(instance)
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:28
+
+from django.db import migrations, models
+
+
+def backfill_category_paths(apps, schema_editor):
+    """Compute `path`/`depth` for existing categories, parents before children"""
+    Category = apps.get_model("profiles_api", "Category")
+    parents = dict(Category.objects.values_list("id", "parent_id"))
+    paths = {}
+
+    def build(pk):
+        if pk not in paths:
+            parent_id = parents[pk]
+            paths[pk] = (build(parent_id) if parent_id else "") + f"{pk}/"
+        return paths[pk]
+
+    categories = []
+    for pk in parents:
+        path = build(pk)
+        categories.append(Category(pk=pk, path=path, depth=path.count("/") - 1))
+    Category.objects.bulk_update(categories, ["path", "depth"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles_api', '0004_category_parent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=255),
+        ),
+        migrations.RunPython(backfill_category_paths, migrations.RunPython.noop),
+    ]
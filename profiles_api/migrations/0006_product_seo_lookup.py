@@ -0,0 +1,45 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:29
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Lower
+
+
+def backfill_product_lookup_keys(apps, schema_editor):
+    """Copy the creator's country and the category slug onto every product"""
+    Product = apps.get_model("profiles_api", "Product")
+    Category = apps.get_model("profiles_api", "Category")
+    UserProfile = apps.get_model("profiles_api", "UserProfile")
+
+    Product.objects.update(
+        category_slug=Subquery(Category.objects.filter(pk=OuterRef("category_id")).values("slug")[:1]),
+        country_code=Coalesce(
+            Lower(Subquery(UserProfile.objects.filter(pk=OuterRef("created_by_id")).values("country")[:1])),
+            Value(""),
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles_api', '0005_category_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='category_slug',
+            field=models.SlugField(blank=True, default='', editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='country_code',
+            field=models.CharField(blank=True, default='', editable=False, max_length=2),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['country_code', 'category_slug', 'slug'], name='product_seo_lookup_idx'),
+        ),
+        migrations.RunPython(backfill_product_lookup_keys, migrations.RunPython.noop),
+    ]
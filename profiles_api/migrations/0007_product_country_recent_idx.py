@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles_api', '0006_product_seo_lookup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['country_code', '-created_at', '-id'], name='product_country_recent_idx'),
+        ),
+    ]
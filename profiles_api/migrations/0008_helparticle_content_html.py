@@ -0,0 +1,48 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:45
+
+import hashlib
+
+from django.db import migrations, models
+
+
+# ✅ Frozen copy of profiles_api.rendering at RENDERER_VERSION 1: later renderer changes must not alter
+# this migration. Articles it renders carry a version-1 hash, so `render_help_articles` refreshes them
+# once the version is bumped.
+RENDERER_VERSION = 1
+MARKDOWN_EXTENSIONS = ["extra", "sane_lists"]
+
+
+def render_existing_articles(apps, schema_editor):
+    """Store rendered HTML for articles saved before it existed"""
+    import markdown
+    import nh3
+
+    HelpArticle = apps.get_model("profiles_api", "HelpArticle")
+    articles = []
+    for article in HelpArticle.objects.only("pk", "content").iterator():
+        html = markdown.markdown(article.content or "", extensions=MARKDOWN_EXTENSIONS, output_format="html")
+        article.content_html = nh3.clean(html)
+        article.content_hash = hashlib.sha256(f"{RENDERER_VERSION}\n{article.content}".encode()).hexdigest()
+        articles.append(article)
+    HelpArticle.objects.bulk_update(articles, ["content_html", "content_hash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles_api', '0007_product_country_recent_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='helparticle',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='helparticle',
+            name='content_html',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(render_existing_articles, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:52
+
+import django.db.models.deletion
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def build_facets(apps, schema_editor):
+    """Count existing products per (country, category), rolled up to every ancestor"""
+    Category = apps.get_model("profiles_api", "Category")
+    CategoryFacet = apps.get_model("profiles_api", "CategoryFacet")
+    Product = apps.get_model("profiles_api", "Product")
+
+    parents = dict(Category.objects.values_list("pk", "parent_id"))
+    direct, subtree = Counter(), Counter()
+    for row in Product.objects.exclude(country_code="").values("country_code", "category_id").annotate(n=Count("pk")):
+        direct[row["country_code"], row["category_id"]] += row["n"]
+    for (country, pk), n in direct.items():
+        while pk is not None:
+            subtree[country, pk] += n
+            pk = parents.get(pk)
+    CategoryFacet.objects.bulk_create(
+        [CategoryFacet(country_code=country, category_id=pk, product_count=direct[country, pk], subtree_count=n)
+         for (country, pk), n in subtree.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles_api', '0009_product_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('country_code', models.CharField(max_length=2)),
+                ('product_count', models.IntegerField(default=0)),
+                ('subtree_count', models.IntegerField(default=0)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='profiles_api.category')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('country_code', 'category'), name='category_facet_unique')],
+            },
+        ),
+        migrations.RunPython(build_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-17 03:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles_api', '0010_category_facet'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['country_code', 'price', 'id'], name='product_country_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['country_code', 'category', '-created_at', '-id'], name='product_country_category_idx'),
+        ),
+    ]
@@ -1,7 +1,12 @@
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Concat, Lower, Now, Substr
+from django.utils import timezone
 from django.utils.text import slugify
 from django_countries.fields import CountryField  # ✅ Import CountryField for country selection
+
+from .rendering import content_hash, render_markdown
 from django.apps import apps  # ✅ Lazy import to prevent circular imports
 
 
@@ -53,6 +58,21 @@ class UserProfile(AbstractBaseUser, PermissionsMixin):
         """Retrieve short name of the user"""
         return self.name  # Use the `name` field as short_name
 
+    @property
+    def country_code(self):
+        """Lowercase country code (e.g. 'gh') or '' if not set"""
+        return self.country.code.lower() if self.country else ""
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+
+        # ✅ Keep the denormalized country on this user's products in sync
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "country" in update_fields:
+            apps.get_model("profiles_api", "Product").objects.filter(created_by=self).exclude(
+                country_code=self.country_code
+            ).update(country_code=self.country_code, updated_at=Now())  # ✅ New URLs: new lastmod
+
     def __str__(self):
         return f"{self.name} ({self.email})"
 
@@ -66,19 +86,133 @@ class HelpCategory(models.Model):
         return self.name
 
 
+class HelpArticleQuerySet(models.QuerySet):
+    """Query helpers for help articles"""
+
+    def render_html(self, force=False, batch_size=500):
+        """
+        Re-render stored HTML where it is stale (content changed outside save(),
+        or `RENDERER_VERSION` was bumped), or everywhere with `force`.
+        Returns the slugs of the updated articles.
+        """
+        updated, batch, now = [], [], timezone.now()
+        for article in self.only("pk", "slug", "content", "content_hash").iterator(chunk_size=batch_size):
+            if force:
+                article.content_hash = ""
+            if article.render_html():
+                article.updated_at = now  # ✅ bulk_update skips auto_now; the change feed needs it
+                batch.append(article)
+            if len(batch) >= batch_size:
+                self.bulk_update(batch, ["content_html", "content_hash", "updated_at"])
+                updated += [article.slug for article in batch]
+                batch = []
+        if batch:
+            self.bulk_update(batch, ["content_html", "content_hash", "updated_at"])
+            updated += [article.slug for article in batch]
+        return updated
+
+
 class HelpArticle(models.Model):
     """Help articles for the support section"""
     category = models.ForeignKey(HelpCategory, on_delete=models.CASCADE, related_name="articles")
     title = models.CharField(max_length=255)
     slug = models.SlugField(unique=True, db_index=True)  # ✅ Ensure fast queries
     content = models.TextField()  # Markdown supported
+    content_html = models.TextField(blank=True, default="", editable=False)  # ✅ Sanitized HTML, rendered on save
+    content_hash = models.CharField(max_length=64, blank=True, default="", editable=False)  # ✅ See rendering.content_hash
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = HelpArticleQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["updated_at", "id"], name="help_article_updated_idx"),  # ✅ Change feed keyset
+        ]
+
+    def render_html(self):
+        """Render `content` into `content_html` if it (or the renderer) changed; returns True if it did"""
+        digest = content_hash(self.content)
+        if digest == self.content_hash:
+            return False
+        self.content_html = render_markdown(self.content)
+        self.content_hash = digest
+        return True
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "content" in update_fields:
+            if self.render_html() and update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "content_html", "content_hash"}
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.title
 
 
+class CategoryManager(models.Manager):
+    """Manager for product categories"""
+
+    def _ancestor_nodes(self, categories):
+        """Index `categories` and every ancestor already linked through a loaded `parent`"""
+        parent_field = self.model._meta.get_field("parent")
+        nodes = {}
+        for category in categories:
+            node = category
+            nodes.setdefault(node.pk, node)
+            while node.parent_id and parent_field.is_cached(node):
+                node = node.parent
+                nodes.setdefault(node.pk, node)
+        return nodes
+
+    @staticmethod
+    def _link_parents(categories, nodes):
+        # ✅ Link each category (including duplicate instances) to its already-loaded parent
+        for category in categories + list(nodes.values()):
+            if category.parent_id in nodes:
+                category.parent = nodes[category.parent_id]
+        return nodes
+
+    def attach_ancestors(self, categories):
+        """
+        Load every ancestor of `categories` with one indexed query (ids come from
+        the materialized `path`) and link them through `parent`, so walking the
+        hierarchy never hits the database.
+        """
+        categories = [category for category in categories if category is not None]
+        nodes = self._ancestor_nodes(categories)
+        missing = {pk for category in categories for pk in category.ancestor_ids} - nodes.keys()
+        if missing:
+            nodes.update(self.in_bulk(missing))
+        return self._link_parents(categories, nodes)
+
+    def rebuild_paths(self):
+        """Recompute `path`/`depth` for every category (e.g. after a raw bulk load)"""
+        parents = dict(self.values_list("id", "parent_id"))
+        paths = {}
+
+        def build(pk):
+            if pk not in paths:
+                parent_id = parents[pk]
+                paths[pk] = (build(parent_id) if parent_id else "") + f"{pk}{self.model.PATH_SEPARATOR}"
+            return paths[pk]
+
+        categories = []
+        for pk in parents:
+            path = build(pk)
+            categories.append(self.model(pk=pk, path=path, depth=path.count(self.model.PATH_SEPARATOR) - 1))
+        self.bulk_update(categories, ["path", "depth"], batch_size=500)
+
+    async def aattach_ancestors(self, categories):
+        """Async `attach_ancestors`"""
+        categories = [category for category in categories if category is not None]
+        nodes = self._ancestor_nodes(categories)
+        missing = {pk for category in categories for pk in category.ancestor_ids} - nodes.keys()
+        if missing:
+            nodes.update(await self.ain_bulk(missing))
+        return self._link_parents(categories, nodes)
+
+
 class Category(models.Model):
     """Product categories with support for subcategories"""
     
@@ -87,17 +221,69 @@ class Category(models.Model):
     parent = models.ForeignKey(
         "self", on_delete=models.CASCADE, null=True, blank=True, related_name="subcategories"
     )  # ✅ Self-referencing field for subcategories
+    path = models.CharField(max_length=255, blank=True, default="", editable=False, db_index=True)  # ✅ Materialized path of ids, e.g. "1/4/9/"
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)  # ✅ 0 for root categories
+
+    objects = CategoryManager()
+
+    PATH_SEPARATOR = "/"
 
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
+
+        if self.pk:
+            # ✅ Keep the denormalized category slug on products in sync
+            self.products.exclude(category_slug=self.slug).update(category_slug=self.slug, updated_at=Now())  # ✅ New URLs: new lastmod
+
+        old_path = self.path
+        parent_path = ""
+        if self.parent_id:
+            parent_path = Category.objects.filter(pk=self.parent_id).values_list("path", flat=True).first() or ""
+            if old_path and self.pk and parent_path.startswith(old_path):
+                raise ValueError("A category cannot be moved under itself or one of its subcategories")
+
         super().save(*args, **kwargs)
 
+        # ✅ Maintain the materialized path (needs the pk, so it is written after the insert)
+        new_path = f"{parent_path}{self.pk}{self.PATH_SEPARATOR}"
+        if new_path != old_path:
+            new_depth = new_path.count(self.PATH_SEPARATOR) - 1
+            Category.objects.filter(pk=self.pk).update(path=new_path, depth=new_depth)
+            if old_path:
+                # ✅ Reparenting: rewrite the prefix of the whole subtree in one UPDATE
+                Category.objects.filter(path__startswith=old_path).exclude(pk=self.pk).update(
+                    path=Concat(Value(new_path), Substr("path", len(old_path) + 1)),
+                    depth=F("depth") + (new_depth - self.depth),
+                )
+            self.path, self.depth = new_path, new_depth
+
+    @property
+    def ancestor_ids(self):
+        """Ids of all ancestors, root first (read from `path`, no query)"""
+        return [int(pk) for pk in self.path.split(self.PATH_SEPARATOR)[:-2]]
+
+    def get_ancestors(self):
+        """Ancestors root first: walks already-loaded parents, otherwise one indexed query"""
+        chain, node = [], self
+        parent_field = self._meta.get_field("parent")
+        while node.parent_id and (parent_field.is_cached(node) or not self.path):
+            node = node.parent
+            chain.insert(0, node)
+        if not node.parent_id:
+            return chain
+
+        ancestors = Category.objects.in_bulk(self.ancestor_ids)
+        return [ancestors[pk] for pk in self.ancestor_ids if pk in ancestors]
+
+    def get_descendants(self, include_self=False):
+        """Whole subtree in one indexed prefix query"""
+        descendants = Category.objects.filter(path__startswith=self.path)
+        return descendants if include_self else descendants.exclude(pk=self.pk)
+
     def get_full_slug(self):
         """Get the full category path (e.g., mobile-phones)"""
-        if self.parent:
-            return f"{self.parent.get_full_slug()}/{self.slug}"
-        return self.slug
+        return "/".join(category.slug for category in [*self.get_ancestors(), self])
 
     def __str__(self):
         """Display subcategories as Parent > Subcategory"""
@@ -106,6 +292,35 @@ class Category(models.Model):
         return self.name
 
 
+class ProductQuerySet(models.QuerySet):
+    """Query helpers for products"""
+
+    def in_category(self, category):
+        """Products in `category` or any of its subcategories (one indexed query)"""
+        return self.filter(category__path__startswith=category.path)
+
+    def stale_lookup_keys(self):
+        """Products whose denormalized keys are out of date, annotated with `new_category_slug`/`new_country_code`"""
+        return self.annotate(
+            new_category_slug=Subquery(Category.objects.filter(pk=OuterRef("category_id")).values("slug")[:1]),
+            new_country_code=Coalesce(
+                Lower(Subquery(UserProfile.objects.filter(pk=OuterRef("created_by_id")).values("country")[:1])),
+                Value(""),
+            ),
+        ).exclude(category_slug=F("new_category_slug"), country_code=F("new_country_code"))
+
+    def refresh_lookup_keys(self):
+        """
+        Recompute the denormalized `country_code`/`category_slug` in one UPDATE (e.g. after a raw bulk load).
+        Only rows whose keys differ are written, so the others keep their `updated_at`.
+        """
+        return self.stale_lookup_keys().update(
+            category_slug=F("new_category_slug"),
+            country_code=F("new_country_code"),
+            updated_at=Now(),  # ✅ URLs changed: new lastmod for the sitemap, visible to the change feed
+        )
+
+
 class Product(models.Model):
     """Products available on Upfrica"""
     title = models.CharField(max_length=255)
@@ -114,15 +329,38 @@ class Product(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="products")
     price = models.DecimalField(max_digits=10, decimal_places=2)
     images = models.JSONField(default=list)  # Store images as a list of URLs
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)  # ✅ Resized derivatives per image (see images.py)
     created_by = models.ForeignKey(
         UserProfile, on_delete=models.SET_NULL, null=True, blank=True, related_name="products"
     )  # ✅ Added created_by field to track the user who created the product
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # ✅ Denormalized lookup keys for the SEO URL (kept in sync by save() and the creator/category)
+    country_code = models.CharField(max_length=2, blank=True, default="", editable=False)  # Lowercase, e.g. 'gh'
+    category_slug = models.SlugField(max_length=255, blank=True, default="", editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # ✅ `/api/<country>/<subcategory>/<slug>/` and country listings are single index probes
+            models.Index(fields=["country_code", "category_slug", "slug"], name="product_seo_lookup_idx"),
+            # ✅ Keyset pagination of country listings, newest first
+            models.Index(fields=["country_code", "-created_at", "-id"], name="product_country_recent_idx"),
+            # ✅ `?sort=price`/`-price` and price ranges (see filters.py)
+            models.Index(fields=["country_code", "price", "id"], name="product_country_price_idx"),
+            # ✅ `?category=` subtrees, newest first within each category
+            models.Index(fields=["country_code", "category", "-created_at", "-id"], name="product_country_category_idx"),
+            # ✅ Change feed keyset (see changes.py)
+            models.Index(fields=["updated_at", "id"], name="product_updated_idx"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        self.country_code = self.created_by.country_code if self.created_by else ""
+        self.category_slug = self.category.slug
         super().save(*args, **kwargs)
 
     def get_country_code(self):
@@ -137,4 +375,47 @@ class Product(models.Model):
         return f"/{country_code}/{self.category.get_full_slug()}/{self.slug}"
 
     def __str__(self):
-        return self.title
\ No newline at end of file
+        return self.title
+
+
+class CategoryFacet(models.Model):
+    """
+    Product counts per (country, category), maintained incrementally by
+    `profiles_api.facets` so facets never need a GROUP BY over products.
+    """
+    country_code = models.CharField(max_length=2)  # Lowercase, like Product.country_code
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="facets")
+    product_count = models.IntegerField(default=0)  # ✅ Products directly in the category
+    subtree_count = models.IntegerField(default=0)  # ✅ Products in the category or any subcategory
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["country_code", "category"], name="category_facet_unique"),
+        ]
+
+    def __str__(self):
+        return f"{self.country_code}/{self.category_id}: {self.subtree_count}"
+
+
+class Tombstone(models.Model):
+    """
+    A deleted product or help article, recorded by `profiles_api.signals` so the
+    change feed can report deletions; pruned after `CHANGES_TOMBSTONE_RETENTION_DAYS`.
+    """
+    PRODUCT = "product"
+    HELP_ARTICLE = "help_article"
+    KIND_CHOICES = [(PRODUCT, "Product"), (HELP_ARTICLE, "Help article")]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    key = models.CharField(max_length=512, blank=True, default="")  # ✅ product_url or help article slug
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted_at", "id"], name="tombstone_deleted_idx"),  # ✅ Change feed keyset
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id} ({self.key})"
+
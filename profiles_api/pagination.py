@@ -0,0 +1,115 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+from .filters import DEFAULT_SORT, SORTS
+from .models import Product
+
+
+# ✅ Keyset pagination: page N costs the same as page 1 (no OFFSET, no COUNT)
+class ProductCursorPagination(CursorPagination):
+    """
+    Opaque next/previous cursors over products, newest first unless `?sort=` says otherwise.
+
+    The cursor holds the full sort key of the row it continues from, e.g.
+    (price, id), and the next page is `price > p OR (price = p AND id > i)`.
+    DRF's `CursorPagination` keeps only the first ordering field and skips
+    ties with an OFFSET capped at `offset_cutoff`, so a run of more than 1000
+    equal prices would repeat forever.
+    """
+
+    page_size = 50
+    page_size_query_param = "page_size"  # ✅ e.g. `?page_size=100`
+    max_page_size = 200  # ✅ Bounded so a single page can't pull the whole catalog
+    ordering = SORTS[DEFAULT_SORT]  # ✅ Backed by product_country_recent_idx
+    sort_query_param = "sort"
+
+    def get_ordering(self, request, queryset, view):
+        """`?sort=` (see `filters.SORTS`); the views have already rejected unknown values"""
+        return SORTS.get(request.query_params.get(self.sort_query_param), self.ordering)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.request = request
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.fields = [name.lstrip("-") for name in self.ordering]
+        reverse, position = self.decode_cursor(request)
+
+        ordering = [self._flip(name) for name in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = self._after(queryset, ordering, position)
+
+        rows = list(queryset[: self.page_size + 1])
+        has_following = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_following
+        else:
+            self.has_next, self.has_previous = has_following, position is not None
+
+        self.page = rows
+        self.first_position = self._position(rows[0]) if rows else position
+        self.last_position = self._position(rows[-1]) if rows else position
+        return rows
+
+    @staticmethod
+    def _flip(name):
+        return name[1:] if name.startswith("-") else f"-{name}"
+
+    @staticmethod
+    def _after(queryset, ordering, position):
+        """Rows after `position` in `ordering`: a range on the first key, ties broken by `id`"""
+        (first, tiebreak), (value, pk) = ordering, position
+        field, lookup = (first[1:], "lte") if first.startswith("-") else (first, "gte")
+        pk_lookup = "gte" if tiebreak.startswith("-") else "lte"
+        # ✅ Same shape as the change feed: an index range plus a filter on its first key
+        return queryset.filter(**{f"{field}__{lookup}": value}).exclude(**{field: value, f"pk__{pk_lookup}": pk})
+
+    def _position(self, row):
+        if isinstance(row, dict):
+            return tuple(row[field] for field in self.fields)
+        return tuple(getattr(row, field) for field in self.fields)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor((False, self.last_position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        return self.encode_cursor((True, self.first_position))
+
+    def encode_cursor(self, cursor):
+        reverse, position = cursor
+        value, pk = position
+        value = value.isoformat() if hasattr(value, "isoformat") else str(value)  # ✅ Datetime or Decimal, exactly
+        data = {"o": self.ordering[0], "r": int(reverse), "p": [value, pk]}
+        token = base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode()).decode().rstrip("=")
+        return replace_query_param(self.base_url, self.cursor_query_param, token)
+
+    def decode_cursor(self, request):
+        """(reverse, (sort value, id) or None) from `?cursor=`; 404 for tampered or stale cursors"""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return False, None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+            if data["o"] != self.ordering[0]:  # ✅ A cursor from another `?sort=`
+                raise ValueError(data["o"])
+            value, pk = data["p"]
+            value = Product._meta.get_field(self.fields[0]).to_python(value)
+            return bool(data["r"]), (value, int(pk))
+        except (ValueError, TypeError, KeyError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
@@ -0,0 +1,27 @@
+"""
+Markdown → sanitized HTML for help articles.
+
+Articles are rendered once, when saved, and the HTML is stored next to the
+Markdown with a hash of (renderer version, content). Bump `RENDERER_VERSION`
+whenever the output changes (new extensions, sanitizer rules, library upgrade)
+and run `manage.py render_help_articles` to refresh stored HTML in bulk.
+"""
+import hashlib
+
+import markdown
+import nh3
+
+RENDERER_VERSION = 1
+
+MARKDOWN_EXTENSIONS = ["extra", "sane_lists"]  # ✅ Tables, fenced code, footnotes, definition lists
+
+
+def content_hash(content):
+    """Identifies the rendered output: changes with the content or the renderer version"""
+    return hashlib.sha256(f"{RENDERER_VERSION}\n{content}".encode()).hexdigest()
+
+
+def render_markdown(content):
+    """Render Markdown and strip anything unsafe (scripts, event handlers, javascript: links)"""
+    html = markdown.markdown(content or "", extensions=MARKDOWN_EXTENSIONS, output_format="html")
+    return nh3.clean(html)
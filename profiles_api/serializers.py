@@ -1,31 +1,58 @@
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import models
 from rest_framework import serializers
+from .images import image_set
+from .metrics import TimedSerializerMixin, timed
 from .models import HelpCategory, HelpArticle, Product, Category
 
 class HelloSerializer(serializers.Serializer):
     """Serializes a name field for testing our APIView"""
     name = serializers.CharField(max_length=10)
 
-class HelpCategorySerializer(serializers.ModelSerializer):
+class HelpCategorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Help Categories"""
 
     class Meta:
         model = HelpCategory
         fields = "__all__"
 
-class HelpArticleSerializer(serializers.ModelSerializer):
-    """Serializer for Help Articles"""
+class HelpArticleSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for Help Articles (`content_html` is the sanitized HTML rendered on save)"""
     category = serializers.PrimaryKeyRelatedField(queryset=HelpCategory.objects.all())
 
     class Meta:
         model = HelpArticle
         fields = "__all__"
 
+class HelpArticleSummarySerializer(HelpArticleSerializer):
+    """Help article without its body, for small list responses (`?summary=true`)"""
+
+    class Meta(HelpArticleSerializer.Meta):
+        fields = None
+        exclude = ["content", "content_html"]
+
+    @classmethod
+    def requested(cls, query_params):
+        return query_params.get("summary", "").strip().lower() in ("1", "true", "yes")
+
+class ProductListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    """Preloads category ancestry once for the whole list instead of once per product"""
+
+    def to_representation(self, data):
+        products = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        Category.objects.attach_ancestors(product.category for product in products)
+        return super().to_representation(products)
+
+
 # ✅ Updated ProductSerializer with category hierarchy, proper country serialization, and SEO-friendly URL
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for Product model"""
 
     created_by_name = serializers.SerializerMethodField()
     created_by_country = serializers.SerializerMethodField()
+    image_set = serializers.SerializerMethodField()  # ✅ Resized derivatives for the context's size
     category_path = serializers.SerializerMethodField()  # ✅ Get full category path
     product_url = serializers.SerializerMethodField()  # ✅ Generate SEO-friendly URL
 
@@ -37,6 +64,7 @@ class ProductSerializer(serializers.ModelSerializer):
             "description",
             "price",
             "images",
+            "image_set",          # ✅ `images` at the size asked for (listing/detail/`?image_size=`)
             "created_at",
             "updated_at",
             "category_path",      # ✅ Show category hierarchy
@@ -44,6 +72,7 @@ class ProductSerializer(serializers.ModelSerializer):
             "created_by_name",     # ✅ Show creator's name
             "created_by_country",  # ✅ Show creator's country as a string
         ]
+        list_serializer_class = ProductListSerializer  # ✅ Avoid N+1 queries on listings
 
     def get_created_by_name(self, obj):
         """Get creator's name or return 'Unknown' if missing"""
@@ -53,16 +82,19 @@ class ProductSerializer(serializers.ModelSerializer):
         """Get creator's country as a string or return 'Unknown' if missing"""
         return str(obj.created_by.country).lower() if obj.created_by and obj.created_by.country else "unknown"
 
+    def get_image_set(self, obj):
+        """`src`/`webp`/`width`/`height` per image at `context["image_size"]` (originals if not processed)"""
+        size = self.context.get("image_size", settings.PRODUCT_IMAGE_DETAIL_SIZE)
+        return image_set(obj.images, obj.image_variants, size)
+
     def get_category_path(self, obj):
         """Return full category path as 'Parent > Subcategory' (e.g., 'Agriculture > Agricultural Equipment')"""
         category = obj.category
         if not category:
             return "Uncategorized"
 
-        path = []
-        while category:
-            path.insert(0, category.name)
-            category = category.parent  # ✅ Traverse up the category tree
+        path = [ancestor.name for ancestor in category.get_ancestors()]  # ✅ Preloaded or one indexed query
+        path.append(category.name)
 
         return " > ".join(path)  # ✅ Join categories with " > "
 
@@ -79,4 +111,142 @@ class ProductSerializer(serializers.ModelSerializer):
             subcategory_slug = "uncategorized"  # ✅ Default if no category assigned
 
         # ✅ Final SEO-friendly URL structure
-        return f"/{country_code}/{subcategory_slug}/{obj.slug}"
\ No newline at end of file
+        return f"/{country_code}/{subcategory_slug}/{obj.slug}"
+
+class ProductRowSerializer:
+    """
+    Read-only fast path for product listings: same output as `ProductSerializer(many=True)`,
+    built from `values()` rows instead of model instances and DRF field machinery.
+    Category paths come from one lookup table per batch (one indexed query for the ancestors).
+    """
+
+    columns = (
+        "id", "title", "description", "price", "images", "image_variants", "created_at", "updated_at", "slug",
+        "created_by_id", "created_by__name", "created_by__country",
+        "category_id", "category__name", "category__slug", "category__path",
+    )
+
+    def __init__(self, rows, context=None):
+        self.rows = rows
+        self.context = context or {}
+
+    @classmethod
+    def queryset(cls, products):
+        """Only the columns the listing needs, as dicts (creator and category joined in)"""
+        return products.select_related(None).values(*cls.columns)
+
+    @property
+    def data(self):
+        with timed("serializer"):
+            return self.to_representation(self.rows)
+
+    @staticmethod
+    def _ancestor_names(rows):
+        """Ancestor id → name for every category in `rows`"""
+        ancestor_ids = set()
+        for row in rows:
+            if row["category__path"]:
+                ancestor_ids.update(row["category__path"].split(Category.PATH_SEPARATOR)[:-2])
+        if not ancestor_ids:
+            return {}
+        return {str(pk): name for pk, name in Category.objects.filter(pk__in=ancestor_ids).values_list("pk", "name")}
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        names = self._ancestor_names(rows)
+        fields = ProductSerializer().fields  # ✅ Reuse DRF's own price/datetime formatting, once per field
+        price, created_at, updated_at = fields["price"], fields["created_at"], fields["updated_at"]
+        for field in (created_at, updated_at):
+            field.timezone = field.default_timezone()  # ✅ Resolve the active timezone once, not per value
+        image_size = self.context.get("image_size", settings.PRODUCT_IMAGE_DETAIL_SIZE)
+        category_paths = {}
+
+        data = []
+        for row in rows:
+            category_id = row["category_id"]
+            if category_id is None:
+                category_path, subcategory_slug = "Uncategorized", "uncategorized"
+            else:
+                category_path = category_paths.get(category_id)
+                if category_path is None:
+                    ancestors = row["category__path"].split(Category.PATH_SEPARATOR)[:-2]
+                    category_path = category_paths[category_id] = " > ".join(
+                        [names[pk] for pk in ancestors if pk in names] + [row["category__name"]]
+                    )
+                subcategory_slug = row["category__slug"]
+
+            has_creator = row["created_by_id"] is not None
+            country = str(row["created_by__country"] or "").lower() if has_creator else ""
+            data.append({
+                "id": row["id"],
+                "title": row["title"],
+                "description": row["description"],
+                "price": price.to_representation(row["price"]),
+                "images": row["images"],
+                "image_set": image_set(row["images"], row["image_variants"], image_size),
+                "created_at": created_at.to_representation(row["created_at"]),
+                "updated_at": updated_at.to_representation(row["updated_at"]),
+                "category_path": category_path,
+                "product_url": f"/{country or 'unknown'}/{subcategory_slug}/{row['slug']}",
+                "created_by_name": row["created_by__name"] if has_creator else "Unknown",
+                "created_by_country": country or "unknown",
+            })
+        return data
+
+
+class ProductKeyField(serializers.Field):
+    """
+    One product reference: a `product_url` string (`/gh/smartphones/galaxy-s20`),
+    a `[country, subcategory, slug]` list or a `{country, subcategory, slug}` object.
+    Validates to a lowercase-country `(country, subcategory, slug)` tuple.
+    """
+
+    default_error_messages = {
+        "invalid": "Expected a product_url string, a [country, subcategory, slug] list or an object with those keys.",
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            parts = urlsplit(data).path.strip("/").split("/")
+        elif isinstance(data, dict):
+            parts = [data.get(key) for key in ("country", "subcategory", "slug")]
+        elif isinstance(data, list):
+            parts = data
+        else:
+            self.fail("invalid")
+        if len(parts) != 3 or not all(isinstance(part, str) and part.strip() for part in parts):
+            self.fail("invalid")
+        country, subcategory, slug = (part.strip() for part in parts)
+        return country.lower(), subcategory, slug
+
+    def to_representation(self, value):
+        return "/{}/{}/{}".format(*value)
+
+
+class ProductLookupSerializer(serializers.Serializer):
+    """Body of the batch product lookup (`POST /api/products/lookup/`)"""
+
+    MAX_ITEMS = 100
+
+    items = serializers.ListField(child=ProductKeyField(), allow_empty=False, max_length=MAX_ITEMS)
+
+    def resolve(self, products, context=None):
+        """
+        One `{product_url, found, product}` entry per requested item, in request
+        order. Slugs are unique, so the whole batch is one `slug IN (...)` query
+        (plus one for category names); country and subcategory are checked per row.
+        """
+        keys = self.validated_data["items"]
+        rows = list(
+            products.filter(slug__in={slug for _, _, slug in keys})
+            .select_related(None)
+            .values(*ProductRowSerializer.columns, "country_code", "category_slug")  # ✅ Match on the SEO lookup keys
+        )
+        data = ProductRowSerializer(rows, context=context).data
+        found = {(row["country_code"], row["category_slug"], row["slug"]): item for row, item in zip(rows, data)}
+
+        key_field = self.fields["items"].child
+        return [
+            {"product_url": key_field.to_representation(key), "found": key in found, "product": found.get(key)}
+            for key in keys
+        ]
@@ -0,0 +1,186 @@
+import contextvars
+
+from django.db.models.functions import Now
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from .caching import help_scope, invalidate, products_scope
+from .category_tree import CATEGORY_TREE_SCOPE
+from .facets import apply_deltas, creator_deltas, move_deltas
+from .models import Category, CategoryFacet, HelpArticle, Product, Tombstone, UserProfile
+
+
+# ✅ Deleting a creator nulls `Product.created_by` in bulk (SET_NULL), bypassing Product.save
+@receiver(pre_delete, sender=UserProfile)
+def clear_product_country(sender, instance, **kwargs):
+    """Drop the denormalized country from products whose creator is being deleted"""
+    apply_deltas(creator_deltas(instance, instance.country_code, ""))
+    # ✅ Their products now read "Unknown": new `updated_at` for Last-Modified, the sitemap and the change feed
+    Product.objects.filter(created_by=instance).update(country_code="", updated_at=Now())
+
+
+# ✅ Response cache invalidation (see profiles_api/caching.py)
+def _remember_previous(sender, instance, fields):
+    """Stash the stored values of `fields` so post_save can invalidate the old scope too"""
+    if instance.pk:
+        instance._previous = sender.objects.filter(pk=instance.pk).values(*fields).first() or {}
+    else:
+        instance._previous = {}
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_country(sender, instance, **kwargs):
+    _remember_previous(sender, instance, ["country_code", "category_id"])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product(sender, instance, created=False, **kwargs):
+    previous = getattr(instance, "_previous", {})
+    scopes = [products_scope(instance.country_code), products_scope(previous.get("country_code", ""))]
+    if created or kwargs["signal"] is post_delete or previous.get("category_id") != instance.category_id:
+        scopes.append(CATEGORY_TREE_SCOPE)  # ✅ Product counts per category changed
+    invalidate(*scopes)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def update_facets(sender, instance, created=False, **kwargs):
+    """Move this product's facet count from its previous (country, category) to the current one"""
+    current = (instance.country_code, instance.category_id)
+    if kwargs["signal"] is post_delete:
+        apply_deltas({current: -1})
+    elif created:
+        apply_deltas({current: 1})
+    else:
+        previous = getattr(instance, "_previous", {})
+        before = (previous.get("country_code", ""), previous.get("category_id"))
+        if before != current:
+            apply_deltas({before: -1, current: 1})
+
+
+@receiver(pre_save, sender=Category)
+def remember_category_parent(sender, instance, **kwargs):
+    _remember_previous(sender, instance, ["parent_id", "name"])
+
+
+@receiver(post_save, sender=Category)
+def touch_category_products(sender, instance, created=False, **kwargs):
+    """Renaming or moving a category changes `category_path` of every product in its subtree"""
+    previous = getattr(instance, "_previous", {})
+    if not created and (previous.get("parent_id"), previous.get("name")) != (instance.parent_id, instance.name):
+        Product.objects.in_category(instance).update(updated_at=Now())
+
+
+@receiver(post_save, sender=Category)
+def move_category_facets(sender, instance, created=False, **kwargs):
+    """Moving a category changes the subtree counts of its old and new ancestors in every country"""
+    previous = getattr(instance, "_previous", {})
+    if not created and previous.get("parent_id") != instance.parent_id:
+        apply_deltas(move_deltas(instance, previous.get("parent_id")), subtree_only=True)
+
+
+@receiver(post_delete, sender=Category)
+def drop_category_facets(sender, instance, **kwargs):
+    """Cascaded product deletes recreate the rows of categories that are deleted in the same cascade"""
+    CategoryFacet.objects.filter(category_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category(sender, instance, created=False, **kwargs):
+    """Renaming or moving a category changes `category_path`/`product_url` across its subtree"""
+    if created:
+        invalidate(CATEGORY_TREE_SCOPE)  # ✅ No products yet (and `path` isn't written when post_save runs)
+        return
+    countries = Product.objects.in_category(instance).values_list("country_code", flat=True).distinct()
+    invalidate(CATEGORY_TREE_SCOPE, *(products_scope(country) for country in countries))
+
+
+def _touches_product_payload(update_fields):
+    """A creator's name and country are part of every product payload they own"""
+    return update_fields is None or bool({"name", "country"} & set(update_fields))  # ✅ Skip e.g. `last_login`
+
+
+@receiver(pre_save, sender=UserProfile)
+def remember_user_country(sender, instance, update_fields=None, **kwargs):
+    if _touches_product_payload(update_fields):
+        _remember_previous(sender, instance, ["country", "name"])
+
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_user(sender, instance, update_fields=None, **kwargs):
+    if not _touches_product_payload(update_fields):
+        return
+    previous = getattr(instance, "_previous", {})
+    invalidate(products_scope(instance.country_code), products_scope(previous.get("country") or ""))
+
+
+@receiver(post_save, sender=UserProfile)
+def touch_creator_products(sender, instance, created=False, update_fields=None, **kwargs):
+    """A renamed creator changes `created_by_name` on all their products (country changes: see `UserProfile.save`)"""
+    previous = getattr(instance, "_previous", {})
+    if not created and _touches_product_payload(update_fields) and previous.get("name", instance.name) != instance.name:
+        Product.objects.filter(created_by=instance).update(updated_at=Now())
+
+
+@receiver(post_delete, sender=UserProfile)
+def invalidate_deleted_user(sender, instance, **kwargs):
+    """Their products moved to the unknown country and lost the creator name"""
+    invalidate(products_scope(instance.country_code), products_scope(""))
+
+
+@receiver(post_save, sender=UserProfile)
+def move_creator_facets(sender, instance, created=False, update_fields=None, **kwargs):
+    """A creator's country change moves all their products to another country's facets"""
+    if created or not _touches_product_payload(update_fields):
+        return
+    previous = (getattr(instance, "_previous", {}).get("country") or "").lower()
+    apply_deltas(creator_deltas(instance, previous, instance.country_code))
+
+
+@receiver(pre_save, sender=HelpArticle)
+def remember_article_slug(sender, instance, **kwargs):
+    _remember_previous(sender, instance, ["slug"])
+
+
+@receiver(post_save, sender=HelpArticle)
+@receiver(post_delete, sender=HelpArticle)
+def invalidate_article(sender, instance, **kwargs):
+    previous = getattr(instance, "_previous", {})
+    invalidate(help_scope(), help_scope(instance.slug), help_scope(previous.get("slug", instance.slug)))
+
+
+# ✅ Deletions for the change feed (see profiles_api/changes.py)
+_pending_tombstones = contextvars.ContextVar("pending_tombstones", default=None)
+
+
+def _tombstone(sender, instance):
+    if sender is Product:
+        # ✅ Its product_url
+        key = f"/{instance.country_code or 'unknown'}/{instance.category_slug}/{instance.slug}"
+        return Tombstone(kind=Tombstone.PRODUCT, object_id=instance.pk, key=key)
+    return Tombstone(kind=Tombstone.HELP_ARTICLE, object_id=instance.pk, key=instance.slug)
+
+
+@receiver(pre_delete, sender=Product)
+@receiver(pre_delete, sender=HelpArticle)
+def collect_tombstone(sender, instance, origin=None, **kwargs):
+    """
+    Django sends every pre_delete of a delete() (cascades included) before any
+    post_delete, so the first post_delete can write them all in one INSERT.
+    """
+    pending = _pending_tombstones.get()
+    if pending is None or pending[0] is not origin:
+        pending = (origin, [])  # ✅ Also drops what a failed delete left behind
+        _pending_tombstones.set(pending)
+    pending[1].append(_tombstone(sender, instance))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=HelpArticle)
+def record_deletions(sender, instance, using, origin=None, **kwargs):
+    pending = _pending_tombstones.get()
+    if pending is not None and pending[0] is origin:
+        _pending_tombstones.set(None)
+        Tombstone.objects.using(using).bulk_create(pending[1], batch_size=500)
@@ -0,0 +1,167 @@
+"""
+Sharded, gzip-compressed sitemap of the SEO product URLs.
+
+Shard `k` holds the products with `k * SHARD_SIZE <= pk < (k + 1) * SHARD_SIZE`,
+so it never exceeds the 50,000 URLs a sitemap may list and a product always
+stays in the same shard. URLs are built from the denormalized
+`country_code`/`category_slug`/`slug` columns while streaming the shard in
+primary-key order; no creator or category rows are loaded.
+
+`generate()` compares one GROUP BY (row count and latest `updated_at` per
+shard) with the manifest of the previous run and rewrites only the shards
+that changed (edits, additions, deletions), then the sitemap index. Shards
+whose latest `updated_at` is within `SITEMAP_SETTLE_SECONDS` of the previous
+run's start are rewritten once more: `updated_at` comes from the app clock
+or from the database's `Now()` (transaction start on PostgreSQL), so a
+transaction committing after that run may carry a stamp older than the
+shard's maximum and would otherwise go unnoticed.
+
+    SITEMAP_DIR/sitemap.xml           index, served at /sitemap.xml
+    SITEMAP_DIR/products-00000.xml.gz shards, served under SITEMAP_URL
+    SITEMAP_DIR/manifest.json         per-shard count and lastmod
+"""
+import gzip
+import json
+import os
+from datetime import timedelta
+from pathlib import Path
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.db.models import Count, F, Max
+from django.http import FileResponse, Http404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_safe
+
+from .models import Product
+
+SHARD_SIZE = 50000
+INDEX_NAME = "sitemap.xml"
+MANIFEST_NAME = "manifest.json"
+XMLNS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def shard_name(shard):
+    return f"products-{shard:05d}.xml.gz"
+
+
+def listed_products():
+    """Products that have an SEO URL (their creator has a country)"""
+    return Product.objects.exclude(country_code="")
+
+
+def shard_stats():
+    """`{shard: (url count, latest updated_at as ISO string)}` in one aggregate query"""
+    rows = (
+        listed_products().order_by()
+        .annotate(shard=F("pk") / SHARD_SIZE).values("shard")
+        .annotate(count=Count("pk"), lastmod=Max("updated_at"))
+    )
+    return {row["shard"]: (row["count"], row["lastmod"].isoformat()) for row in rows}
+
+
+def _write_atomic(path, write, compress=False):
+    tmp = path.with_name(f".{path.name}.{os.getpid()}")
+    with open(tmp, "wb") as raw:
+        if compress:
+            with gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as fh:  # ✅ Same content, same bytes
+                write(fh)
+        else:
+            write(raw)
+    os.replace(tmp, path)  # ✅ Crawlers never see a half-written file
+
+
+def write_shard(directory, shard, base_url):
+    """Stream one shard's products in pk order into its `.xml.gz`; returns the URL count"""
+    rows = (
+        listed_products()
+        .filter(pk__gte=shard * SHARD_SIZE, pk__lt=(shard + 1) * SHARD_SIZE)
+        .order_by("pk")
+        .values_list("country_code", "category_slug", "slug", "updated_at")
+        .iterator(chunk_size=5000)
+    )
+    count = 0
+
+    def write(fh):
+        nonlocal count
+        fh.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="{XMLNS}">\n'.encode())
+        for country, category_slug, slug, updated_at in rows:
+            loc = escape(f"{base_url}/{country}/{category_slug}/{slug}")
+            fh.write(f"<url><loc>{loc}</loc><lastmod>{updated_at.isoformat()}</lastmod></url>\n".encode())
+            count += 1
+        fh.write(b"</urlset>\n")
+
+    _write_atomic(Path(directory) / shard_name(shard), write, compress=True)
+    return count
+
+
+def write_index(directory, shards, shard_url):
+    """Sitemap index listing every shard with its lastmod"""
+    def write(fh):
+        fh.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<sitemapindex xmlns="{XMLNS}">\n'.encode())
+        for shard, (_, lastmod) in sorted(shards.items()):
+            loc = escape(f"{shard_url}{shard_name(shard)}")
+            fh.write(f"<sitemap><loc>{loc}</loc><lastmod>{lastmod}</lastmod></sitemap>\n".encode())
+        fh.write(b"</sitemapindex>\n")
+
+    _write_atomic(Path(directory) / INDEX_NAME, write)
+
+
+def load_manifest(directory):
+    """`({shard: (count, lastmod)}, start of the run that wrote it or None)`"""
+    try:
+        data = json.loads((Path(directory) / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {}, None
+    shards = {int(shard): tuple(entry) for shard, entry in data.get("shards", {}).items()}
+    return shards, parse_datetime(data.get("generated_at") or "")
+
+
+def generate(directory=None, force=False, log=None):
+    """
+    Bring the sitemap in `directory` (default `SITEMAP_DIR`) up to date.
+    Returns (shards written, shards unchanged, shards removed).
+    """
+    directory = Path(directory or settings.SITEMAP_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    base_url = settings.SITEMAP_BASE_URL.rstrip("/")
+    shard_url = base_url + settings.SITEMAP_URL
+
+    started = timezone.now()
+    previous, previous_run = load_manifest(directory)
+    settle = timedelta(seconds=getattr(settings, "SITEMAP_SETTLE_SECONDS", 300))
+    settled = previous_run - settle if previous_run else None  # ✅ No run yet (or an old manifest): write everything
+    current = shard_stats()
+    written = 0
+    for shard, stats in sorted(current.items()):
+        unchanged = previous.get(shard) == stats and (directory / shard_name(shard)).is_file()
+        if not force and unchanged and settled and parse_datetime(stats[1]) < settled:
+            continue
+        count = write_shard(directory, shard, base_url)
+        written += 1
+        if log:
+            log(f"{shard_name(shard)}: {count} URLs")
+
+    removed = previous.keys() - current.keys()
+    for shard in removed:  # ✅ Every product of the shard is gone
+        (directory / shard_name(shard)).unlink(missing_ok=True)
+
+    if written or removed or not (directory / INDEX_NAME).is_file():
+        write_index(directory, current, shard_url)
+    manifest = {
+        "generated_at": started.isoformat(),
+        "shards": {str(shard): list(stats) for shard, stats in current.items()},
+    }
+    _write_atomic(directory / MANIFEST_NAME, lambda fh: fh.write(json.dumps(manifest).encode()))
+    return written, len(current) - written, len(removed)
+
+
+@require_safe
+def sitemap_index_view(request):
+    """`/sitemap.xml`: the index written by `generate()` (run `manage.py generate_sitemaps`)"""
+    path = Path(settings.SITEMAP_DIR) / INDEX_NAME
+    if not path.is_file():
+        raise Http404("Sitemap not generated yet")
+    return FileResponse(open(path, "rb"), content_type="application/xml")
+
@@ -1,3 +1,1234 @@
-from django.test import TestCase
+import base64
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.db.models import F
+from django.db.utils import load_backend
+from django.http import HttpResponse, QueryDict
+from django.test import RequestFactory, SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from profiles_api import authentication, caching, changes, db_router, facets, geo, metrics, sitemaps, warmup
+from profiles_api.caching import help_scope, invalidate, products_scope
+from profiles_api.models import Category, CategoryFacet, HelpArticle, HelpCategory, Product, Tombstone, UserProfile
+from profiles_api.filters import ProductFilterSerializer
+from profiles_api.serializers import ProductRowSerializer, ProductSerializer
+from profiles_api.views import get_user_country
+
+
+class IPRangeTableTests(SimpleTestCase):
+    """Bisect lookups over the local IP-range table"""
+
+    def setUp(self):
+        self.table = geo.IPRangeTable([
+            ("41.0.0.0", "41.255.255.255", "ZA"),
+            ("102.176.0.0", "102.176.255.255", "GH"),
+            ("2c0f:f000::", "2c0f:ffff:ffff:ffff:ffff:ffff:ffff:ffff", "NG"),
+        ])
+
+    def test_lookup_inside_range(self):
+        self.assertEqual(self.table.lookup("102.176.12.1"), "gh")
+        self.assertEqual(self.table.lookup("41.0.0.0"), "za")
+        self.assertEqual(self.table.lookup("2c0f:f001::1"), "ng")
+
+    def test_lookup_outside_range(self):
+        self.assertIsNone(self.table.lookup("8.8.8.8"))
+        self.assertIsNone(self.table.lookup("not-an-ip"))
+
+    def test_low_ipv6_ranges_stay_ipv6(self):
+        table = geo.IPRangeTable([("::1", "::ffff:ffff", "US")])
+        self.assertEqual(table.lookup("::2"), "us")
+        self.assertIsNone(table.lookup("0.0.0.2"))
+
+    def test_csv_skips_headers_bad_rows_and_placeholders(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as fh:
+            fh.write('ip_from,ip_to,country_code\n"0","16777215","-"\n1.0.0.0,1.0.0.255,GH\n1.0.1.0,oops,NG\n1.0.2.0\n')
+        self.addCleanup(os.unlink, fh.name)
+        with self.assertLogs("profiles_api.geo", "WARNING"):
+            table = geo.IPRangeTable.from_csv(fh.name)
+        self.assertEqual((len(table), table.skipped_rows), (1, 3))
+        self.assertEqual(table.lookup("1.0.0.9"), "gh")
+        self.assertIsNone(table.lookup("0.0.0.1"))
+
+
+class CountryResolverTests(SimpleTestCase):
+    """Cached resolution and the optional remote fallback"""
+
+    def test_misses_are_cached_and_never_hit_the_network(self):
+        resolver = geo.CountryResolver(geo.IPRangeTable([("1.0.0.0", "1.0.0.255", "GH")]))
+        with mock.patch.object(resolver, "remote_lookup") as remote:
+            self.assertEqual(resolver.resolve("1.0.0.7"), "gh")
+            self.assertIsNone(resolver.resolve("8.8.8.8"))
+            remote.assert_not_called()
+        self.assertEqual(len(resolver.cache), 2)
+
+    def test_remote_fallback_is_time_boxed(self):
+        resolver = geo.CountryResolver(remote_fallback=True, remote_timeout=0.25)
+        response = mock.Mock(status_code=200)
+        response.json.return_value = {"country_code": "NG"}
+        with mock.patch("requests.get", return_value=response) as get:
+            self.assertEqual(resolver.resolve("8.8.8.8"), "ng")
+            self.assertEqual(resolver.resolve("8.8.8.8"), "ng")
+        get.assert_called_once_with("https://ipapi.co/8.8.8.8/json/", timeout=0.25)
+
+    def test_cache_is_bounded(self):
+        cache = geo.TTLCache(maxsize=2, ttl=60)
+        for key in ("a", "b", "c"):
+            cache.set(key, key)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("a"))
+
+
+class GetUserCountryTests(SimpleTestCase):
+    """`get_user_country` resolution order"""
+
+    def setUp(self):
+        geo.set_resolver(geo.CountryResolver(geo.IPRangeTable([("102.176.0.0", "102.176.255.255", "NG")])))
+        self.addCleanup(geo.set_resolver, None)
+        self.factory = RequestFactory()
+
+    def test_query_param_wins(self):
+        request = self.factory.get("/", {"country": "KE"}, REMOTE_ADDR="102.176.0.1")
+        self.assertEqual(get_user_country(request), "ke")
+
+    def test_forwarded_ip_is_resolved(self):
+        request = self.factory.get("/", HTTP_X_FORWARDED_FOR="102.176.0.1, 10.0.0.1")
+        self.assertEqual(get_user_country(request), "ng")
+
+    def test_defaults_to_ghana(self):
+        request = self.factory.get("/", REMOTE_ADDR="8.8.8.8")
+        self.assertEqual(get_user_country(request), "gh")
+
+
+def make_catalog(products=5, country="GH"):
+    """Create a 3-level category chain with `products` products by one creator"""
+    cache.clear()  # ✅ Start every catalog from an empty response cache
+    user = UserProfile.objects.create_user("seller@example.com", "Seller", "pass", country=country)
+    root = Category.objects.create(name="Electronics")
+    phones = Category.objects.create(name="Phones", parent=root)
+    smart = Category.objects.create(name="Smartphones", parent=phones)
+    for i in range(products):
+        Product.objects.create(
+            title=f"Phone {i}", description="", category=smart, price="10.00", created_by=user
+        )
+    return user, smart
+
+
+class ProductListQueryCountTests(TestCase):
+    """Listings must cost a constant number of queries, whatever their size"""
+
+    def assert_list_queries(self, url, num):
+        with self.assertNumQueries(num):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_api_products_query_count(self):
+        make_catalog(products=2)
+        self.assert_list_queries("/api/gh/products/", 2)
+
+        Product.objects.bulk_create(
+            Product(title=f"Extra {i}", slug=f"extra-{i}", description="", price="1.00", country_code="gh",
+                    category=Product.objects.first().category, created_by=UserProfile.objects.first())
+            for i in range(20)
+        )
+        invalidate(products_scope("gh"))  # ✅ bulk_create bypasses the invalidation signals
+        response = self.assert_list_queries("/api/gh/products/", 2)
+        self.assertEqual(len(response.json()["results"]), 22)
+        product = next(p for p in response.json()["results"] if p["title"] == "Phone 0")
+        self.assertEqual(product["category_path"], "Electronics > Phones > Smartphones")
+        self.assertEqual(product["product_url"], "/gh/smartphones/phone-0")
+
+
+class ProductRowSerializerTests(TestCase):
+    """The values()-based listing path renders exactly what ProductSerializer does"""
+
+    def test_output_is_byte_identical(self):
+        user, smart = make_catalog(products=2)
+        nameless = UserProfile.objects.create_user("nameless@example.com", "", "pass")  # ✅ No country
+        root = Category.objects.get(name="Electronics")
+        Product.objects.create(title="Cable", description="x", category=root, price="3.5", created_by=nameless,
+                               images=["a.jpg"])
+        Product.objects.create(title="Orphan", description="", category=smart, price="1234.999", created_by=None)
+
+        products = Product.objects.select_related("created_by", "category").order_by("pk")
+        expected = JSONRenderer().render(ProductSerializer(products, many=True).data)
+        with self.assertNumQueries(2):
+            actual = JSONRenderer().render(ProductRowSerializer(ProductRowSerializer.queryset(products)).data)
+        self.assertEqual(actual, expected)
+
+
+class ProductPaginationTests(TestCase):
+    """Cursor pagination of product listings"""
+
+    def test_cursor_pages_cover_every_product_once(self):
+        make_catalog(products=7)
+        seen, url = [], "/api/gh/products/?page_size=3"
+        while url:
+            with self.assertNumQueries(2):
+                data = self.client.get(url).json()
+            self.assertLessEqual(len(data["results"]), 3)
+            seen += [product["id"] for product in data["results"]]
+            url = data["next"]
+        self.assertEqual(sorted(seen), sorted(Product.objects.values_list("id", flat=True)))
+        self.assertEqual(len(seen), 7)
+
+    def test_ties_beyond_a_thousand_rows_are_paged_by_id(self):
+        user, category = make_catalog(products=0)
+        Product.objects.bulk_create(
+            Product(title=f"Same {i}", description="", slug=f"same-{i}", category=category, price="9.99",
+                    created_by=user, country_code="gh", category_slug=category.slug)
+            for i in range(1205)
+        )
+        seen, pages, url = [], [], "/api/gh/products/?sort=price&page_size=200"
+        while url:
+            data = self.client.get(url).json()
+            seen += [product["id"] for product in data["results"]]
+            pages.append(data)
+            url = data["next"]
+        self.assertEqual(len(pages), 7)
+        self.assertEqual(seen, sorted(Product.objects.values_list("id", flat=True)))
+
+        back = self.client.get(pages[-1]["previous"]).json()
+        self.assertEqual(back["results"], pages[-2]["results"])
+        self.assertIsNone(pages[0]["previous"])
+        self.assertEqual(self.client.get(pages[1]["next"].replace("sort=price", "sort=newest")).status_code, 404)
+
+    def test_listing_order_comes_from_index(self):
+        if connection.vendor == "sqlite":
+            plan = Product.objects.filter(country_code="gh").order_by("-created_at", "-id").explain()
+            self.assertIn("product_country_recent_idx", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_page_size_is_bounded(self):
+        make_catalog(products=1)
+        with mock.patch("profiles_api.pagination.ProductCursorPagination.max_page_size", 2):
+            self.assertEqual(len(self.client.get("/api/gh/products/?page_size=1000").json()["results"]), 1)
+
+    def test_empty_country_is_404(self):
+        self.assertEqual(self.client.get("/api/ke/products/").status_code, 404)
+
+
+class ProductFilterTests(TestCase):
+    """Server-side filters and sort orders on listings, each backed by an index"""
+
+    def setUp(self):
+        self.user, self.smart = make_catalog(products=0)
+        self.phones = self.smart.parent
+        self.radios = Category.objects.create(name="Radios", parent=self.phones.parent)
+        for i, (category, price) in enumerate([(self.smart, "30.00"), (self.phones, "10.00"),
+                                               (self.radios, "20.00"), (self.smart, "40.00")]):
+            Product.objects.create(title=f"Item {i}", description="", category=category, price=price, created_by=self.user)
+
+    def titles(self, query):
+        response = self.client.get(f"/api/gh/products/?{query}")
+        self.assertEqual(response.status_code, 200, response.content)
+        return [product["title"] for product in response.json()["results"]]
+
+    def test_filters_and_sorts(self):
+        self.assertEqual(self.titles(""), ["Item 3", "Item 2", "Item 1", "Item 0"])
+        self.assertEqual(self.titles("sort=price"), ["Item 1", "Item 2", "Item 0", "Item 3"])
+        self.assertEqual(self.titles("sort=-price&min_price=15&max_price=35"), ["Item 0", "Item 2"])
+        self.assertEqual(self.titles("category=phones&sort=oldest"), ["Item 0", "Item 1", "Item 3"])
+        self.assertEqual(self.titles("category=radios"), ["Item 2"])
+
+        third = Product.objects.get(title="Item 2").created_at
+        after = self.titles(f"created_after={third.isoformat().replace('+', '%2B')}")
+        self.assertEqual(after, ["Item 3", "Item 2"])
+        self.assertEqual(self.titles("category=radios&min_price=25"), [])  # ✅ Filtered out: empty page, not 404
+
+        pages = self.client.get("/api/gh/products/?sort=price&page_size=3").json()
+        rest = self.client.get(pages["next"]).json()
+        self.assertEqual([p["title"] for p in rest["results"]], ["Item 3"])
+
+    def test_invalid_parameters(self):
+        response = self.client.get("/api/gh/products/?min_price=5&max_price=1&sort=cheapest&category=nope")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {"sort", "category"})
+        response = self.client.get("/api/async/gh/products/?min_price=5&max_price=1")
+        self.assertEqual((response.status_code, set(response.json())), (400, {"max_price"}))
+
+    def test_query_plans_use_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN output checked for SQLite only")
+        for query in ["", "sort=price", "sort=-price&min_price=15&max_price=35", "category=phones",
+                      "category=phones&sort=price", "created_after=2020-01-01&created_before=2100-01-01",
+                      "min_price=5&created_after=2020-01-01&sort=oldest"]:
+            filters = ProductFilterSerializer(data=QueryDict(query))
+            self.assertTrue(filters.is_valid(), filters.errors)
+            plan = filters.filter(Product.objects.filter(country_code="gh")).order_by(*filters.ordering).explain()
+            self.assertNotIn("SCAN", plan, f"?{query}\n{plan}")
+
+
+class ProductLookupTests(TestCase):
+    """`POST /api/products/lookup/`: many SEO URLs, constant queries, request order"""
+
+    def test_batch_lookup(self):
+        make_catalog(products=30)
+        items = [f"/gh/smartphones/phone-{i}" for i in range(29, -1, -1)]
+        items[3] = ["GH", "smartphones", "phone-7"]
+        items[4] = {"country": "gh", "subcategory": "smartphones", "slug": "phone-7"}
+        items += ["/gh/smartphones/missing", "/ng/smartphones/phone-0", "https://upfrica.com/gh/phones/phone-1/"]
+
+        with self.assertNumQueries(2):  # ✅ Products by slug, category names
+            response = self.client.post("/api/products/lookup/", {"items": items}, content_type="application/json")
+        results = response.json()["results"]
+        self.assertEqual(len(results), 33)
+        self.assertEqual([r["product"]["title"] for r in results[:3]], ["Phone 29", "Phone 28", "Phone 27"])
+        self.assertEqual(results[3]["product"], results[4]["product"])
+        self.assertEqual(results[3]["product_url"], "/gh/smartphones/phone-7")
+        self.assertEqual(results[-3:], [
+            {"product_url": "/gh/smartphones/missing", "found": False, "product": None},
+            {"product_url": "/ng/smartphones/phone-0", "found": False, "product": None},
+            {"product_url": "/gh/phones/phone-1", "found": False, "product": None},
+        ])
+        single = self.client.get("/api/gh/smartphones/phone-5/").json()
+        self.assertEqual(results[24]["product"]["product_url"], single["product_url"])
+
+    def test_invalid_items(self):
+        response = self.client.post("/api/products/lookup/", {"items": ["/gh/only-two", 5]}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()["items"]), {"0", "1"})
+        response = self.client.post("/api/products/lookup/", {"items": ["/a/b/c"] * 101}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductExportTests(TestCase):
+    """Streaming NDJSON catalog export"""
+
+    def test_export_streams_one_product_per_line(self):
+        make_catalog(products=5)
+        with mock.patch("profiles_api.views.EXPORT_CHUNK_SIZE", 2), self.assertNumQueries(4):
+            response = self.client.get("/api/gh/products/export/")
+            lines = b"".join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(len(lines), 5)
+        expected = ProductSerializer(Product.objects.order_by("-created_at", "-id").first()).data
+        self.assertEqual(json.loads(lines[0])["product_url"], expected["product_url"])
+        self.assertEqual(json.loads(lines[0])["category_path"], "Electronics > Phones > Smartphones")
+
+
+class ResponseCacheTests(TestCase):
+    """Server-side response cache, conditional GET and signal-based invalidation"""
+
+    def setUp(self):
+        self.user, self.category = make_catalog(products=1)
+        self.url = "/api/gh/smartphones/phone-0/"
+
+    def test_hit_skips_orm_and_supports_etag(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        self.assertTrue(first["ETag"])
+        self.assertTrue(first["Last-Modified"])
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+            not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_product_and_creator_changes_invalidate(self):
+        self.client.get(self.url)
+        product = Product.objects.get()
+        product.title = "Renamed"
+        product.save()
+        self.assertEqual(self.client.get(self.url).json()["title"], "Renamed")
+
+        self.user.name = "New Seller"
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).json()["created_by_name"], "New Seller")
+
+        self.category.parent.name = "Mobile"
+        self.category.parent.save()
+        self.assertEqual(self.client.get(self.url).json()["category_path"], "Electronics > Mobile > Smartphones")
+
+    def test_related_changes_advance_last_modified(self):
+        stamps = [Product.objects.get().updated_at]
+        self.category.parent.name = "Mobile"
+        self.category.parent.save()
+        stamps.append(Product.objects.get().updated_at)
+        self.user.name = "New Seller"
+        self.user.save()
+        stamps.append(Product.objects.get().updated_at)
+        self.assertEqual(stamps, sorted(set(stamps)))
+
+        self.assertEqual(self.client.get("/api/gh/products/").json()["results"][0]["created_by_name"], "New Seller")
+        self.user.delete()
+        self.assertGreater(Product.objects.get().updated_at, stamps[-1])
+        self.assertEqual(self.client.get("/api/gh/products/").status_code, 404)
+
+    def test_lists_revalidate_by_etag_only(self):
+        extra = Product.objects.create(title="Extra", description="", category=self.category, price="5.00",
+                                       created_by=self.user)
+        first = self.client.get("/api/gh/products/")
+        self.assertNotIn("Last-Modified", first)
+        extra.delete()
+        since = http_date(time.time() + 60)
+        response = self.client.get("/api/gh/products/", HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), len(first.json()["results"]) - 1)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=since).status_code, 304)
+
+    def test_new_category_does_not_scan_products(self):
+        with CaptureQueriesContext(connection) as queries:
+            Category.objects.create(name="Toys", parent=self.category)
+        self.assertFalse([q for q in queries if "profiles_api_product" in q["sql"]])
+
+    def test_help_article_changes_invalidate(self):
+        article = HelpArticle.objects.create(
+            category=HelpCategory.objects.create(name="Orders", slug="orders"),
+            title="Returns", slug="returns", content="Old",
+        )
+        self.assertEqual(self.client.get("/api/help/returns/").json()["content"], "Old")
+        self.assertEqual(len(self.client.get("/api/help/").json()), 1)
+
+        article.content = "New"
+        article.save()
+        self.assertEqual(self.client.get("/api/help/returns/").json()["content"], "New")
+
+        article.delete()
+        self.assertEqual(self.client.get("/api/help/returns/").status_code, 404)
+        self.assertEqual(self.client.get("/api/help/").json(), [])
+
+
+class HelpArticleHTMLTests(TestCase):
+    """Markdown is rendered to sanitized HTML once, on save"""
+
+    def setUp(self):
+        cache.clear()
+        self.article = HelpArticle.objects.create(
+            category=HelpCategory.objects.create(name="Orders", slug="orders"),
+            title="Returns", slug="returns", content="# Returns\n\n**Free** <script>alert(1)</script>",
+        )
+
+    def test_rendered_on_save_and_exposed(self):
+        self.assertEqual(self.article.content_html, "<h1>Returns</h1>\n<p><strong>Free</strong> </p>")
+        data = self.client.get("/api/help/returns/").json()
+        self.assertEqual(data["content_html"], self.article.content_html)
+
+        with mock.patch("profiles_api.models.render_markdown") as render:
+            self.article.title = "Refunds"
+            self.article.save()  # ✅ Content unchanged: no re-render
+            render.assert_not_called()
+
+        self.article.content = "Updated"
+        self.article.save(update_fields=["content"])
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.content_html, "<p>Updated</p>")
+
+    def test_summary_omits_bodies(self):
+        full = self.client.get("/api/help/").json()[0]
+        summary = self.client.get("/api/help/?summary=true").json()[0]
+        self.assertIn("content_html", full)
+        self.assertEqual(set(full) - set(summary), {"content", "content_html"})
+        self.assertEqual(self.client.get("/api/async/help/?summary=1").json(), [summary])
+
+    def test_render_command_refreshes_stale_html(self):
+        HelpArticle.objects.update(content="*Bulk*")  # ✅ Bypasses save()
+        self.client.get("/api/help/returns/")
+        out = io.StringIO()
+        call_command("render_help_articles", stdout=out)
+        self.assertIn("Rendered 1 help articles", out.getvalue())
+        self.assertEqual(self.client.get("/api/help/returns/").json()["content_html"], "<p><em>Bulk</em></p>")
+
+        call_command("render_help_articles", stdout=out)
+        self.assertIn("Rendered 0 help articles", out.getvalue())
+        call_command("render_help_articles", "--all", stdout=out)
+        self.assertIn("Rendered 1 help articles", out.getvalue().splitlines()[-1])
+
+
+class AsyncEndpointTests(TestCase):
+    """ASGI endpoints mirror the sync payloads"""
+
+    def setUp(self):
+        make_catalog(products=3)
+        HelpArticle.objects.create(
+            category=HelpCategory.objects.create(name="Orders", slug="orders"),
+            title="Returns", slug="returns", content="Body",
+        )
+
+    async def test_async_payloads_match_sync(self):
+        for sync_url, async_url in [
+            ("/api/gh/products/", "/api/async/gh/products/"),
+            ("/api/gh/smartphones/phone-1/", "/api/async/gh/smartphones/phone-1/"),
+            ("/api/help/", "/api/async/help/"),
+            ("/api/help/returns/", "/api/async/help/returns/"),
+        ]:
+            expected = (await self.async_client.get(sync_url)).json()
+            response = await self.async_client.get(async_url)
+            self.assertEqual(response.status_code, 200)
+            if "results" in expected:
+                self.assertEqual(response.json()["results"], expected["results"])
+            else:
+                self.assertEqual(response.json(), expected)
+
+    async def test_async_country_detection_and_404(self):
+        geo.set_resolver(geo.CountryResolver(geo.IPRangeTable([("102.176.0.0", "102.176.255.255", "GH")])))
+        self.addCleanup(geo.set_resolver, None)
+        response = await self.async_client.get("/api/async/products/", REMOTE_ADDR="102.176.0.9")
+        self.assertEqual(len(response.json()["results"]), 3)
+        self.assertEqual((await self.async_client.get("/api/async/ke/products/")).status_code, 404)
+
+
+class ReplicaRouterTests(TestCase):
+    """Read-only endpoints read from a replica (a second SQLite file here); writes stick to the primary"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        settings_dict = {**connections.settings["default"], "NAME": os.path.join(cls.replica_dir.name, "replica.sqlite3")}
+        connections["replica"] = load_backend(settings_dict["ENGINE"]).DatabaseWrapper(settings_dict, "replica")
+        call_command("migrate", database="replica", verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        connections["replica"].close()
+        del connections["replica"]
+        cls.replica_dir.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.enterContext(self.settings(DATABASE_REPLICAS=["replica"], DATABASE_REPLICA_LAG=0))
+
+    def test_read_only_endpoints_use_the_replica(self):
+        make_catalog(products=2)  # ✅ Primary only
+        self.assertEqual(self.client.get("/api/gh/products/").status_code, 404)
+
+        category = HelpCategory(name="Orders", slug="orders")
+        category.save(using="replica")
+        self.addCleanup(HelpCategory.objects.using("replica").all().delete)  # ✅ The replica is outside the test transaction
+        HelpArticle(category=category, title="Returns", slug="returns", content="x").save(using="replica")
+        self.assertEqual([a["slug"] for a in self.client.get("/api/help/").json()], ["returns"])
+        self.assertEqual(self.client.get("/api/async/help/returns/").json()["title"], "Returns")
+        self.assertEqual(Product.objects.count(), 2)  # ✅ Outside those views: primary
+
+    def test_category_tree_is_built_from_the_primary(self):
+        Category.objects.create(name="Garden")  # ✅ Primary only, as if the replica were lagging
+        self.assertEqual([node["name"] for node in self.client.get("/api/categories/tree/").json()], ["Garden"])
+
+    def test_reads_after_a_write_stick_to_the_primary(self):
+        @db_router.read_from_replica
+        def view():
+            before = Product.objects.all().db
+            Category.objects.create(name="Garden")
+            return before, Product.objects.all().db
+
+        self.assertEqual(view(), ("replica", "default"))
+
+    def test_writers_stick_to_the_primary_by_cookie(self):
+        def write(request):
+            Category.objects.create(name="Garden")
+            return HttpResponse()
+
+        def read(request):
+            return HttpResponse(Product.objects.all().db)
+
+        write = db_router.ReplicaStickinessMiddleware(write)
+        read = db_router.ReplicaStickinessMiddleware(db_router.read_from_replica(read))
+        factory = RequestFactory()
+        with self.settings(DATABASE_REPLICA_LAG=5):
+            cookie = write(factory.post("/")).cookies[db_router.STICKY_COOKIE]
+            self.assertEqual(cookie["max-age"], 5)
+
+            writer = factory.get("/")
+            writer.COOKIES[db_router.STICKY_COOKIE] = cookie.value
+            self.assertEqual(read(writer).content, b"default")
+            self.assertEqual(read(factory.get("/")).content, b"replica")  # ✅ Everyone else keeps the replica
+
+            caching.invalidate(help_scope())
+            self.assertFalse(db_router.read_from_replica(lambda: caching._cacheable(help_scope()))())
+            self.assertTrue(caching._cacheable(help_scope()))  # ✅ Primary reads are always fresh
+
+
+class CategoryPathTests(TestCase):
+    """Materialized path maintenance for the category hierarchy"""
+
+    def setUp(self):
+        self.root = Category.objects.create(name="Electronics")
+        self.phones = Category.objects.create(name="Phones", parent=self.root)
+        self.smart = Category.objects.create(name="Smartphones", parent=self.phones)
+
+    def test_path_and_ancestors(self):
+        self.assertEqual(self.smart.path, f"{self.root.pk}/{self.phones.pk}/{self.smart.pk}/")
+        self.assertEqual(self.smart.depth, 2)
+        smart = Category.objects.get(pk=self.smart.pk)
+        with self.assertNumQueries(1):
+            self.assertEqual(smart.get_full_slug(), "electronics/phones/smartphones")
+
+    def test_reparenting_moves_subtree(self):
+        other = Category.objects.create(name="Gadgets")
+        self.phones.parent = other
+        self.phones.save()
+
+        smart = Category.objects.get(pk=self.smart.pk)
+        self.assertEqual(smart.path, f"{other.pk}/{self.phones.pk}/{self.smart.pk}/")
+        self.assertEqual(smart.get_full_slug(), "gadgets/phones/smartphones")
+        self.assertFalse(self.root.get_descendants().exists())
+
+    def test_cannot_move_under_own_subtree(self):
+        self.root.parent = self.smart
+        with self.assertRaises(ValueError):
+            self.root.save()
+
+    def test_subtree_products(self):
+        user = UserProfile.objects.create_user("a@example.com", "A", "pass", country="GH")
+        Product.objects.create(title="S20", description="", category=self.smart, price="1.00", created_by=user)
+        Product.objects.create(title="Radio", description="", category=self.root, price="1.00", created_by=user)
+
+        self.assertEqual(Product.objects.in_category(self.phones).count(), 1)
+        self.assertEqual(Product.objects.in_category(self.root).count(), 2)
+
+        self.phones.delete()
+        self.assertEqual(list(self.root.get_descendants()), [])
+        self.assertEqual(Product.objects.in_category(self.root).count(), 1)
+
+
+class CategoryTreeTests(TestCase):
+    """`/api/categories/tree/` from the versioned in-process snapshot"""
+
+    def test_tree_counts_and_invalidation(self):
+        user, smart = make_catalog(products=3)
+        garden = Category.objects.create(name="Garden")
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/categories/tree/")
+        garden_node, electronics = response.json()[1], response.json()[0]
+        self.assertEqual((electronics["name"], electronics["product_count"], electronics["total_product_count"]),
+                         ("Electronics", 0, 3))
+        self.assertEqual(electronics["children"][0]["children"][0]["product_count"], 3)
+        self.assertEqual((garden_node["slug"], garden_node["children"]), ("garden", []))
+
+        with self.assertNumQueries(0):
+            cached = self.client.get("/api/categories/tree/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+        Product.objects.create(title="Hoe", description="", category=garden, price="5.00", created_by=user)
+        tree = self.client.get("/api/categories/tree/").json()
+        self.assertEqual(tree[1]["total_product_count"], 1)
+
+        Category.objects.create(name="Tablets", parent=smart.parent)
+        tree = self.client.get("/api/categories/tree/").json()
+        self.assertEqual([c["name"] for c in tree[0]["children"][0]["children"]], ["Smartphones", "Tablets"])
+
+
+class CategoryFacetTests(TestCase):
+    """Per-country category counts kept up to date by signals, equal to a full rebuild"""
+
+    def counts(self):
+        return {(f.country_code, f.category.name): (f.product_count, f.subtree_count)
+                for f in CategoryFacet.objects.select_related("category") if f.subtree_count}
+
+    def assert_matches_rebuild(self):
+        incremental = self.counts()
+        facets.rebuild()
+        self.assertEqual(incremental, self.counts())
+
+    def test_incremental_updates(self):
+        user, smart = make_catalog(products=2)
+        self.assertEqual(self.counts(), {
+            ("gh", "Electronics"): (0, 2), ("gh", "Phones"): (0, 2), ("gh", "Smartphones"): (2, 2),
+        })
+
+        phones = smart.parent
+        product = Product.objects.first()
+        product.category = phones
+        product.save()
+        self.assertEqual(self.counts()[("gh", "Phones")], (1, 2))
+        self.assertEqual(self.counts()[("gh", "Smartphones")], (1, 1))
+
+        product.delete()
+        self.assertEqual(self.counts()[("gh", "Electronics")], (0, 1))
+
+        user.country = "NG"
+        user.save()
+        self.assertEqual(self.counts(), {
+            ("ng", "Electronics"): (0, 1), ("ng", "Phones"): (0, 1), ("ng", "Smartphones"): (1, 1),
+        })
+
+        garden = Category.objects.create(name="Garden")
+        tools = Category.objects.create(name="Tools", parent=garden)
+        smart.parent = tools
+        with CaptureQueriesContext(connection) as queries:
+            smart.save()  # ✅ Moving a subtree shifts its totals between the ancestor chains
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"]])  # ✅ No GROUP BY over products
+        self.assertEqual(self.counts()[("ng", "Garden")], (0, 1))
+        self.assertEqual(self.counts()[("ng", "Tools")], (0, 1))
+        self.assertNotIn(("ng", "Electronics"), self.counts())
+        self.assert_matches_rebuild()
+
+        tools.parent = phones
+        tools.save()  # ✅ Two levels: Tools > Smartphones under Electronics > Phones
+        self.assertEqual(self.counts()[("ng", "Electronics")], (0, 1))
+        self.assertNotIn(("ng", "Garden"), self.counts())
+        self.assert_matches_rebuild()
+
+        user.delete()
+        self.assertEqual(self.counts(), {})
+
+    def test_listing_facets_and_rebuild_command(self):
+        make_catalog(products=3)
+        CategoryFacet.objects.update(product_count=0, subtree_count=0)  # ✅ Simulate drift
+        out = io.StringIO()
+        call_command("rebuild_facets", stdout=out)
+        self.assertIn("Rebuilt 3 facet rows", out.getvalue())
+
+        plain = self.client.get("/api/gh/products/").json()
+        self.assertNotIn("facets", plain)
+        with self.assertNumQueries(3):  # ✅ Page, ancestor names, facets
+            data = self.client.get("/api/gh/products/?facets=true").json()
+        self.assertEqual([(f["slug"], f["product_count"], f["subtree_count"]) for f in data["facets"]],
+                         [("electronics", 0, 3), ("phones", 0, 3), ("smartphones", 3, 3)])
+        self.assertEqual(data["facets"][1]["parent_id"], data["facets"][0]["category_id"])
+
+
+class ProductLookupKeyTests(TestCase):
+    """Denormalized country/category keys behind the SEO product URL"""
+
+    def setUp(self):
+        self.user, self.category = make_catalog(products=1, country="GH")
+        self.product = Product.objects.get()
+
+    def test_keys_follow_creator_and_category(self):
+        self.assertEqual((self.product.country_code, self.product.category_slug), ("gh", "smartphones"))
+
+        self.user.country = "NG"
+        self.user.save()
+        self.category.slug = "smart-phones"
+        self.category.save()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.country_code, self.product.category_slug), ("ng", "smart-phones"))
+
+        self.user.delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.country_code, "")
+
+    def test_seo_detail_uses_lookup_index(self):
+        response = self.client.get("/api/gh/smartphones/phone-0/")
+        self.assertEqual(response.json()["product_url"], "/gh/smartphones/phone-0")
+
+        if connection.vendor == "sqlite":
+            plan = Product.objects.filter(country_code="gh", category_slug="smartphones", slug="phone-0").explain()
+            self.assertNotIn("SCAN", plan)
+            plan = Product.objects.filter(country_code="gh").explain()
+            self.assertNotIn("SCAN", plan)
+
+
+class ImportProductsCommandTests(TestCase):
+    """`manage.py import_products`"""
+
+    def test_import_creates_categories_and_unique_slugs(self):
+        user, category = make_catalog(products=1)  # ✅ Existing slug `phone-0`
+        rows = [
+            {"title": "Phone 0", "price": "5.00", "category": "Electronics > Phones > Smartphones",
+             "created_by": user.email},
+            {"title": "Phone 0", "price": "6.00", "category": "Electronics > Phones > Smartphones"},
+            {"title": "Hoe", "price": "2.50", "category": "Agriculture > Tools", "images": ["a.jpg"]},
+        ]
+        with tempfile.NamedTemporaryFile("w", suffix=".ndjson", delete=False) as fh:
+            fh.write("\n".join(json.dumps(row) for row in rows))
+        self.addCleanup(os.unlink, fh.name)
+
+        out = io.StringIO()
+        call_command("import_products", fh.name, batch_size=2, stdout=out)
+
+        self.assertIn("Imported 3 products", out.getvalue())
+        self.assertEqual(
+            sorted(Product.objects.values_list("slug", flat=True)), ["hoe", "phone-0", "phone-0-2", "phone-0-3"]
+        )
+        imported = Product.objects.get(slug="phone-0-2")
+        self.assertEqual((imported.country_code, imported.category_slug, imported.category), ("gh", "smartphones", category))
+        hoe = Product.objects.get(slug="hoe")
+        self.assertEqual(hoe.category.get_full_slug(), "agriculture/tools")
+        self.assertEqual(hoe.images, ["a.jpg"])
+
+    def test_categories_are_matched_under_their_parent(self):
+        make_catalog(products=1)  # ✅ Electronics > Phones > Smartphones
+        Category.objects.create(name="Toys!")
+
+        def run(*rows):
+            with tempfile.NamedTemporaryFile("w", suffix=".ndjson", delete=False) as fh:
+                fh.write("\n".join(json.dumps(row) for row in rows))
+            self.addCleanup(os.unlink, fh.name)
+            call_command("import_products", fh.name, stdout=io.StringIO())
+
+        run({"title": "Robot", "price": "9.00", "category": "Toys? > Robots"})
+        robot = Product.objects.get(slug="robot")
+        self.assertEqual([c.slug for c in [*robot.category.get_ancestors(), robot.category]], ["toys-2", "robots"])
+
+        with self.assertRaisesMessage(CommandError, "'Phones' already exists as 'Electronics > Phones'"):
+            run({"title": "Toy phone", "price": "3.00", "category": "Toys? > Phones"})
+        self.assertFalse(Product.objects.filter(slug="toy-phone").exists())
+
+
+class ProductImageTests(TestCase):
+    """`manage.py process_product_images` derivatives and per-context sizes"""
+
+    def setUp(self):
+        from PIL import Image
+
+        self.media = tempfile.TemporaryDirectory()
+        self.addCleanup(self.media.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=self.media.name))
+        os.makedirs(os.path.join(self.media.name, "products"))
+        Image.new("RGBA", (1000, 500), (255, 0, 0, 128)).save(os.path.join(self.media.name, "products", "a.png"))
+
+        user, category = make_catalog(products=1)
+        self.product = Product.objects.get()
+        self.product.images = ["products/a.png", "https://cdn.example.com/b.jpg"]
+        self.product.save()
+
+    def process(self):
+        out = io.StringIO()
+        call_command("process_product_images", workers=1, stdout=out)
+        return out.getvalue()
+
+    def test_derivatives_and_sizes(self):
+        self.assertIn("Processed 1 images (0 unchanged), updated 1 products", self.process())
+        variant = Product.objects.get().image_variants["products/a.png"]
+        self.assertEqual((variant["width"], variant["height"]), (1000, 500))
+        self.assertEqual((variant["sizes"]["card"]["width"], variant["sizes"]["card"]["height"]), (480, 240))
+        for path in (variant["sizes"]["thumb"]["webp"], variant["sizes"]["large"]["jpeg"]):
+            self.assertTrue(os.path.isfile(os.path.join(self.media.name, path)))
+
+        listing = self.client.get("/api/gh/products/").json()["results"][0]["image_set"]
+        self.assertEqual(listing[0]["src"], "/media/" + variant["sizes"]["card"]["jpeg"])
+        self.assertEqual(listing[1], {"src": "https://cdn.example.com/b.jpg", "webp": None, "width": None, "height": None})
+        detail = self.client.get("/api/gh/smartphones/phone-0/?image_size=thumb").json()["image_set"][0]
+        self.assertEqual((detail["width"], detail["webp"]), (160, "/media/" + variant["sizes"]["thumb"]["webp"]))
+
+    def test_unchanged_sources_are_skipped(self):
+        self.process()
+        self.assertIn("Processed 0 images (1 unchanged), updated 0 products", self.process())
+
+    def test_corrupt_source_is_skipped(self):
+        with open(os.path.join(self.media.name, "products", "bad.jpg"), "wb") as fh:
+            fh.write(b"not an image")
+        self.product.images = ["products/bad.jpg", "products/a.png"]
+        self.product.save()
+
+        self.assertIn("Processed 1 images (0 unchanged), updated 1 products", self.process())  # ✅ Logged by the worker
+        self.assertEqual(list(Product.objects.get().image_variants), ["products/a.png"])
+
+
+class LoadDumpCommandTests(TestCase):
+    """`manage.py load_dump` restores db.json-style dumps"""
+
+    def test_load_repo_dump(self):
+        dump = os.path.join(settings.BASE_DIR, "db.json")
+        out = io.StringIO()
+        with mock.patch("profiles_api.management.commands.load_dump.READ_SIZE", 256):  # ✅ Exercise buffer refills
+            call_command("load_dump", dump, "-e", "contenttypes", "-e", "auth", "-e", "admin", "-e", "sessions",
+                         batch_size=1, stdout=out)
+
+        self.assertIn("Loaded 9 objects", out.getvalue())
+        self.assertEqual(UserProfile.objects.get(pk=1).groups.count(), 0)
+        product = Product.objects.get(pk=1)
+        self.assertEqual(product.created_at.isoformat(), "2025-03-10T03:45:51.928000+00:00")  # ✅ Not the load time
+        self.assertEqual((product.country_code, product.category_slug), ("ng", "agricultural-equipment"))
+        self.assertEqual(product.category.get_full_slug(), "agriculture/agricultural-equipment")
+        self.assertEqual(HelpArticle.objects.get().category.slug, "selling")
+
+        # ✅ Sequences continue after the loaded pks
+        self.assertGreater(UserProfile.objects.create_user("new@example.com", "New", "pass").pk, 2)
+
+
+class MetricsTests(TestCase):
+    """Per-URL-name request metrics and the Prometheus scrape endpoint"""
+
+    def setUp(self):
+        metrics.registry.reset()
+
+    def counter(self, name, **labels):
+        return metrics.registry.counters.get((name, metrics._labels(**labels)), 0)
+
+    def test_records_route_queries_and_stages(self):
+        make_catalog(products=3)
+        self.client.get("/api/gh/products/")
+        self.client.get("/api/does-not/exist/at/all/")
+
+        self.assertEqual(self.counter("http_requests_total", view="products-list", method="GET", status="200"), 1)
+        self.assertEqual(self.counter("db_queries_total", view="products-list"), 2)
+        self.assertGreater(self.counter("db_query_duration_seconds_total", view="products-list"), 0)
+        self.assertGreater(self.counter("serializer_duration_seconds_total", view="products-list"), 0)
+        self.assertEqual(self.counter("http_requests_total", view="unmatched", method="GET", status="404"), 1)
+
+        with mock.patch.object(geo.CountryResolver, "resolve", return_value="gh"):
+            self.client.get("/api/products/", REMOTE_ADDR="102.176.1.1")
+        self.assertGreater(self.counter("geolocation_duration_seconds_total", view="products-detected"), 0)
+
+    def test_scrape_sums_worker_files(self):
+        make_catalog(products=1)
+        self.client.get("/api/gh/products/")
+        with tempfile.TemporaryDirectory() as directory:
+            other = metrics.Registry()
+            other.record("products-list", "GET", 200, 0.02, metrics.RequestStats())
+            with open(os.path.join(directory, "worker-1.json"), "w") as fh:
+                json.dump(other.snapshot(), fh)
+
+            with self.settings(METRICS_DIR=directory):
+                response = self.client.get("/metrics/")
+
+        body = response.content.decode()
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn('http_requests_total{method="GET",status="200",view="products-list"} 2', body)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",view="products-list",le="+Inf"} 2', body)
+        self.assertIn('http_request_duration_seconds_count{method="GET",view="products-list"} 2', body)
+        self.assertIn('db_queries_total{view="products-list"} 2', body)
+
+    def test_retired_workers_keep_their_totals(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for pid in (1, 2):
+                worker = metrics.Registry()
+                worker.count("auth_token_cache_total", result="hit")
+                with open(os.path.join(directory, f"worker-{pid}.json"), "w") as fh:
+                    json.dump(worker.snapshot(), fh)
+            metrics.retire_worker(1, directory)
+            metrics.retire_worker(2, directory)
+            self.assertEqual(sorted(os.listdir(directory)), ["retired.json"])
+            body = metrics.render(metrics.Registry().collect(directory))
+            self.assertIn('auth_token_cache_total{result="hit"} 2', body)
+
+            metrics.clear_directory(directory)
+            self.assertEqual(os.listdir(directory), [])
+
+
+class WarmupTests(TestCase):
+    """Pre-fork warm-up used by gunicorn.conf.py"""
+
+    def test_warm_runs_every_step(self):
+        make_catalog(products=1)
+        with mock.patch.object(geo, "_resolver", None), mock.patch.object(warmup.connections, "close_all") as close_all:
+            results = warmup.warm()
+            self.assertIsNotNone(geo._resolver)
+        close_all.assert_called_once()  # ✅ Workers must not inherit the master's database connections
+        self.assertEqual(set(results), set(warmup.STEPS))
+        self.assertGreater(results["urls"][1], 10)
+        self.assertGreater(results["countries"][1], 200)
+
+        failing = mock.patch.dict(warmup.STEPS, {"geo": mock.Mock(side_effect=OSError)})
+        with failing, mock.patch.object(warmup.connections, "close_all"), self.assertLogs(warmup.logger, "ERROR"):
+            self.assertNotIn("geo", warmup.warm(["geo", "countries"]))  # ✅ A failing step never stops startup
+
+    def test_process_memory(self):
+        memory = warmup.process_memory()
+        if memory:
+            self.assertGreater(memory["rss"], 0)
+            self.assertLessEqual(memory["pss"], memory["rss"])
+
+
+class AdminTests(TestCase):
+    """Admin changelists cost the same number of queries whatever the page size"""
+
+    def setUp(self):
+        self.admin_user = UserProfile.objects.create_superuser("admin@example.com", "Admin", "pass")
+        self.client.force_login(self.admin_user)
+
+    def changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_changelists_do_not_query_per_row(self):
+        user, smart = make_catalog(products=2)
+        _, categories = self.changelist_queries("/admin/profiles_api/category/")
+        _, products = self.changelist_queries("/admin/profiles_api/product/")
+
+        for i in range(10):
+            child = Category.objects.create(name=f"Model {i}", parent=smart)
+            Product.objects.create(title=f"Extra {i}", description="", category=child, price="1.00", created_by=user)
+        response, more_categories = self.changelist_queries("/admin/profiles_api/category/")
+        _, more_products = self.changelist_queries("/admin/profiles_api/product/")
+        self.assertEqual((more_categories, more_products), (categories, products))
+        self.assertContains(response, "Electronics &gt; Phones &gt; Smartphones &gt; Model 3")
+
+        response = self.client.get("/admin/autocomplete/", {
+            "app_label": "profiles_api", "model_name": "product", "field_name": "category", "term": "model",
+        })
+        self.assertEqual(len(response.json()["results"]), 10)
+
+    def test_approximate_count(self):
+        make_catalog(products=5)
+        with mock.patch("profiles_api.admin.ApproximateCountPaginator.limit", 3):
+            response = self.client.get("/admin/profiles_api/product/")
+        self.assertEqual(response.context["cl"].result_count, 3)
+
+    def test_bulk_actions_are_set_based(self):
+        others = [UserProfile.objects.create_user(f"u{i}@example.com", f"U{i}", "pass") for i in range(3)]
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post("/admin/profiles_api/userprofile/", {
+                "action": "deactivate_users", "_selected_action": [u.pk for u in others] + [self.admin_user.pk],
+            })
+        self.assertEqual(sum(q["sql"].startswith("UPDATE") for q in queries), 1)
+        self.assertEqual(UserProfile.objects.filter(is_active=False).count(), 3)
+        self.assertTrue(UserProfile.objects.get(pk=self.admin_user.pk).is_active)
+
+        user, smart = make_catalog(products=3)
+        seller = UserProfile.objects.create_user("ng@example.com", "NG", "pass", country="NG")
+        Product.objects.create(title="Radio", description="", category=smart, price="5.00", created_by=seller)
+        stale = timezone.now() - timedelta(days=1)
+        Product.objects.update(updated_at=stale)
+        Product.objects.filter(country_code="gh").exclude(slug="phone-0").update(country_code="", category_slug="")
+        CategoryFacet.objects.update(subtree_count=F("subtree_count") + 10)  # ✅ Drifted counts
+        self.client.post("/admin/profiles_api/product/", {
+            "action": "refresh_lookup_keys", "_selected_action": list(Product.objects.values_list("pk", flat=True)),
+        })
+        self.assertEqual(set(Product.objects.values_list("country_code", "category_slug")),
+                         {("gh", "smartphones"), ("ng", "smartphones")})
+        # ✅ New URLs: sitemap and change feed see them; unchanged rows keep their timestamp
+        self.assertEqual(Product.objects.filter(updated_at=stale).count(), 2)
+        facets = dict(CategoryFacet.objects.filter(category__name="Electronics").values_list("country_code", "subtree_count"))
+        self.assertEqual(facets, {"gh": 3, "ng": 11})  # ✅ Only the affected country was recomputed
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Token → user snapshots served from the per-process cache, revoked within the TTL"""
+
+    def setUp(self):
+        authentication.token_cache.clear()
+        self.addCleanup(authentication.token_cache.clear)
+        self.user = UserProfile.objects.create_user("buyer@example.com", "Buyer", "pass", country="GH")
+        self.token = Token.objects.create(user=self.user)
+
+    def authenticate(self, key=None):
+        request = Request(RequestFactory().get("/api/products/", HTTP_AUTHORIZATION=f"Token {key or self.token.key}"))
+        return authentication.CachedTokenAuthentication().authenticate(request)
+
+    def test_cached_after_first_request(self):
+        before = authentication.stats()
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual((user.pk, user.email, user.country.code, token.key), (self.user.pk, "buyer@example.com", "GH", self.token.key))
+        after = authentication.stats()
+        self.assertEqual((after["hits"] - before["hits"], after["misses"] - before["misses"]), (1, 1))
+        self.assertIn('auth_token_cache_total{result="hit"}', metrics.render([metrics.registry.snapshot()]))
+
+        response = self.client.get("/api/products/", HTTP_AUTHORIZATION="Token nope")
+        self.assertEqual(response.status_code, 401)
+
+    def test_revocation_in_this_process_is_immediate(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+        self.user.is_active = True
+        self.user.save()
+        key = self.token.key
+        self.authenticate()
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(key)
+
+    def test_bulk_deactivation_and_login_updates(self):
+        self.authenticate()
+        with self.assertNumQueries(1):  # ✅ Just the UPDATE: `last_login` doesn't touch the cache
+            self.user.last_login = timezone.now()
+            self.user.save(update_fields=["last_login"])
+        self.assertIsNotNone(authentication.token_cache.get(self.token.key))
+
+        admin_user = UserProfile.objects.create_superuser("admin@example.com", "Admin", "pass")
+        self.client.force_login(admin_user)
+        self.client.post("/admin/profiles_api/userprofile/", {
+            "action": "deactivate_users", "_selected_action": [self.user.pk],
+        })
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_revocation_elsewhere_takes_effect_within_ttl(self):
+        key, user_pk = self.token.key, self.user.pk
+        self.authenticate()
+        snapshot = authentication.token_cache.get(key)
+        self.user.delete()  # ✅ Deletes the token too (and clears pk/key on the instances)
+        authentication.token_cache.set(key, snapshot)  # ✅ Another worker's cache, which saw no signal
+
+        now = time.monotonic()
+        ttl = authentication.token_cache.ttl
+        with mock.patch("profiles_api.geo.time.monotonic", return_value=now + ttl - 1):
+            self.assertEqual(self.authenticate(key)[0].pk, user_pk)  # ✅ Still inside the window
+        with mock.patch("profiles_api.geo.time.monotonic", return_value=now + ttl + 1):
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate(key)
+
+
+class SitemapTests(TestCase):
+    """Sharded gzip sitemap, rewritten only where products changed"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        patcher = mock.patch.object(sitemaps, "SHARD_SIZE", 3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user, self.category = make_catalog(products=7)
+        self.enterContext(self.settings(SITEMAP_SETTLE_SECONDS=0))
+
+    def read_shard(self, shard):
+        with gzip.open(os.path.join(self.directory, sitemaps.shard_name(shard)), "rt") as fh:
+            return fh.read()
+
+    def test_shards_and_incremental_regeneration(self):
+        shards = sorted({pk // 3 for pk in Product.objects.values_list("pk", flat=True)})
+        with self.settings(SITEMAP_BASE_URL="https://example.com/"), self.assertNumQueries(1 + len(shards)):
+            self.assertEqual(sitemaps.generate(self.directory), (len(shards), 0, 0))
+
+        urls = [self.read_shard(shard).count("<url>") for shard in shards]
+        self.assertEqual(sum(urls), 7)
+        self.assertLessEqual(max(urls), 3)
+        product = Product.objects.order_by("pk").first()
+        self.assertIn(f"<loc>https://example.com/gh/smartphones/{product.slug}</loc>", self.read_shard(product.pk // 3))
+        with open(os.path.join(self.directory, "sitemap.xml")) as fh:
+            self.assertEqual(fh.read().count("<sitemap>"), len(shards))
+
+        self.assertEqual(sitemaps.generate(self.directory), (0, len(shards), 0))
+
+        product.title = "Renamed"
+        product.save()
+        self.assertEqual(sitemaps.generate(self.directory)[0], 1)
+
+        last = Product.objects.order_by("pk").last()
+        Product.objects.filter(pk__gte=last.pk // 3 * 3).delete()
+        self.assertEqual(sitemaps.generate(self.directory), (0, len(shards) - 1, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.directory, sitemaps.shard_name(last.pk // 3))))
+
+        self.category.slug = "smart-phones"
+        self.category.save()  # ✅ Changes every URL, so every shard's lastmod moves
+        self.assertEqual(sitemaps.generate(self.directory)[0], len(shards) - 1)
+
+    def test_late_commits_within_the_settle_window(self):
+        sitemaps.generate(self.directory)
+        first = Product.objects.order_by("pk").first()
+        # ✅ Committed after that run, stamped before the shard's newest row (e.g. a long transaction's Now())
+        Product.objects.filter(pk=first.pk).update(slug="late", updated_at=first.updated_at)
+        self.assertEqual(sitemaps.generate(self.directory)[0], 0)  # ✅ No settle window: missed
+
+        with self.settings(SITEMAP_SETTLE_SECONDS=300):
+            self.assertEqual(sitemaps.generate(self.directory)[0], len(sitemaps.shard_stats()))
+        self.assertIn("/smartphones/late</loc>", self.read_shard(first.pk // 3))
+
+    def test_index_view(self):
+        with self.settings(SITEMAP_DIR=self.directory):
+            self.assertEqual(self.client.get("/sitemap.xml").status_code, 404)
+            call_command("generate_sitemaps", stdout=io.StringIO())
+            response = self.client.get("/sitemap.xml")
+        self.assertEqual(response["Content-Type"], "application/xml")
+        self.assertIn(b"<sitemapindex", b"".join(response.streaming_content))
+
+
+class ChangeFeedTests(TestCase):
+    """`/api/changes/`: keyset streams of updated products/articles and tombstones"""
+
+    def setUp(self):
+        settings_override = self.settings(CHANGES_SETTLE_SECONDS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user, self.category = make_catalog(products=3)
+        self.article = HelpArticle.objects.create(
+            category=HelpCategory.objects.create(name="Orders", slug="orders"), title="Returns", slug="returns",
+            content="Send it back.",
+        )
+
+    def changes(self, cursor="", **params):
+        response = self.client.get("/api/changes/", {"cursor": cursor, **params})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_sync_updates_and_deletions(self):
+        with self.assertNumQueries(4):  # ✅ Products, their category names, articles, tombstones
+            feed = self.changes()
+        self.assertEqual([p["title"] for p in feed["products"]], ["Phone 0", "Phone 1", "Phone 2"])
+        self.assertEqual([a["slug"] for a in feed["help_articles"]], ["returns"])
+        self.assertEqual((feed["deleted"], feed["has_more"]), ([], False))
+
+        idle = self.changes(feed["next_cursor"])
+        self.assertEqual((idle["products"], idle["help_articles"], idle["deleted"]), ([], [], []))
+
+        phone = Product.objects.get(title="Phone 0")
+        phone.price = "12.00"
+        phone.save()
+        Product.objects.get(title="Phone 1").delete()
+        self.article.delete()
+        feed = self.changes(idle["next_cursor"])
+        self.assertEqual([(p["title"], p["price"]) for p in feed["products"]], [("Phone 0", "12.00")])
+        self.assertEqual([(d["type"], d["key"]) for d in feed["deleted"]],
+                         [("product", "/gh/smartphones/phone-1"), ("help_article", "returns")])
+
+    def test_category_and_creator_changes_reach_the_feed(self):
+        cursor = self.changes()["next_cursor"]
+        phones = self.category.parent
+        phones.name = "Mobile"
+        phones.save()
+        feed = self.changes(cursor)
+        self.assertEqual({p["category_path"] for p in feed["products"]}, {"Electronics > Mobile > Smartphones"})
+        self.assertEqual(len(feed["products"]), 3)
+
+        self.user.delete()
+        feed = self.changes(feed["next_cursor"])
+        self.assertEqual({(p["product_url"].split("/")[1], p["created_by_name"]) for p in feed["products"]},
+                         {("unknown", "Unknown")})
+        self.assertEqual(len(feed["products"]), 3)
+
+    def test_cascaded_deletions_write_tombstones_in_one_insert(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.category.delete()
+        inserts = [q for q in queries if q["sql"].startswith('INSERT INTO "profiles_api_tombstone"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(
+            sorted(Tombstone.objects.values_list("key", flat=True)),
+            ["/gh/smartphones/phone-0", "/gh/smartphones/phone-1", "/gh/smartphones/phone-2"],
+        )
+
+    def test_paging_and_cursor_errors(self):
+        seen, cursor = [], ""
+        while True:
+            feed = self.changes(cursor, page_size=1)
+            seen += [p["id"] for p in feed["products"]]
+            cursor = feed["next_cursor"]
+            if not feed["has_more"]:
+                break
+        self.assertEqual(seen, sorted(Product.objects.values_list("pk", flat=True)))
+
+        self.assertEqual(self.client.get("/api/changes/", {"cursor": "not-a-cursor"}).status_code, 400)
+        for data in ([1], 5, {"products": ["2024-01-01T00:00:00", 1]}):  # ✅ Not a dict; naive timestamp
+            token = base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+            self.assertEqual(self.client.get("/api/changes/", {"cursor": token}).status_code, 400, data)
+        old = timezone.now() - timedelta(days=31)
+        expired = changes.encode_cursor({"deleted": (old, 1)})
+        self.assertEqual(self.client.get("/api/changes/", {"cursor": expired}).status_code, 410)
+
+        Tombstone.objects.create(kind=Tombstone.PRODUCT, object_id=1, deleted_at=old)
+        call_command("prune_tombstones", stdout=io.StringIO())
+        self.assertFalse(Tombstone.objects.filter(object_id=1).exists())
+
+    def test_streams_use_updated_at_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("EXPLAIN output checked for SQLite only")
+        stamp = timezone.now()
+        for stream in changes.STREAMS:
+            rows, field = changes.STREAMS[stream]
+            plan = rows().filter(**{f"{field}__gte": stamp, f"{field}__lt": stamp}).order_by(field, "pk").explain()
+            self.assertNotIn("SCAN", plan, f"{stream}\n{plan}")
 
-# Create your tests here.
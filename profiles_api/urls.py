@@ -11,10 +11,16 @@ from .views import (
     ProductListView,
     ProductDetailView,
     api_products,
+    api_products_export,
+    api_products_lookup,
     api_product_detail,
     api_help_detail,  # ✅ Import the function for single article retrieval
     api_help_root,    # ✅ Import the function for listing all help articles
+    api_category_tree,
+    api_changes,
 )
+from .async_views import async_help_detail, async_help_root, async_product_detail, async_products
+
 # ✅ Initialize router for admin API access
 router = DefaultRouter()
 router.register("help/categories", HelpCategoryViewSet, basename="help-category")
@@ -22,15 +28,37 @@ router.register("help/articles", HelpArticleViewSet, basename="help-article")  #
 
 # ✅ Define URL patterns
 urlpatterns = [
+    # ✅ Async (ASGI) read endpoints, same payloads as their sync counterparts below
+    path("async/help/", async_help_root, name="async-help-root"),
+    path("async/help/<str:slug>/", async_help_detail, name="async-help-article-detail"),
+    path("async/products/", async_products, name="async-products-detected"),
+    path("async/<str:country>/products/", async_products, name="async-products-list"),
+    path("async/<str:country>/<str:subcategory>/<str:slug>/", async_product_detail, name="async-product-detail-seo"),
+
+    # ✅ Nested category tree with product counts (served from an in-process snapshot)
+    path("categories/tree/", api_category_tree, name="category-tree"),
+
+    # ✅ Change feed for incremental sync (`?cursor=<next_cursor>`)
+    path("changes/", api_changes, name="changes"),
+
     # ✅ Fetch all help articles (supports search via `?search=keyword`)
     path("help/", api_help_root, name="help-root"),
 
     # ✅ Fetch a single help article by slug (without `/articles/`)
     path("help/<str:slug>/", api_help_detail, name="help-article-detail"),
 
+    # ✅ Batch lookup of many SEO product URLs (POST `{"items": [...]}`)
+    path("products/lookup/", api_products_lookup, name="products-lookup"),
+
+    # ✅ Product listing for the detected country (`?country=` or IP lookup)
+    path("products/", ProductListView.as_view(), name="products-detected"),
+
     # ✅ Country-based product listing (e.g., `/api/gh/products/`)
     path("<str:country>/products/", api_products, name="products-list"),
 
+    # ✅ Streaming NDJSON catalog export (e.g., `/api/gh/products/export/`)
+    path("<str:country>/products/export/", api_products_export, name="products-export"),
+
     # ✅ SEO-friendly product details: `/api/<country>/<subcategory>/<product-slug>/`
     path("<str:country>/<str:subcategory>/<str:slug>/", ProductDetailView.as_view(), name="product-detail-seo"),
 
@@ -2,12 +2,32 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, viewsets, generics
 from rest_framework.decorators import api_view
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.encoders import JSONEncoder
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import require_safe
 from django.shortcuts import get_object_or_404
-import requests
+from django.utils.decorators import method_decorator
+from itertools import islice
+import json
 import logging  # ✅ Import logging for debugging
 
-from .models import HelpArticle, HelpCategory, Product, Category
-from .serializers import HelpArticleSerializer, HelpCategorySerializer, ProductSerializer
+from .caching import cache_response, help_scope, products_scope
+from .category_tree import get_snapshot
+from .changes import CursorExpired, InvalidCursor, read_changes
+from .db_router import read_from_replica
+from .facets import country_facets, facets_requested
+from .filters import ProductFilterSerializer
+from .geo import client_ip, get_resolver
+from .images import image_context
+from .metrics import timed
+from .models import HelpArticle, HelpCategory, Product
+from .pagination import ProductCursorPagination
+from .serializers import (
+    HelpArticleSerializer, HelpArticleSummarySerializer, HelpCategorySerializer, ProductLookupSerializer,
+    ProductRowSerializer, ProductSerializer,
+)
 
 # ✅ Configure logging
 logger = logging.getLogger(__name__)
@@ -17,32 +37,28 @@ def get_user_country(request):
     """
     Detect user country from:
     - URL query parameter (`?country=gh`)
-    - IP address lookup (fallback)
+    - IP address lookup (local range table, cached; see `profiles_api.geo`)
     - Default: 'gh' (Ghana)
     """
     country = request.GET.get("country", "").strip().lower()
     if country:
         return country  # ✅ Return country if provided in the query string
 
-    try:
-        ip = request.META.get("HTTP_X_FORWARDED_FOR")  # ✅ Check if behind a proxy
-        if ip:
-            ip = ip.split(",")[0]  # ✅ Get first IP from the list
-        else:
-            ip = request.META.get("REMOTE_ADDR")  # ✅ Get direct IP
-
-        if ip and ip != "127.0.0.1":  # ✅ Ignore localhost in development
-            response = requests.get(f"https://ipapi.co/{ip}/json/")
-            if response.status_code == 200:
-                country_code = response.json().get("country_code", "").lower()
-                if country_code:
-                    return country_code  # ✅ Return detected country
-    except Exception as e:
-        logger.error(f"Error detecting country: {e}")  # ✅ Log errors
+    ip = client_ip(request)
+    if ip and ip != "127.0.0.1":  # ✅ Ignore localhost in development
+        with timed("geolocation"):
+            country_code = get_resolver().resolve(ip)
+        if country_code:
+            return country_code  # ✅ Return detected country
 
     return "gh"  # ✅ Default to Ghana if detection fails
 
 
+def _country_scope(request, country=None, **kwargs):
+    """Cache scope for product endpoints: everything for one country is invalidated together"""
+    return products_scope(country or get_user_country(request))
+
+
 # ✅ Help Category ViewSet
 class HelpCategoryViewSet(viewsets.ModelViewSet):
     """ViewSet for Help Categories"""
@@ -57,8 +73,20 @@ class HelpArticleViewSet(viewsets.ModelViewSet):
     serializer_class = HelpArticleSerializer
     lookup_field = "slug"
 
+    def _summary(self):
+        return self.action == "list" and HelpArticleSummarySerializer.requested(self.request.query_params)
+
+    def get_queryset(self):
+        articles = super().get_queryset()
+        return articles.defer(*HelpArticleSummarySerializer.Meta.exclude) if self._summary() else articles
+
+    def get_serializer_class(self):
+        return HelpArticleSummarySerializer if self._summary() else HelpArticleSerializer
+
 
 # ✅ API: Fetch all help articles
+@read_from_replica
+@cache_response(lambda request, **kwargs: help_scope())
 @api_view(["GET"])
 def api_help_root(request):
     """
@@ -66,20 +94,27 @@ def api_help_root(request):
     Supports:
     - `/api/help/`
     - Query parameter `?search=keyword`
+    - Query parameter `?summary=true` (omit `content`/`content_html` bodies)
     """
     search_query = request.GET.get("search", "").strip().lower()
     articles = HelpArticle.objects.all()
+    serializer_class = HelpArticleSerializer
 
     if search_query:
         articles = articles.filter(title__icontains=search_query)  # ✅ Case-insensitive search
+    if HelpArticleSummarySerializer.requested(request.GET):
+        articles = articles.defer(*HelpArticleSummarySerializer.Meta.exclude)  # ✅ Bodies are never read
+        serializer_class = HelpArticleSummarySerializer
 
-    serialized_articles = HelpArticleSerializer(articles, many=True)
+    serialized_articles = serializer_class(articles, many=True)
 
     # ✅ Ensure response is always an array
     return Response(serialized_articles.data if articles.exists() else [])
 
 
 # ✅ API: Fetch a specific help article by slug (without `/articles/`)
+@read_from_replica
+@cache_response(lambda request, slug, **kwargs: help_scope(slug))
 @api_view(["GET"])
 def api_help_detail(request, slug):
     """Retrieve a single help article by slug (without `/articles/`)."""
@@ -92,29 +127,46 @@ def api_help_detail(request, slug):
         return Response({"error": "Article not found"}, status=404)
 
 
+def _with_facets(response, request, country):
+    """Add `facets` (product counts per category, subtree included) to a listing if `?facets=true`"""
+    if facets_requested(request.query_params):
+        response.data["facets"] = country_facets(country)
+    return response
+
+
 # ✅ API: List all products filtered by user's country
+@method_decorator(read_from_replica, name="dispatch")
 class ProductListView(generics.ListAPIView):
     """API view to list all products filtered by user's detected country"""
     serializer_class = ProductSerializer
+    pagination_class = ProductCursorPagination
 
     def get_queryset(self):
         """Return products based on user's detected country"""
-        user_country = get_user_country(self.request)
-        products = Product.objects.filter(created_by__country__iexact=user_country)
+        self.country = get_user_country(self.request)
+        filters = ProductFilterSerializer(data=self.request.query_params)
+        filters.is_valid(raise_exception=True)
+        return filters.filter(Product.objects.select_related("created_by", "category").filter(country_code=self.country))
 
-        if not products.exists():
-            logger.info(f"No products found for country: {user_country}")
-
-        return products
+    def list(self, request, *args, **kwargs):
+        # ✅ Fast path: values() rows instead of model instances, same JSON as ProductSerializer
+        page = self.paginate_queryset(ProductRowSerializer.queryset(self.get_queryset()))
+        serializer = ProductRowSerializer(page, context=image_context(request, listing=True))
+        return _with_facets(self.get_paginated_response(serializer.data), request, self.country)
 
 
 # ✅ API: Retrieve a product by SEO-friendly URL format (country + subcategory + slug)
+@method_decorator(read_from_replica, name="dispatch")
+@method_decorator(cache_response(_country_scope), name="dispatch")
 class ProductDetailView(generics.RetrieveAPIView):
     """Retrieve a single product by country + subcategory + slug"""
 
     serializer_class = ProductSerializer
     lookup_field = "slug"
 
+    def get_serializer_context(self):
+        return {**super().get_serializer_context(), **image_context(self.request)}
+
     def get_object(self):
         """Retrieve product based on country + subcategory + slug"""
         country = self.kwargs.get("country", "").strip().lower()
@@ -126,41 +178,95 @@ class ProductDetailView(generics.RetrieveAPIView):
 
         try:
             product = get_object_or_404(
-                Product,
+                Product.objects.select_related("created_by", "category"),
+                country_code=country,
+                category_slug=subcategory,
                 slug=slug,
-                created_by__country__iexact=country,
-                category__slug=subcategory,
-            )
+            )  # ✅ Single probe on product_seo_lookup_idx
             return product
-        except Exception as e:
+        except Http404:
             logger.warning(f"Product not found: {slug} in {country}/{subcategory}")
-            return Response({"error": "Product not found."}, status=404)
+            raise NotFound({"error": "Product not found."})  # ✅ get_object must raise, not return a Response
 
 
 # ✅ API: List all products (function-based)
+@read_from_replica
+@cache_response(_country_scope)
 @api_view(["GET"])
 def api_products(request, country=None):
     """
-    Returns all products filtered by detected country.
+    Returns products filtered by detected country, newest first, one cursor page at a time.
     Supports:
     - URL (`/api/gh/products/`)
     - Query parameter (`?country=ng`)
     - IP lookup (fallback)
+    - Pagination (`?cursor=<next/previous link cursor>&page_size=100`)
+    - Filters (`?min_price=`, `?max_price=`, `?category=<slug>` with subcategories,
+      `?created_after=`, `?created_before=`) and `?sort=newest|oldest|price|-price`
+    - Category facet counts for the country (`?facets=true`)
     """
     if not country:
         country = get_user_country(request)
 
-    products = Product.objects.filter(created_by__country__iexact=country.lower())
+    filters = ProductFilterSerializer(data=request.query_params)
+    filters.is_valid(raise_exception=True)  # ✅ 400 with per-parameter errors
+    products = ProductRowSerializer.queryset(filters.filter(Product.objects.filter(country_code=country.lower())))
+
+    paginator = ProductCursorPagination()
+    page = paginator.paginate_queryset(products, request)
 
-    if not products.exists():
+    # ✅ An empty unfiltered first page means no products at all (no separate exists() query)
+    if not page and not filters.narrowed and not request.query_params.get(paginator.cursor_query_param):
         logger.info(f"No products found for country: {country}")
         return Response({"message": "No products found for this country."}, status=404)
 
-    serialized_products = ProductSerializer(products, many=True)
-    return Response(serialized_products.data)
+    # ✅ Same output as ProductSerializer(page, many=True)
+    serialized_products = ProductRowSerializer(page, context=image_context(request, listing=True))
+    return _with_facets(paginator.get_paginated_response(serialized_products.data), request, country)
+
+
+# ✅ API: Stream the full country catalog as NDJSON (one product per line)
+EXPORT_CHUNK_SIZE = 2000
+
+
+def iter_products_ndjson(products, chunk_size=None, context=None):
+    """Serialize products row by row, loading category ancestry once per chunk"""
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    rows = ProductRowSerializer.queryset(products).iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        data = ProductRowSerializer(chunk, context=context).data
+        yield "".join(json.dumps(item, cls=JSONEncoder) + "\n" for item in data)
+
+
+@read_from_replica
+@api_view(["GET"])
+def api_products_export(request, country=None):
+    """
+    Stream every product for a country as newline-delimited JSON.
+    Supports:
+    - `/api/gh/products/export/`
+    - The listing filters and `?sort=` (see `api_products`)
+    Peak memory stays flat regardless of catalog size.
+    """
+    if not country:
+        country = get_user_country(request)
+
+    filters = ProductFilterSerializer(data=request.query_params)
+    filters.is_valid(raise_exception=True)
+    products = filters.filter(Product.objects.filter(country_code=country.lower())).order_by(*filters.ordering)
+    products = products.using(products.db)  # ✅ Pin the routed database: the body is streamed after the view returns
+    rows = iter_products_ndjson(products, context=image_context(request, listing=True))
+    response = StreamingHttpResponse(rows, content_type="application/x-ndjson")
+    response["Content-Disposition"] = f'attachment; filename="products-{country.lower()}.ndjson"'
+    return response
 
 
 # ✅ API: Fetch product by SEO-friendly URL format (function-based)
+@read_from_replica
+@cache_response(_country_scope)
 @api_view(["GET"])
 def api_product_detail(request, country=None, subcategory=None, slug=None):
     """
@@ -175,12 +281,71 @@ def api_product_detail(request, country=None, subcategory=None, slug=None):
 
     try:
         product = get_object_or_404(
-            Product,
+            Product.objects.select_related("created_by", "category"),
+            country_code=country.lower(),
+            category_slug=subcategory,
             slug=slug,
-            created_by__country__iexact=country.lower(),
-            category__slug=subcategory,
-        )
-        return Response(ProductSerializer(product).data)
+        )  # ✅ Single probe on product_seo_lookup_idx
+        return Response(ProductSerializer(product, context=image_context(request)).data)
     except Exception as e:
         logger.warning(f"Product not found for slug: {slug} in {country}/{subcategory}")
-        return Response({"error": "Product not found."}, status=404)
\ No newline at end of file
+        return Response({"error": "Product not found."}, status=404)
+
+
+# ✅ API: Resolve many SEO product URLs at once (carousels, carts)
+@read_from_replica
+@api_view(["POST"])
+def api_products_lookup(request):
+    """
+    Fetch up to 100 products in one request, in a constant number of queries.
+    Body: `{"items": ["/gh/mobile-phones/samsung-galaxy-s20", ["ng", "electronics", "macbook-pro-2023"],
+    {"country": "gh", "subcategory": "laptops", "slug": "xps-13"}]}`
+    Returns `{"results": [{"product_url", "found", "product"}, ...]}` in request order;
+    `product` is null (and `found` false) for items that do not exist. No geolocation.
+    """
+    lookup = ProductLookupSerializer(data=request.data)
+    lookup.is_valid(raise_exception=True)
+    return Response({"results": lookup.resolve(Product.objects.all(), context=image_context(request, listing=True))})
+
+
+# ✅ API: Incremental sync for caches and search indexers
+CHANGES_MAX_PAGE_SIZE = 1000
+
+
+@api_view(["GET"])
+def api_changes(request):
+    """
+    Products and help articles created, updated or deleted after `?cursor=`
+    (omit it for a full initial sync), oldest first, up to `?page_size=`
+    (default 500, max 1000) per kind. Keep passing `next_cursor` back while
+    `has_more` is true, then poll with the last one.
+    Reads the primary: a replica's lag must not make the cursor skip rows.
+    """
+    try:
+        page_size = min(max(int(request.query_params.get("page_size", 500)), 1), CHANGES_MAX_PAGE_SIZE)
+    except ValueError:
+        page_size = 500
+    try:
+        changes = read_changes(request.query_params.get("cursor"), page_size, context=image_context(request, listing=True))
+    except InvalidCursor as e:
+        return Response({"error": str(e)}, status=400)
+    except CursorExpired as e:
+        return Response({"error": str(e)}, status=410)  # ✅ Tombstones already pruned: resync from scratch
+    return Response(changes)
+
+
+# ✅ API: Whole category tree with product counts, for navigation menus
+@read_from_replica
+@require_safe
+def api_category_tree(request):
+    """
+    Every category as nested nodes with `product_count` (own products) and
+    `total_product_count` (whole subtree). Served from an in-process snapshot
+    (see `profiles_api.category_tree`); no query unless the tree changed, and
+    `If-None-Match` revalidation answers 304.
+    """
+    snapshot = get_snapshot()
+    response = HttpResponse(snapshot.content, content_type="application/json")
+    response["ETag"] = snapshot.etag
+    response["Cache-Control"] = "no-cache"  # ✅ Clients may keep it but must revalidate (cheap 304)
+    return get_conditional_response(request, etag=snapshot.etag, response=response)
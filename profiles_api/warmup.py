@@ -0,0 +1,105 @@
+"""
+Warm read-mostly, process-wide structures before gunicorn forks its workers.
+
+With `preload_app` (see `gunicorn.conf.py`) the master imports Django once,
+calls `warm()` and freezes the garbage collector, so every worker starts with
+the URL resolver, the django-countries tables, the geolocation ranges and the
+category tree snapshot already built, and shares those pages copy-on-write
+instead of rebuilding them on its first requests.
+"""
+import gc
+import logging
+import os
+import time
+
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+def _urls():
+    from django.urls import URLPattern, get_resolver
+
+    def compile_patterns(patterns):
+        count = 0
+        for pattern in patterns:
+            pattern.pattern.regex  # ✅ Compiled lazily on first match otherwise
+            if isinstance(pattern, URLPattern):
+                count += 1
+            else:
+                count += compile_patterns(pattern.url_patterns)
+        return count
+
+    resolver = get_resolver()
+    resolver.reverse_dict  # ✅ Populates the reverse/namespace tables of the whole tree
+    return compile_patterns(resolver.url_patterns)
+
+
+def _countries():
+    from django_countries import countries
+
+    return len(list(countries))  # ✅ Builds the translated name table and the alt/code lookups
+
+
+def _geo():
+    from .geo import get_resolver
+
+    return len(get_resolver().table)
+
+
+def _category_tree():
+    from .category_tree import get_snapshot
+
+    return len(get_snapshot().content)
+
+
+STEPS = {
+    "urls": _urls,
+    "countries": _countries,
+    "geo": _geo,
+    "category_tree": _category_tree,
+}
+
+
+def warm(steps=None):
+    """
+    Run each warm-up step (all of `STEPS` by default) and return `{name: (seconds, size)}`.
+    A failing step is logged and skipped: a cold cache must never stop the server from starting.
+    """
+    results = {}
+    for name in steps or STEPS:
+        started = time.perf_counter()
+        try:
+            size = STEPS[name]()
+        except Exception:
+            logger.exception(f"Warm-up step {name!r} failed")
+            continue
+        results[name] = (time.perf_counter() - started, size)
+
+    connections.close_all()  # ✅ Never hand a database socket opened by the master to forked workers
+    return results
+
+
+def freeze():
+    """Move everything allocated so far out of the collector's reach, so GC passes in workers don't dirty shared pages"""
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
+
+
+def process_memory(pid=None):
+    """
+    `{rss, pss, shared}` in KiB for a process (Linux `smaps_rollup`). `pss` splits
+    shared pages between the processes mapping them, so summing it over the
+    workers gives their real footprint. Empty where /proc is unavailable.
+    """
+    try:
+        with open(f"/proc/{pid or os.getpid()}/smaps_rollup") as fh:
+            fields = dict(line.split(":", 1) for line in fh if ":" in line)
+    except OSError:
+        return {}
+
+    def kib(*names):
+        return sum(int(fields[name].split()[0]) for name in names if name in fields)
+
+    return {"rss": kib("Rss"), "pss": kib("Pss"), "shared": kib("Shared_Clean", "Shared_Dirty")}
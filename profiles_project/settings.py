@@ -43,6 +43,8 @@ INSTALLED_APPS = [
 
 # ✅ Middleware
 MIDDLEWARE = [
+    "profiles_api.metrics.MetricsMiddleware",  # ✅ First, so it times everything below
+    "profiles_api.db_router.ReplicaStickinessMiddleware",  # ✅ Sees every write of the request, session saves too
     "corsheaders.middleware.CorsMiddleware",  # 👈 Add this at the top
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -97,6 +99,31 @@ else:  # Use SQLite as fallback
         }
     }
 
+# ✅ Read replicas (see profiles_api/db_router.py), e.g. DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3
+DATABASE_REPLICAS = []
+for index, url in enumerate(filter(None, os.getenv("DATABASE_REPLICA_URLS", "").split(",")), 1):
+    DATABASES[f"replica{index}"] = {**dj_database_url.parse(url.strip()), "TEST": {"MIRROR": "default"}}
+    DATABASE_REPLICAS.append(f"replica{index}")
+DATABASE_ROUTERS = ["profiles_api.db_router.ReplicaRouter"]
+DATABASE_REPLICA_LAG = float(os.getenv("DATABASE_REPLICA_LAG", "2"))  # Seconds a client's reads stay on the primary after it wrote
+
+# ✅ Cache (shared Redis in production so signal-based invalidation reaches every worker)
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:  # Per-process memory cache for development
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", "3600"))  # Seconds; see profiles_api/caching.py
+
 # ✅ Password Validators
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -122,8 +149,49 @@ USE_TZ = True
 # ✅ Static Files
 STATIC_URL = "static/"
 
+# ✅ Uploaded media (product image sources and their derivatives, see profiles_api/images.py)
+MEDIA_URL = "/media/"
+MEDIA_ROOT = os.getenv("MEDIA_ROOT", BASE_DIR / "media")
+PRODUCT_IMAGE_SIZES = {"thumb": 160, "card": 480, "large": 1200}  # Name → bounding box in pixels
+PRODUCT_IMAGE_FORMATS = ("webp", "jpeg")
+PRODUCT_IMAGE_QUALITY = 80
+PRODUCT_IMAGE_LIST_SIZE = "card"  # Listings; detail responses use "large" (override with ?image_size=)
+PRODUCT_IMAGE_DETAIL_SIZE = "large"
+
 # ✅ Default Primary Key Field
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# ✅ IP Geolocation (see profiles_api/geo.py)
+GEOIP_RANGES_FILE = os.getenv("GEOIP_RANGES_FILE", BASE_DIR / "geoip" / "ip_country.csv")  # start_ip,end_ip,country_code
+GEOIP_CACHE_SIZE = int(os.getenv("GEOIP_CACHE_SIZE", "10000"))  # Max cached IPs per worker
+GEOIP_CACHE_TTL = int(os.getenv("GEOIP_CACHE_TTL", "3600"))  # Seconds
+GEOIP_REMOTE_FALLBACK = os.getenv("GEOIP_REMOTE_FALLBACK", "False") == "True"  # ipapi.co when the table has no match
+GEOIP_REMOTE_TIMEOUT = float(os.getenv("GEOIP_REMOTE_TIMEOUT", "0.5"))  # Seconds
+
+# ✅ Request metrics (see profiles_api/metrics.py); scrape /metrics/
+METRICS_DIR = os.getenv("METRICS_DIR")  # Directory shared by all gunicorn workers; unset = per-process numbers
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", "5"))  # Seconds between worker snapshots
+
+# ✅ Token auth served from a per-process cache (see profiles_api/authentication.py)
+REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "profiles_api.authentication.CachedTokenAuthentication",
+        "rest_framework.authentication.SessionAuthentication",
+        "rest_framework.authentication.BasicAuthentication",
+    ],
+}
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))  # Max cached tokens per worker
+AUTH_TOKEN_CACHE_TTL = float(os.getenv("AUTH_TOKEN_CACHE_TTL", "60"))  # Seconds; bounds how long other workers honour a revoked token
+
+# ✅ Product sitemap (see profiles_api/sitemaps.py); `manage.py generate_sitemaps` writes it
+SITEMAP_BASE_URL = os.getenv("SITEMAP_BASE_URL", "http://localhost:8000")  # Public site origin used in <loc>
+SITEMAP_DIR = os.getenv("SITEMAP_DIR", Path(MEDIA_ROOT) / "sitemaps")
+SITEMAP_URL = os.getenv("SITEMAP_URL", f"{MEDIA_URL}sitemaps/")  # Where SITEMAP_DIR is served
+SITEMAP_SETTLE_SECONDS = 300  # Shards changed this close to the previous run are rewritten again (late commits)
+
+# ✅ Change feed (see profiles_api/changes.py)
+CHANGES_SETTLE_SECONDS = float(os.getenv("CHANGES_SETTLE_SECONDS", "5"))  # Hold back rows this young; > longest write transaction
+CHANGES_TOMBSTONE_RETENTION_DAYS = int(os.getenv("CHANGES_TOMBSTONE_RETENTION_DAYS", "30"))  # `manage.py prune_tombstones`
+
 # ✅ Custom User Model
 AUTH_USER_MODEL = "profiles_api.UserProfile"
\ No newline at end of file
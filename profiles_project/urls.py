@@ -14,10 +14,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
+from profiles_api.metrics import metrics_view
+from profiles_api.sitemaps import sitemap_index_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/', include('profiles_api.urls'))
-]
+    path('api/', include('profiles_api.urls')),
+    path('metrics/', metrics_view, name='metrics'),  # ✅ Prometheus scrape endpoint
+    path('sitemap.xml', sitemap_index_view, name='sitemap-index'),  # ✅ Shards are served from SITEMAP_URL
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)  # ✅ Development only (no-op unless DEBUG)